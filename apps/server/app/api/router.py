@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1 import pdf, ocr, ai, convert, security, batch, workflow, system
+from app.api.v1 import pdf, ocr, ai, convert, security, batch, workflow, system, search
 
 api_router = APIRouter()
 
@@ -11,3 +11,4 @@ api_router.include_router(security.router, prefix="/security", tags=["Security"]
 api_router.include_router(batch.router, prefix="/batch", tags=["Batch"])
 api_router.include_router(workflow.router, prefix="/workflow", tags=["Workflow"])
 api_router.include_router(system.router, prefix="/system", tags=["System"])
+api_router.include_router(search.router, prefix="/search", tags=["Search"])
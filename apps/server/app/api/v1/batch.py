@@ -3,7 +3,7 @@ from typing import Optional
 from pydantic import BaseModel
 import uuid
 
-from app.core.batch_engine.engine import BatchEngine
+from app.core.batch_engine.engine import BatchEngine, SECURITY_OPERATIONS
 
 router = APIRouter()
 batch_engine = BatchEngine()
@@ -17,6 +17,7 @@ class BatchTask(BaseModel):
     status: str = "pending"
     progress: int = 0
     results: list = []
+    stats: dict = {}
 
 
 class BatchRequest(BaseModel):
@@ -67,14 +68,25 @@ async def process_batch(
     task.status = "processing"
     
     try:
-        results = await batch_engine.process(
-            input_paths,
-            operation,
-            output_dir,
-            output_format,
-            options,
-            lambda p: update_progress(task_id, p)
-        )
+        if operation in SECURITY_OPERATIONS:
+            report = await batch_engine.process_security(
+                input_paths,
+                operation,
+                output_dir,
+                options,
+                lambda p: update_progress(task_id, p)
+            )
+            results = report["results"]
+            task.stats = report["stats"]
+        else:
+            results = await batch_engine.process(
+                input_paths,
+                operation,
+                output_dir,
+                output_format,
+                options,
+                lambda p: update_progress(task_id, p)
+            )
         task.results = results
         task.status = "completed"
         task.progress = 100
@@ -99,7 +111,8 @@ async def get_task_status(task_id: str):
         "status": task.status,
         "progress": task.progress,
         "total": len(task.input_paths),
-        "results": task.results if task.status == "completed" else None
+        "results": task.results if task.status == "completed" else None,
+        "stats": task.stats or None
     }
 
 
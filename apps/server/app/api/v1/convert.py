@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
+import json
 
 from app.core.convert_engine.engine import ConvertEngine
+from app.schemas.convert import ImageToPdfOptions
 
 router = APIRouter()
 convert_engine = ConvertEngine()
@@ -57,26 +60,68 @@ async def pdf_to_image(
     input_path: str,
     output_dir: str,
     image_format: str = "png",
-    dpi: int = 150
+    dpi: int = 150,
+    pages: Optional[List[int]] = Query(None),
+    quality: int = 85,
+    colorspace: str = "rgb"
 ):
     try:
         results = await convert_engine.pdf_to_image(
             input_path,
             output_dir,
             image_format,
-            dpi
+            dpi,
+            pages,
+            quality,
+            colorspace
         )
         return {"success": True, "images": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/pdf/to/image/stream")
+async def pdf_to_image_stream(
+    input_path: str,
+    output_dir: str,
+    image_format: str = "png",
+    dpi: int = 150,
+    pages: Optional[List[int]] = Query(None),
+    quality: int = 85,
+    colorspace: str = "rgb"
+):
+    images = convert_engine.iter_pdf_to_image(
+        input_path,
+        output_dir,
+        image_format,
+        dpi,
+        pages,
+        quality,
+        colorspace
+    )
+    
+    async def _stream():
+        try:
+            async for item in images:
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 @router.post("/pdf/to/html")
-async def pdf_to_html(request: ConvertRequest):
+async def pdf_to_html(
+    request: ConvertRequest,
+    split_pages: bool = False,
+    extract_images: bool = True
+):
     try:
         result = await convert_engine.pdf_to_html(
             request.input_path,
-            request.output_path
+            request.output_path,
+            split_pages=split_pages,
+            extract_images=extract_images
         )
         return {"success": True, "output_path": result}
     except Exception as e:
@@ -108,12 +153,18 @@ async def excel_to_pdf(request: ConvertRequest):
 
 
 @router.post("/image/to/pdf")
-async def image_to_pdf(
-    input_paths: list[str],
-    output_path: str
-):
+async def image_to_pdf(options: ImageToPdfOptions):
     try:
-        result = await convert_engine.images_to_pdf(input_paths, output_path)
+        result = await convert_engine.images_to_pdf(
+            options.input_paths,
+            options.output_path,
+            page_size=options.page_size,
+            orientation=options.orientation,
+            margin=options.margin,
+            align=options.align,
+            custom_width=options.custom_width,
+            custom_height=options.custom_height
+        )
         return {"success": True, "output_path": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
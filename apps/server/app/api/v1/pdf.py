@@ -1,12 +1,20 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from typing import List, Optional
 from pydantic import BaseModel
+import io
 import os
+import uuid
+import zipfile
 import tempfile
 import aiofiles
+from loguru import logger
 
 from app.core.pdf_engine.engine import PdfEngine
+from app.core.pdf_engine.page_index import PageIndex
+from app.core.pdf_engine.renderer import RENDER_FORMATS, PagePrefetcher, normalize_render_format
+from app.core.pdf_engine.thumbnail import ThumbnailGenerator
+from app.api.v1.search import search_engine
 from app.schemas.pdf import (
     PdfMergeRequest,
     PdfSplitRequest,
@@ -16,13 +24,24 @@ from app.schemas.pdf import (
     CompressRequest,
 )
 
+POSITION_FORMATS = {
+    "binary": "application/octet-stream",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "json": "application/json",
+}
+
 router = APIRouter()
 pdf_engine = PdfEngine()
+page_prefetcher = PagePrefetcher()
 
 
 class MergeTask(BaseModel):
     input_paths: List[str]
     output_path: str
+    deduplicate: bool = False
+    streaming: bool = False
+    bookmarks: bool = False
+    bookmark_names: Optional[List[str]] = None
 
 
 class SplitTask(BaseModel):
@@ -33,8 +52,91 @@ class SplitTask(BaseModel):
     pages_per_file: Optional[int] = 1
 
 
+class RenderItem(BaseModel):
+    page: int
+    zoom: float = 1.0
+    rotation: int = 0
+
+
+class RenderBatchTask(BaseModel):
+    file_path: str
+    pages: List[RenderItem]
+    image_format: str = "png"
+    quality: int = 85
+    container: str = "zip"
+
+
+class NavigationEvent(BaseModel):
+    file_path: str
+    page: int
+    zoom: float = 1.0
+    rotation: int = 0
+    image_format: str = "png"
+    session_id: str = "default"
+
+
+class _StreamBuffer(io.RawIOBase):
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _render_name(result: dict) -> str:
+    ext = "jpg" if result["format"] == "jpeg" else result["format"]
+    return f"page_{result['page']}_{result['zoom']:g}x_{result['rotation']}.{ext}"
+
+
+async def _zip_stream(results):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+        async for result in results:
+            zf.writestr(_render_name(result), result["data"])
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+async def _multipart_stream(results, boundary: str):
+    async for result in results:
+        headers = (
+            f"--{boundary}\r\n"
+            f"Content-Type: {RENDER_FORMATS[result['format']]}\r\n"
+            f"Content-Disposition: attachment; filename=\"{_render_name(result)}\"\r\n"
+            f"X-Page: {result['page']}\r\n"
+            f"X-Zoom: {result['zoom']:g}\r\n"
+            f"X-Rotation: {result['rotation']}\r\n"
+            f"Content-Length: {len(result['data'])}\r\n\r\n"
+        )
+        yield headers.encode("ascii") + result["data"] + b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+async def index_for_search(file_path: str):
+    try:
+        await search_engine.index_document(file_path)
+    except Exception as e:
+        logger.warning(f"Search indexing failed for {file_path}: {e}")
+
+
+async def index_page_text(file_path: str):
+    try:
+        await PageIndex.get(file_path, with_text=True)
+    except Exception as e:
+        logger.warning(f"Page text indexing failed for {file_path}: {e}")
+
+
 @router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
@@ -46,6 +148,8 @@ async def upload_pdf(file: UploadFile = File(...)):
         await f.write(content)
     
     metadata = await pdf_engine.get_metadata(file_path)
+    background_tasks.add_task(index_page_text, file_path)
+    background_tasks.add_task(index_for_search, file_path)
     
     return {
         "path": file_path,
@@ -57,6 +161,15 @@ async def upload_pdf(file: UploadFile = File(...)):
 @router.post("/merge")
 async def merge_pdfs(task: MergeTask):
     try:
+        if task.streaming:
+            stats = await pdf_engine.merge_streaming(task.input_paths, task.output_path)
+            return {"success": True, **stats}
+        if task.deduplicate:
+            stats = await pdf_engine.merge_deduplicated(task.input_paths, task.output_path)
+            return {"success": True, **stats}
+        if task.bookmarks:
+            result = await pdf_engine.merge_with_bookmarks(task.input_paths, task.output_path, task.bookmark_names)
+            return {"success": True, "output_path": result}
         result = await pdf_engine.merge(task.input_paths, task.output_path)
         return {"success": True, "output_path": result}
     except Exception as e:
@@ -87,6 +200,16 @@ async def get_metadata(file_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/pages/{file_path:path}")
+async def get_page_info(file_path: str):
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        return {"pages": await pdf_engine.get_page_info(file_path)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/rotate")
 async def rotate_pages(
     input_path: str,
@@ -114,7 +237,9 @@ async def add_watermark(request: WatermarkRequest):
             request.font_color,
             request.opacity,
             request.rotation,
-            request.position
+            request.position,
+            request.pages,
+            request.layer
         )
         return {"success": True, "output_path": result}
     except Exception as e:
@@ -143,6 +268,28 @@ async def extract_text(input_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/extract/positions")
+async def extract_positions(input_path: str, output_format: str = "binary"):
+    if output_format not in POSITION_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {output_format}")
+    try:
+        positions = await pdf_engine.extract_with_position(input_path)
+        if output_format == "json":
+            return positions.to_columns()
+        if output_format == "arrow":
+            try:
+                data = positions.to_arrow_ipc()
+            except ImportError:
+                raise HTTPException(status_code=400, detail="Arrow output requires pyarrow")
+        else:
+            data = positions.to_bytes()
+        return Response(content=data, media_type=POSITION_FORMATS[output_format])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/extract/images")
 async def extract_images(input_path: str, output_dir: str):
     try:
@@ -161,6 +308,105 @@ async def extract_tables(input_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/thumbnails/{file_path:path}")
+async def get_thumbnails(
+    file_path: str,
+    width: int = 160,
+    image_format: str = "webp",
+    quality: int = 75
+):
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        return await ThumbnailGenerator.generate(file_path, width, image_format, quality)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/render/batch")
+async def render_batch(task: RenderBatchTask):
+    if not os.path.exists(task.file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if task.container not in ("zip", "multipart"):
+        raise HTTPException(status_code=400, detail=f"Unsupported container: {task.container}")
+    try:
+        image_format = normalize_render_format(task.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        metadata = await pdf_engine.get_metadata(task.file_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    invalid = [item.page for item in task.pages if not 1 <= item.page <= metadata["page_count"]]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid page numbers: {invalid}")
+    
+    results = pdf_engine.iter_render_pages(
+        task.file_path,
+        [(item.page, item.zoom, item.rotation) for item in task.pages],
+        image_format,
+        task.quality
+    )
+    
+    if task.container == "zip":
+        return StreamingResponse(
+            _zip_stream(results),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=pages.zip"}
+        )
+    
+    boundary = uuid.uuid4().hex
+    return StreamingResponse(
+        _multipart_stream(results, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}"
+    )
+
+
+@router.get("/render/page/{file_path:path}")
+async def render_page(
+    file_path: str,
+    page: int = 1,
+    zoom: float = 1.0,
+    rotation: int = 0,
+    image_format: str = "png",
+    session_id: str = "default"
+):
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        data = await page_prefetcher.render(session_id, file_path, page, zoom, rotation, image_format)
+        return Response(content=data, media_type=RENDER_FORMATS[normalize_render_format(image_format)])
+    except (ValueError, IndexError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/viewer/navigation")
+async def report_navigation(event: NavigationEvent):
+    if not os.path.exists(event.file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        prefetch = page_prefetcher.navigate(
+            event.session_id,
+            event.file_path,
+            event.page,
+            event.zoom,
+            event.rotation,
+            event.image_format
+        )
+        return {"success": True, "prefetch": [{"page": p, "zoom": z} for p, z in prefetch]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/viewer/cache")
+async def render_cache_stats():
+    return page_prefetcher.cache.stats()
+
+
 @router.get("/download/{file_path:path}")
 async def download_file(file_path: str):
     if not os.path.exists(file_path):
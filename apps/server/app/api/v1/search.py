@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.core.search_engine.engine import SearchEngine
+
+router = APIRouter()
+search_engine = SearchEngine()
+
+
+class IndexTask(BaseModel):
+    file_paths: List[str]
+    force: bool = False
+
+
+@router.post("/index")
+async def index_documents(task: IndexTask):
+    try:
+        results = [await search_engine.index_document(path, task.force) for path in task.file_paths]
+        return {"success": True, "documents": results}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/index/{file_path:path}")
+async def remove_from_index(file_path: str):
+    try:
+        removed = await search_engine.remove_document(file_path)
+        return {"success": True, "removed": removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("")
+async def search(
+    q: str = Query(..., min_length=1),
+    file_path: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0)
+):
+    try:
+        hits = await search_engine.search(q, file_path, limit, offset)
+        return {"query": q, "hits": hits}
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
-from typing import Optional
+from typing import Optional, List, Dict
 from pydantic import BaseModel
+import re
 
 from app.core.security_engine.engine import SecurityEngine
+from app.schemas.security import AutoRedactOptions, SignatureAppearance
 
 router = APIRouter()
 security_engine = SecurityEngine()
@@ -19,6 +21,7 @@ class EncryptRequest(BaseModel):
         "modify": False,
         "annotate": True,
     }
+    method: str = "aes-256"
 
 
 class DecryptRequest(BaseModel):
@@ -34,6 +37,14 @@ class SignRequest(BaseModel):
     certificate_password: str
     reason: Optional[str] = None
     location: Optional[str] = None
+    contact: Optional[str] = None
+    page_number: int = 1
+    position: Optional[Dict[str, float]] = None
+    appearance: Optional[SignatureAppearance] = None
+
+
+class PermissionsRequest(BaseModel):
+    file_paths: List[str]
 
 
 @router.post("/encrypt")
@@ -44,7 +55,8 @@ async def encrypt_pdf(request: EncryptRequest):
             request.output_path,
             request.user_password,
             request.owner_password,
-            request.permissions
+            request.permissions,
+            request.method
         )
         return {"success": True, "output_path": result}
     except Exception as e:
@@ -73,7 +85,11 @@ async def sign_pdf(request: SignRequest):
             request.certificate_path,
             request.certificate_password,
             request.reason,
-            request.location
+            request.location,
+            request.contact,
+            request.page_number,
+            request.position,
+            request.appearance.dict() if request.appearance else None
         )
         return {"success": True, "output_path": result}
     except Exception as e:
@@ -89,6 +105,15 @@ async def verify_signature(file_path: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/permissions")
+async def get_permissions_batch(request: PermissionsRequest):
+    try:
+        results = await security_engine.get_permissions_batch(request.file_paths)
+        return {"files": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/permissions/{file_path:path}")
 async def get_permissions(file_path: str, password: Optional[str] = None):
     try:
@@ -98,6 +123,31 @@ async def get_permissions(file_path: str, password: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/redact/auto")
+async def auto_redact_pdf(options: AutoRedactOptions):
+    try:
+        report = await security_engine.auto_redact(
+            options.input_path,
+            options.output_path,
+            [p.model_dump() for p in options.patterns],
+            options.color
+        )
+        return {"success": True, **report}
+    except (ValueError, re.error) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/redact/preview")
+async def preview_redactions(input_path: str, redactions: list[dict]):
+    try:
+        results = await security_engine.preview_redactions(input_path, redactions)
+        return {"redactions": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/redact")
 async def redact_pdf(
     input_path: str,
@@ -17,11 +17,18 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "./uploads"
     OUTPUT_DIR: str = "./outputs"
     TEMP_DIR: str = "./temp"
+    CACHE_DIR: str = "./cache"
+    RENDER_CACHE_SIZE: int = 256 * 1024 * 1024
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024
     
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4"
     
+    KDF_ALGORITHM: str = "scrypt"
+    KDF_WORKERS: int = 4
+    KDF_CACHE_SIZE: int = 128
+    KDF_CACHE_TTL: int = 300
+    
     OCR_LANGUAGE: str = "chi_sim+eng"
     OCR_USE_GPU: bool = False
     
@@ -7,6 +7,21 @@ from app.core.pdf_engine.engine import PdfEngine
 from app.core.ocr_engine.engine import OcrEngine
 from app.core.convert_engine.engine import ConvertEngine
 from app.core.security_engine.engine import SecurityEngine
+from app.core.security_engine.batch import DEFAULT_ENCRYPTION_METHOD
+
+SECURITY_OPERATIONS = ("encrypt", "decrypt", "sign")
+WATERMARK_DEFAULTS = {
+    "watermark_type": "text",
+    "watermark_text": None,
+    "watermark_image": None,
+    "font_size": 48,
+    "font_color": "#CCCCCC",
+    "opacity": 0.3,
+    "rotation": -45,
+    "position": "center",
+    "pages": "all",
+    "layer": "over",
+}
 
 
 class BatchEngine:
@@ -25,6 +40,12 @@ class BatchEngine:
         options: Optional[dict] = None,
         progress_callback: Optional[Callable[[int], None]] = None
     ) -> List[dict]:
+        if operation in SECURITY_OPERATIONS:
+            report = await self.process_security(input_paths, operation, output_dir, options, progress_callback)
+            return report["results"]
+        if operation == "watermark":
+            return await self.process_watermark(input_paths, output_dir, options, progress_callback)
+        
         results = []
         total = len(input_paths)
         
@@ -57,6 +78,76 @@ class BatchEngine:
         
         return results
     
+    async def process_watermark(
+        self,
+        input_paths: List[str],
+        output_dir: str,
+        options: Optional[dict] = None,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> List[dict]:
+        options = {**WATERMARK_DEFAULTS, **{key: value for key, value in (options or {}).items() if key in WATERMARK_DEFAULTS}}
+        jobs = [
+            (path, os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}_watermarked.pdf"))
+            for path in input_paths
+        ]
+        # Files are stamped in parallel worker processes
+        results = await self.pdf_engine.add_watermark_batch(jobs, options)
+        for result in results:
+            if result["status"] == "failed":
+                logger.error(f"Failed to process {result['input']}: {result['error']}")
+        if progress_callback:
+            progress_callback(100)
+        return results
+    
+    async def process_security(
+        self,
+        input_paths: List[str],
+        operation: str,
+        output_dir: str,
+        options: Optional[dict] = None,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> dict:
+        options = options or {}
+        suffix = {"encrypt": "encrypted", "decrypt": "decrypted", "sign": "signed"}[operation]
+        jobs = [
+            (path, os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{suffix}.pdf"))
+            for path in input_paths
+        ]
+        
+        if operation == "encrypt":
+            report = await self.security_engine.batch_encrypt(
+                jobs,
+                options.get("password", ""),
+                options.get("owner_password"),
+                options.get("permissions"),
+                options.get("method", DEFAULT_ENCRYPTION_METHOD),
+                progress_callback
+            )
+        elif operation == "sign":
+            # One key load for the whole batch; per-file progress is not tracked
+            report = await self.security_engine.sign_batch(
+                jobs,
+                options.get("certificate_path", ""),
+                options.get("certificate_password", ""),
+                options.get("reason"),
+                options.get("location"),
+                options.get("contact")
+            )
+            if progress_callback:
+                progress_callback(100)
+        else:
+            report = await self.security_engine.batch_decrypt(jobs, options.get("password", ""), progress_callback)
+        
+        for result in report["results"]:
+            if result["status"] == "failed":
+                logger.error(f"Failed to process {result['input']}: {result['error']}")
+        stats = report["stats"]
+        logger.info(
+            f"Batch {operation}: {stats['succeeded']}/{stats['total']} files in {stats['elapsed']:.1f}s, "
+            f"latency {stats['latency']}"
+        )
+        return report
+    
     async def _process_single(
         self,
         input_path: str,
@@ -93,39 +184,6 @@ class BatchEngine:
             level = options.get("level", "medium")
             return await self.pdf_engine.compress(input_path, output_path, level)
         
-        elif operation == "watermark":
-            output_path = os.path.join(output_dir, f"{name}_watermarked.pdf")
-            return await self.pdf_engine.add_watermark(
-                input_path,
-                output_path,
-                options.get("watermark_type", "text"),
-                options.get("watermark_text"),
-                options.get("watermark_image"),
-                options.get("font_size", 48),
-                options.get("font_color", "#CCCCCC"),
-                options.get("opacity", 0.3),
-                options.get("rotation", -45),
-                options.get("position", "center")
-            )
-        
-        elif operation == "encrypt":
-            output_path = os.path.join(output_dir, f"{name}_encrypted.pdf")
-            return await self.security_engine.encrypt(
-                input_path,
-                output_path,
-                options.get("password", ""),
-                options.get("owner_password"),
-                options.get("permissions")
-            )
-        
-        elif operation == "decrypt":
-            output_path = os.path.join(output_dir, f"{name}_decrypted.pdf")
-            return await self.security_engine.decrypt(
-                input_path,
-                output_path,
-                options.get("password", "")
-            )
-        
         elif operation == "ocr":
             output_path = os.path.join(output_dir, f"{name}_ocr.txt")
             return await self.ocr_engine.recognize(
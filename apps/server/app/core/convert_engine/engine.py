@@ -1,11 +1,604 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator, Callable
 import os
+import html
 import asyncio
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
+from app.core.executor import PROCESS_WORKERS, get_process_executor
+
 executor = ThreadPoolExecutor(max_workers=4)
 
+PARALLEL_RENDER_MIN_PAGES = 8
+WORD_CHUNK_PAGES = 20
+PILLOW_IMAGE_FORMATS = {"webp": "WEBP", "avif": "AVIF", "tiff": "TIFF", "bmp": "BMP"}
+SHEET_SAMPLE_ROWS = 200
+FLOWABLE_BATCH_SIZE = 64
+FLOWABLE_LOOKAHEAD = 4
+SHEET_FONT_SIZE = 8
+CJK_FONT = "STSong-Light"
+
+
+def _normalize_image_format(image_format: str) -> str:
+    fmt = image_format.lower().lstrip(".")
+    return "jpeg" if fmt == "jpg" else fmt
+
+
+def _render_page_batch(
+    input_path: str,
+    page_numbers: List[int],
+    output_dir: str,
+    image_format: str,
+    dpi: int,
+    quality: int,
+    colorspace: str
+) -> List[Tuple[int, str]]:
+    import fitz
+
+    fmt = _normalize_image_format(image_format)
+    ext = "jpg" if fmt == "jpeg" else fmt
+    cs = fitz.csRGB if colorspace == "rgb" else fitz.csGRAY
+
+    results = []
+    doc = fitz.open(input_path)
+    try:
+        for page_number in page_numbers:
+            pix = doc[page_number - 1].get_pixmap(dpi=dpi, colorspace=cs)
+            output_file = os.path.join(output_dir, f"page_{page_number}.{ext}")
+            _save_pixmap(pix, output_file, fmt, quality, colorspace)
+            results.append((page_number, output_file))
+    finally:
+        doc.close()
+    return results
+
+
+def _save_pixmap(pix, output_file: str, fmt: str, quality: int, colorspace: str):
+    if colorspace != "mono":
+        if fmt == "png":
+            pix.save(output_file)
+            return
+        if fmt == "jpeg":
+            pix.save(output_file, jpg_quality=quality)
+            return
+
+    from PIL import Image
+
+    mode = "RGB" if pix.n >= 3 else "L"
+    img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+    if colorspace == "mono":
+        img = img.point(lambda v: 255 if v > 127 else 0).convert("1", dither=Image.Dither.NONE)
+        if fmt in ("jpeg", "webp", "avif"):
+            img = img.convert("L")
+
+    if fmt == "png":
+        img.save(output_file, format="PNG", optimize=True)
+    elif fmt == "jpeg":
+        img.save(output_file, format="JPEG", quality=quality, optimize=True)
+    elif fmt == "tiff":
+        compression = "group4" if img.mode == "1" else "tiff_deflate"
+        img.save(output_file, format="TIFF", compression=compression)
+    elif fmt in PILLOW_IMAGE_FORMATS:
+        img.save(output_file, format=PILLOW_IMAGE_FORMATS[fmt], quality=quality)
+    else:
+        raise ValueError(f"Unsupported image format: {fmt}")
+
+
+def _parse_word_chunk(input_path: str, start: int, end: int) -> Dict[str, Any]:
+    from pdf2docx import Converter
+    
+    cv = Converter(input_path)
+    try:
+        settings = cv.default_settings
+        cv.parse(start, end, **settings)
+        return cv.store()
+    finally:
+        cv.close()
+
+
+def _make_docx(input_path: str, output_path: str, chunks: List[Dict[str, Any]]) -> str:
+    from pdf2docx import Converter
+    
+    cv = Converter(input_path)
+    try:
+        cv.load_pages()
+        for data in chunks:
+            cv.restore(data)
+        cv.make_docx(output_path, **cv.default_settings)
+    finally:
+        cv.close()
+    return output_path
+
+
+def _write_table_csv(table: List[List[Optional[str]]], output_file: str):
+    import csv
+    
+    with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
+        csv.writer(f).writerows(table)
+
+
+def _write_table_parquet(table: List[List[Optional[str]]], output_file: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    header = table[0] if table else []
+    columns = []
+    for i, name in enumerate(header):
+        name = name or f"column_{i + 1}"
+        while name in columns:
+            name = f"{name}_{i + 1}"
+        columns.append(name)
+    
+    rows = table[1:]
+    data = {
+        name: [row[i] if i < len(row) else None for row in rows]
+        for i, name in enumerate(columns)
+    }
+    pq.write_table(pa.table(data), output_file)
+
+
+_HTML_FOOTER = "</body>\n</html>\n"
+
+
+def _html_header(title: str) -> str:
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>{html.escape(title)}</title>
+    <style>
+        body {{ background: #f0f0f0; margin: 0; padding: 20px; }}
+        .page {{ position: relative; margin: 0 auto 20px; background: #fff; overflow: hidden; box-shadow: 0 1px 4px rgba(0,0,0,.3); }}
+        .page span {{ position: absolute; white-space: pre; line-height: 1; }}
+        .page img {{ position: absolute; }}
+    </style>
+</head>
+<body>
+"""
+
+
+def _css_font_family(font: str) -> str:
+    name = font.split("+")[-1].replace("'", "").replace('"', "")
+    lower = name.lower()
+    if "courier" in lower or "mono" in lower:
+        generic = "monospace"
+    elif "times" in lower or ("serif" in lower and "sans" not in lower):
+        generic = "serif"
+    else:
+        generic = "sans-serif"
+    return f"'{html.escape(name, quote=True)}', {generic}"
+
+
+def _write_html_page(
+    f,
+    doc,
+    page,
+    assets_dir: str,
+    output_dir: str,
+    written_images: Dict[int, str],
+    extract_images: bool
+):
+    import fitz
+    
+    rect = page.rect
+    f.write(
+        f'<div class="page" id="page-{page.number + 1}" '
+        f'style="width:{rect.width:.1f}px;height:{rect.height:.1f}px">\n'
+    )
+    
+    if extract_images:
+        for index, info in enumerate(page.get_image_info(xrefs=True)):
+            x0, y0, x1, y1 = info["bbox"]
+            if x1 <= x0 or y1 <= y0:
+                continue
+            
+            xref = info.get("xref", 0)
+            if xref and xref in written_images:
+                image_path = written_images[xref]
+            else:
+                os.makedirs(assets_dir, exist_ok=True)
+                if xref:
+                    image = doc.extract_image(xref)
+                    image_path = os.path.join(assets_dir, f"img_{xref}.{image['ext']}")
+                    with open(image_path, "wb") as img_file:
+                        img_file.write(image["image"])
+                    written_images[xref] = image_path
+                else:
+                    image_path = os.path.join(assets_dir, f"inline_{page.number + 1}_{index}.png")
+                    page.get_pixmap(clip=fitz.Rect(x0, y0, x1, y1)).save(image_path)
+            
+            src = os.path.relpath(image_path, output_dir).replace(os.sep, "/")
+            f.write(
+                f'<img src="{html.escape(src, quote=True)}" loading="lazy" alt="" '
+                f'style="left:{x0:.1f}px;top:{y0:.1f}px;width:{x1 - x0:.1f}px;height:{y1 - y0:.1f}px">\n'
+            )
+    
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                text = span["text"]
+                if not text.strip():
+                    continue
+                x0, y0 = span["bbox"][:2]
+                style = (
+                    f"left:{x0:.1f}px;top:{y0:.1f}px;font-size:{span['size']:.1f}px;"
+                    f"font-family:{_css_font_family(span['font'])};color:#{span['color']:06x}"
+                )
+                if span["flags"] & 16:
+                    style += ";font-weight:bold"
+                if span["flags"] & 2:
+                    style += ";font-style:italic"
+                f.write(f'<span style="{style}">{html.escape(text)}</span>\n')
+    
+    f.write("</div>\n")
+
+
+@lru_cache(maxsize=None)
+def _sheet_font(font_name: str):
+    import fitz
+    
+    return fitz.Font(font_name)
+
+
+@lru_cache(maxsize=None)
+def _glyph_width(ch: str, font_name: str) -> float:
+    return _sheet_font(font_name).text_length(ch, fontsize=1)
+
+
+def _text_width(text: str, font_name: str, font_size: float) -> float:
+    return sum(_glyph_width(ch, font_name) for ch in text) * font_size
+
+
+@lru_cache(maxsize=1)
+def _register_cjk_font() -> str:
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    
+    pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+    return CJK_FONT
+
+
+def _needs_cjk_font(text: str) -> bool:
+    return any(ord(ch) > 0xFF for ch in text)
+
+
+def _build_pdf_document(output_path: str, flowables, margin: float):
+    from itertools import islice
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate
+    
+    doc = BaseDocTemplate(
+        output_path,
+        pagesize=letter,
+        leftMargin=margin,
+        rightMargin=margin,
+        topMargin=margin,
+        bottomMargin=margin
+    )
+    doc.addPageTemplates([
+        PageTemplate(id="Normal", frames=[Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height)])
+    ])
+    # Same steps as doc.build, but the story is pulled from the generator in
+    # batches instead of being materialised as one list up front. A few
+    # flowables stay queued so keepWithNext groups can still see what follows.
+    source = iter(flowables)
+    pending = []
+    doc._startBuild()
+    doc.canv._doctemplate = doc
+    try:
+        while True:
+            batch = list(islice(source, FLOWABLE_BATCH_SIZE))
+            pending.extend(batch)
+            keep = FLOWABLE_LOOKAHEAD if batch else 0
+            while len(pending) > keep:
+                doc.clean_hanging()
+                doc.handle_flowable(pending)
+            if not batch:
+                break
+    finally:
+        del doc.canv._doctemplate
+    doc._endBuild()
+
+
+def _docx_run_markup(run) -> str:
+    from xml.sax.saxutils import escape
+    
+    text = escape(run.text)
+    if not text:
+        return ""
+    if run.bold:
+        text = f"<b>{text}</b>"
+    if run.italic:
+        text = f"<i>{text}</i>"
+    if run.underline:
+        text = f"<u>{text}</u>"
+    return text
+
+
+def _docx_flowables(document, frame_width: float):
+    from docx.table import Table as DocxTable
+    from docx.text.paragraph import Paragraph as DocxParagraph
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import LongTable, PageBreak, Paragraph, Spacer, TableStyle
+    
+    sample_styles = getSampleStyleSheet()
+    alignments = {1: TA_CENTER, 2: TA_RIGHT, 3: TA_JUSTIFY}
+    style_cache: Dict[Tuple[str, int, bool], ParagraphStyle] = {}
+    
+    def _style(base_name: str, alignment: int, cjk: bool) -> ParagraphStyle:
+        key = (base_name, alignment, cjk)
+        if key not in style_cache:
+            base = sample_styles[base_name]
+            style_cache[key] = ParagraphStyle(
+                f"{base_name}_{alignment}_{int(cjk)}",
+                parent=base,
+                alignment=alignment,
+                fontName=_register_cjk_font() if cjk else base.fontName,
+                wordWrap="CJK" if cjk else None
+            )
+        return style_cache[key]
+    
+    def _base_style_name(para) -> str:
+        name = para.style.name if para.style is not None else ""
+        if name == "Title":
+            return "Title"
+        if name.startswith("Heading"):
+            level = name.replace("Heading", "").strip()
+            return f"Heading{min(int(level), 6)}" if level.isdigit() else "Heading1"
+        return "Normal"
+    
+    table_style = TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ])
+    
+    for child in document.element.body.iterchildren():
+        tag = child.tag.rsplit("}", 1)[-1]
+        
+        if tag == "p":
+            para = DocxParagraph(child, document)
+            markup = "".join(_docx_run_markup(run) for run in para.runs)
+            if markup.strip():
+                alignment = alignments.get(int(para.alignment or 0), TA_LEFT)
+                style = _style(_base_style_name(para), alignment, _needs_cjk_font(para.text))
+                bullet = "\u2022" if para.style is not None and para.style.name.startswith("List") else None
+                yield Paragraph(markup, style, bulletText=bullet)
+            else:
+                yield Spacer(1, 6)
+            if child.xpath('.//w:br[@w:type="page"]'):
+                yield PageBreak()
+        
+        elif tag == "tbl":
+            table = DocxTable(child, document)
+            rows = []
+            for row in table.rows:
+                rows.append([
+                    Paragraph(
+                        "<br/>".join(_docx_run_markup(run) for p in cell.paragraphs for run in p.runs),
+                        _style("Normal", TA_LEFT, _needs_cjk_font(cell.text))
+                    )
+                    for cell in row.cells
+                ])
+            if rows:
+                columns = max(len(row) for row in rows)
+                rows = [row + [""] * (columns - len(row)) for row in rows]
+                yield LongTable(rows, colWidths=[frame_width / columns] * columns, style=table_style, repeatRows=1)
+                yield Spacer(1, 6)
+
+
+def _format_sheet_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ") if hasattr(value, "hour") and hasattr(value, "date") else value.isoformat()
+    return str(value)
+
+
+def _pdf_text(text: str, cjk: bool) -> str:
+    # helv is WinAnsi-encoded, china-s uses UniGB-UTF16-H
+    if cjk:
+        return text.encode("utf-16-be").hex()
+    return text.encode("cp1252", "replace").hex()
+
+
+def _wrap_cell(text: str, width: float, font_name: str, max_lines: int) -> List[str]:
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        if _text_width(paragraph, font_name, SHEET_FONT_SIZE) <= width:
+            lines.append(paragraph)
+            continue
+        start = 0
+        line_width = 0.0
+        last_space = -1
+        for i, ch in enumerate(paragraph):
+            advance = _glyph_width(ch, font_name) * SHEET_FONT_SIZE
+            if line_width + advance > width and i > start:
+                if last_space > start:
+                    lines.append(paragraph[start:last_space])
+                    start = last_space + 1
+                else:
+                    lines.append(paragraph[start:i])
+                    start = i
+                line_width = _text_width(paragraph[start:i], font_name, SHEET_FONT_SIZE)
+                last_space = -1
+            if ch == " ":
+                last_space = i
+            line_width += advance
+        lines.append(paragraph[start:])
+    
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1][:-1] + "\u2026" if lines[-1] else "\u2026"
+    return lines
+
+
+class _SheetPageWriter:
+    # Lays sheet rows out as a grid and writes each page's content stream
+    # directly, so rendering cost stays linear in the number of cells.
+    def __init__(self, doc):
+        self.doc = doc
+        self.page = None
+        self.resources_xref = 0
+    
+    def start_sheet(self, title: str, columns: int, widths: List[float], landscape: bool, header: Optional[List[str]]):
+        self.widths = widths
+        self.columns = columns
+        self.header = header
+        self.page_width, self.page_height = (792, 612) if landscape else (612, 792)
+        self.margin = 36
+        self.leading = SHEET_FONT_SIZE + 2
+        self.padding = 2
+        self.max_lines = int((self.page_height - 2 * self.margin - 40) / self.leading) - 1
+        self._new_page(title)
+    
+    def _new_page(self, title: Optional[str] = None):
+        self.finish_page()
+        self.page = self.doc.new_page(width=self.page_width, height=self.page_height)
+        self._share_resources()
+        self.text_ops = ["BT"]
+        self.line_ops = []
+        self.active_font = None
+        self.y = self.margin
+        self.table_top = self.y
+        if title is not None:
+            title_cjk = _needs_cjk_font(title)
+            self.text_ops.append(
+                f"/{'china-s' if title_cjk else 'helv'} 12 Tf 1 0 0 1 {self.margin} "
+                f"{self.page_height - self.y - 12:.2f} Tm <{_pdf_text(title, title_cjk)}> Tj"
+            )
+            self.y += 20
+            self.table_top = self.y
+        if self.header is not None and title is None:
+            self.add_row(self.header)
+    
+    def _share_resources(self):
+        # insert_font is costly per page; register both fonts once and point
+        # every page at the same resource dictionary.
+        if not self.resources_xref:
+            fonts = {
+                name: self.page.insert_font(fontname=name)
+                for name in ("helv", "china-s")
+            }
+            self.resources_xref = self.doc.get_new_xref()
+            font_refs = " ".join(f"/{name} {xref} 0 R" for name, xref in fonts.items())
+            self.doc.update_object(self.resources_xref, f"<</Font <<{font_refs}>>>>")
+        self.doc.xref_set_key(self.page.xref, "Resources", f"{self.resources_xref} 0 R")
+    
+    def _set_font(self, font: str):
+        if font != self.active_font:
+            self.text_ops.append(f"/{font} {SHEET_FONT_SIZE} Tf")
+            self.active_font = font
+    
+    def add_row(self, cells: List[str]):
+        # The font is chosen per cell; both are in the shared resources, and
+        # helv's WinAnsi encoding cannot carry CJK text
+        fonts = ["china-s" if _needs_cjk_font(text) else "helv" for text in cells[:self.columns]]
+        wrapped = [
+            _wrap_cell(text, self.widths[i] - 2 * self.padding, fonts[i], self.max_lines)
+            for i, text in enumerate(cells[:self.columns])
+        ]
+        height = max((len(lines) for lines in wrapped), default=1) * self.leading + 2 * self.padding
+        if self.y + height > self.page_height - self.margin and self.y > self.table_top:
+            self._new_page()
+        
+        if self.y == self.table_top:
+            self.line_ops.append(self._hline(self.y))
+        x = self.margin
+        for i, lines in enumerate(wrapped):
+            baseline = self.y + self.padding + SHEET_FONT_SIZE
+            for line in lines:
+                if line:
+                    self._set_font(fonts[i])
+                    self.text_ops.append(
+                        f"1 0 0 1 {x + self.padding:.2f} {self.page_height - baseline:.2f} Tm "
+                        f"<{_pdf_text(line, fonts[i] == 'china-s')}> Tj"
+                    )
+                baseline += self.leading
+            x += self.widths[i]
+        self.y += height
+        self.line_ops.append(self._hline(self.y))
+    
+    def _hline(self, y: float) -> str:
+        return f"{self.margin:.2f} {self.page_height - y:.2f} m {self.margin + sum(self.widths):.2f} {self.page_height - y:.2f} l"
+    
+    def finish_page(self):
+        if self.page is None:
+            return
+        
+        if self.y > self.table_top:
+            x = self.margin
+            top = self.page_height - self.table_top
+            bottom = self.page_height - self.y
+            for width in [0] + self.widths:
+                x += width
+                self.line_ops.append(f"{x:.2f} {top:.2f} m {x:.2f} {bottom:.2f} l")
+        
+        content = "q 0.6 G 0.25 w " + " ".join(self.line_ops) + " S Q\n" + "\n".join(self.text_ops) + "\nET\n"
+        xref = self.doc.get_new_xref()
+        self.doc.update_object(xref, "<<>>")
+        self.doc.update_stream(xref, content.encode("latin-1"))
+        self.doc.xref_set_key(self.page.xref, "Contents", f"{xref} 0 R")
+        self.page = None
+
+
+def _sheet_column_widths(sample: List[List[str]], columns: int, font_name: str, frame_width: float) -> List[float]:
+    widths = [24.0] * columns
+    for row in sample:
+        for i, text in enumerate(row[:columns]):
+            widths[i] = max(widths[i], min(_text_width(text, font_name, SHEET_FONT_SIZE) + 6, 200.0))
+    
+    total = sum(widths)
+    if total > frame_width:
+        scale = frame_width / total
+        widths = [w * scale for w in widths]
+    return widths
+
+
+def _render_workbook(workbook, output_path: str):
+    import fitz
+    from itertools import chain, islice
+    
+    doc = fitz.open()
+    writer = _SheetPageWriter(doc)
+    portrait_width, landscape_width = 612 - 72, 792 - 72
+    
+    for sheet in workbook.worksheets:
+        rows = (
+            [_format_sheet_cell(value) for value in row]
+            for row in sheet.iter_rows(values_only=True)
+        )
+        sample = list(islice(rows, SHEET_SAMPLE_ROWS))
+        columns = max((len(row) for row in sample), default=0)
+        cjk = any(_needs_cjk_font(text) for row in sample for text in row)
+        font_name = "china-s" if cjk else "helv"
+        
+        natural_width = sum(_sheet_column_widths(sample, columns, font_name, float("inf")))
+        landscape = natural_width > portrait_width
+        widths = _sheet_column_widths(sample, columns, font_name, landscape_width if landscape else portrait_width)
+        
+        header = sample[0] + [""] * (columns - len(sample[0])) if sample else None
+        writer.start_sheet(sheet.title, columns, widths, landscape, header)
+        for row in chain(sample, rows):
+            writer.add_row(row + [""] * (columns - len(row)))
+    
+    writer.finish_page()
+    if doc.page_count == 0:
+        doc.new_page()
+    doc.save(output_path, garbage=3, deflate=True)
+    doc.close()
+
+
+def _chunk_pages(page_numbers: List[int], chunk_count: int) -> List[List[int]]:
+    chunk_size = max(1, -(-len(page_numbers) // chunk_count))
+    return [
+        page_numbers[i:i + chunk_size]
+        for i in range(0, len(page_numbers), chunk_size)
+    ]
+
 
 class ConvertEngine:
     def __init__(self):
@@ -15,47 +608,96 @@ class ConvertEngine:
         self,
         input_path: str,
         output_path: str,
-        quality: str = "high"
+        quality: str = "high",
+        progress_callback: Optional[Callable[[int, int], None]] = None
     ) -> str:
-        def _convert():
-            try:
-                from pdf2docx import Converter
-                
-                cv = Converter(input_path)
-                cv.convert(output_path)
-                cv.close()
-                
-                return output_path
-            except ImportError:
-                logger.warning("pdf2docx not installed")
-                raise RuntimeError("PDF to Word conversion requires pdf2docx package")
+        try:
+            import pdf2docx
+        except ImportError:
+            logger.warning("pdf2docx not installed")
+            raise RuntimeError("PDF to Word conversion requires pdf2docx package")
+        
+        import fitz
+        
+        doc = fitz.open(input_path)
+        page_count = doc.page_count
+        doc.close()
+        
+        ranges = [
+            (start, min(start + WORD_CHUNK_PAGES, page_count))
+            for start in range(0, page_count, WORD_CHUNK_PAGES)
+        ]
+        pool = get_process_executor() if len(ranges) > 1 else executor
         
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _convert)
+        
+        async def _parse_chunk(start: int, end: int):
+            data = await loop.run_in_executor(pool, _parse_word_chunk, input_path, start, end)
+            return end - start, data
+        
+        tasks = [asyncio.ensure_future(_parse_chunk(start, end)) for start, end in ranges]
+        
+        chunks = []
+        completed = 0
+        try:
+            for task in asyncio.as_completed(tasks):
+                chunk_pages, data = await task
+                chunks.append(data)
+                completed += chunk_pages
+                if progress_callback:
+                    progress_callback(completed, page_count)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return await loop.run_in_executor(executor, _make_docx, input_path, output_path, chunks)
     
-    async def pdf_to_excel(self, input_path: str, output_path: str) -> str:
+    async def pdf_to_excel(
+        self,
+        input_path: str,
+        output_path: str,
+        csv_dir: Optional[str] = None,
+        parquet_dir: Optional[str] = None
+    ) -> str:
         def _convert():
             try:
                 import pdfplumber
-                import pandas as pd
-                
-                all_tables = []
-                with pdfplumber.open(input_path) as pdf:
-                    for page in pdf.pages:
-                        tables = page.extract_tables()
-                        for table in tables:
-                            df = pd.DataFrame(table[1:], columns=table[0])
-                            all_tables.append(df)
-                
-                if all_tables:
-                    with pd.ExcelWriter(output_path) as writer:
-                        for i, df in enumerate(all_tables):
-                            df.to_excel(writer, sheet_name=f'Table_{i+1}', index=False)
-                
-                return output_path
+                from openpyxl import Workbook
             except ImportError:
-                logger.warning("pdfplumber or pandas not installed")
-                raise RuntimeError("PDF to Excel conversion requires pdfplumber and pandas packages")
+                logger.warning("pdfplumber or openpyxl not installed")
+                raise RuntimeError("PDF to Excel conversion requires pdfplumber and openpyxl packages")
+            
+            if parquet_dir:
+                try:
+                    import pyarrow
+                except ImportError:
+                    raise RuntimeError("Parquet output requires pyarrow package")
+            
+            from app.core.pdf_engine.extractor.text import TableExtractor
+            
+            wb = Workbook(write_only=True)
+            for path in (csv_dir, parquet_dir):
+                if path:
+                    os.makedirs(path, exist_ok=True)
+            
+            table_count = 0
+            for _, table in TableExtractor.iter_tables(input_path):
+                table_count += 1
+                sheet = wb.create_sheet(title=f"Table_{table_count}")
+                for row in table:
+                    sheet.append(row)
+                
+                if csv_dir:
+                    _write_table_csv(table, os.path.join(csv_dir, f"table_{table_count}.csv"))
+                if parquet_dir:
+                    _write_table_parquet(table, os.path.join(parquet_dir, f"table_{table_count}.parquet"))
+            
+            if table_count == 0:
+                wb.create_sheet(title="Sheet1")
+            
+            wb.save(output_path)
+            return output_path
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _convert)
@@ -110,55 +752,124 @@ class ConvertEngine:
         input_path: str,
         output_dir: str,
         image_format: str = "png",
-        dpi: int = 150
+        dpi: int = 150,
+        pages: Optional[List[int]] = None,
+        quality: int = 85,
+        colorspace: str = "rgb"
     ) -> List[str]:
-        def _convert():
-            import fitz
-            
-            doc = fitz.open(input_path)
-            output_files = []
-            
-            for i, page in enumerate(doc):
-                pix = page.get_pixmap(dpi=dpi)
-                output_file = os.path.join(output_dir, f"page_{i+1}.{image_format}")
-                pix.save(output_file)
-                output_files.append(output_file)
-            
-            doc.close()
-            return output_files
+        results = {}
+        async for item in self.iter_pdf_to_image(
+            input_path, output_dir, image_format, dpi, pages, quality, colorspace
+        ):
+            results[item["page"]] = item["path"]
+        return [results[page] for page in sorted(results)]
+    
+    async def iter_pdf_to_image(
+        self,
+        input_path: str,
+        output_dir: str,
+        image_format: str = "png",
+        dpi: int = 150,
+        pages: Optional[List[int]] = None,
+        quality: int = 85,
+        colorspace: str = "rgb"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        import fitz
+        
+        fmt = _normalize_image_format(image_format)
+        if fmt not in ("png", "jpeg") and fmt not in PILLOW_IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        if fmt == "avif":
+            from PIL import features
+            if not features.check("avif"):
+                raise RuntimeError("AVIF output requires Pillow built with libavif")
+        if colorspace not in ("rgb", "gray", "mono"):
+            raise ValueError(f"Unsupported colorspace: {colorspace}")
+        
+        doc = fitz.open(input_path)
+        page_count = doc.page_count
+        doc.close()
+        
+        if pages:
+            page_numbers = sorted({p for p in pages if 1 <= p <= page_count})
+        else:
+            page_numbers = list(range(1, page_count + 1))
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        if len(page_numbers) < PARALLEL_RENDER_MIN_PAGES:
+            batches = [[p] for p in page_numbers]
+            pool = executor
+        else:
+            batches = _chunk_pages(page_numbers, PROCESS_WORKERS * 4)
+            pool = get_process_executor()
         
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _convert)
+        futures = [
+            loop.run_in_executor(
+                pool,
+                _render_page_batch,
+                input_path,
+                batch,
+                output_dir,
+                fmt,
+                dpi,
+                quality,
+                colorspace
+            )
+            for batch in batches
+        ]
+        
+        try:
+            for future in asyncio.as_completed(futures):
+                for page_number, output_file in await future:
+                    yield {"page": page_number, "path": output_file}
+        finally:
+            for future in futures:
+                future.cancel()
     
-    async def pdf_to_html(self, input_path: str, output_path: str) -> str:
+    async def pdf_to_html(
+        self,
+        input_path: str,
+        output_path: str,
+        split_pages: bool = False,
+        extract_images: bool = True
+    ) -> str:
         def _convert():
             import fitz
             
-            doc = fitz.open(input_path)
+            output_dir = os.path.dirname(os.path.abspath(output_path))
+            stem = os.path.splitext(os.path.basename(output_path))[0]
+            assets_dir = os.path.join(output_dir, f"{stem}_files")
+            written_images: Dict[int, str] = {}
             
-            html_content = """<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>PDF Export</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 20px; }
-        .page { margin-bottom: 20px; border-bottom: 1px solid #ccc; padding-bottom: 20px; }
-    </style>
-</head>
-<body>
-"""
-            
-            for i, page in enumerate(doc):
-                text = page.get_text()
-                html_content += f'<div class="page"><h3>Page {i+1}</h3><pre>{text}</pre></div>\n'
-            
-            html_content += "</body></html>"
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            doc = fitz.open(input_path)
+            try:
+                if split_pages:
+                    with open(output_path, "w", encoding="utf-8") as index:
+                        index.write(_html_header(doc.metadata.get("title") or stem))
+                        index.write('<ol class="page-index">\n')
+                        for page in doc:
+                            page_file = f"{stem}_page_{page.number + 1}.html"
+                            with open(os.path.join(output_dir, page_file), "w", encoding="utf-8") as f:
+                                f.write(_html_header(f"{stem} - {page.number + 1}"))
+                                _write_html_page(f, doc, page, assets_dir, output_dir, written_images, extract_images)
+                                f.write(_HTML_FOOTER)
+                            index.write(
+                                f'<li><a href="{html.escape(page_file, quote=True)}">'
+                                f'Page {page.number + 1}</a></li>\n'
+                            )
+                        index.write("</ol>\n")
+                        index.write(_HTML_FOOTER)
+                else:
+                    with open(output_path, "w", encoding="utf-8") as f:
+                        f.write(_html_header(doc.metadata.get("title") or stem))
+                        for page in doc:
+                            _write_html_page(f, doc, page, assets_dir, output_dir, written_images, extract_images)
+                        f.write(_HTML_FOOTER)
+            finally:
+                doc.close()
             
-            doc.close()
             return output_path
         
         loop = asyncio.get_event_loop()
@@ -169,31 +880,15 @@ class ConvertEngine:
             try:
                 from docx import Document
                 from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
                 from reportlab.lib.units import inch
-                
-                doc = Document(input_path)
-                
-                c = canvas.Canvas(output_path, pagesize=letter)
-                width, height = letter
-                
-                y = height - inch
-                
-                for para in doc.paragraphs:
-                    text = para.text
-                    if text.strip():
-                        if y < inch:
-                            c.showPage()
-                            y = height - inch
-                        
-                        c.drawString(inch, y, text[:100])
-                        y -= 14
-                
-                c.save()
-                return output_path
             except ImportError:
                 logger.warning("python-docx or reportlab not installed")
                 raise RuntimeError("Word to PDF conversion requires python-docx and reportlab packages")
+            
+            document = Document(input_path)
+            frame_width = letter[0] - 2 * inch
+            _build_pdf_document(output_path, _docx_flowables(document, frame_width), margin=inch)
+            return output_path
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _convert)
@@ -202,59 +897,44 @@ class ConvertEngine:
         def _convert():
             try:
                 import openpyxl
-                from reportlab.lib.pagesizes import letter
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.units import inch
-                
-                wb = openpyxl.load_workbook(input_path)
-                
-                c = canvas.Canvas(output_path, pagesize=letter)
-                width, height = letter
-                
-                y = height - inch
-                
-                for sheet in wb.worksheets:
-                    c.drawString(inch, y, f"Sheet: {sheet.title}")
-                    y -= 20
-                    
-                    for row in sheet.iter_rows(values_only=True):
-                        if y < inch:
-                            c.showPage()
-                            y = height - inch
-                        
-                        row_text = ' | '.join(str(cell or '') for cell in row)
-                        c.drawString(inch, y, row_text[:80])
-                        y -= 14
-                
-                c.save()
-                return output_path
             except ImportError:
-                logger.warning("openpyxl or reportlab not installed")
-                raise RuntimeError("Excel to PDF conversion requires openpyxl and reportlab packages")
+                logger.warning("openpyxl not installed")
+                raise RuntimeError("Excel to PDF conversion requires openpyxl package")
+            
+            wb = openpyxl.load_workbook(input_path, read_only=True, data_only=True)
+            try:
+                _render_workbook(wb, output_path)
+            finally:
+                wb.close()
+            return output_path
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _convert)
     
-    async def images_to_pdf(self, input_paths: List[str], output_path: str) -> str:
+    async def images_to_pdf(
+        self,
+        input_paths: List[str],
+        output_path: str,
+        page_size: str = "fit",
+        orientation: str = "portrait",
+        margin: float = 0,
+        align: str = "center",
+        custom_width: Optional[float] = None,
+        custom_height: Optional[float] = None
+    ) -> str:
         def _convert():
-            import fitz
-            
-            doc = fitz.open()
+            from app.core.pdf_engine.writer import write_images_to_pdf
             
-            for img_path in input_paths:
-                img_doc = fitz.open(img_path)
-                rect = img_doc[0].rect
-                pdf_bytes = img_doc.convert_to_pdf()
-                img_doc.close()
-                
-                img_pdf = fitz.open("pdf", pdf_bytes)
-                page = doc.new_page(width=rect.width, height=rect.height)
-                page.show_pdf_page(rect, img_pdf, 0)
-                img_pdf.close()
-            
-            doc.save(output_path)
-            doc.close()
-            return output_path
+            return write_images_to_pdf(
+                input_paths,
+                output_path,
+                page_size=page_size,
+                orientation=orientation,
+                margin=margin,
+                align=align,
+                custom_width=custom_width,
+                custom_height=custom_height
+            )
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _convert)
@@ -0,0 +1,27 @@
+import os
+import threading
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+PROCESS_WORKERS = os.cpu_count() or 2
+
+_process_executor: Optional[ProcessPoolExecutor] = None
+_process_executor_lock = threading.Lock()
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """Return the process pool shared by every engine, creating it on first use"""
+    global _process_executor
+    with _process_executor_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        return _process_executor
+
+
+def shutdown_process_executor() -> None:
+    """Stop the shared process pool; a later call to get_process_executor starts a new one"""
+    global _process_executor
+    with _process_executor_lock:
+        pool, _process_executor = _process_executor, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
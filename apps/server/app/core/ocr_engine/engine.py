@@ -146,17 +146,36 @@ class OcrEngine:
         self,
         input_path: str,
         region: tuple,
-        language: str = "chi_sim+eng"
+        language: str = "chi_sim+eng",
+        page: int = 1
     ) -> str:
         def _recognize_region():
+            is_pdf = input_path.lower().endswith(".pdf")
+            if is_pdf:
+                from app.core.pdf_engine.spatial import DocumentSpatialIndex
+                
+                # Born-digital regions already carry text; OCR only scanned ones
+                spans = DocumentSpatialIndex.for_file(input_path).text_in_rect(page, region)
+                lines = [line["text"] for line in spans.group_lines() if line["text"].strip()]
+                if lines:
+                    return '\n'.join(lines)
+            
             ocr = self._get_ocr()
             if ocr is None:
                 raise RuntimeError("OCR engine not available")
             
             from PIL import Image
             
-            img = Image.open(input_path)
-            cropped = img.crop(region)
+            if is_pdf:
+                import fitz
+                
+                doc = fitz.open(input_path)
+                pix = doc[page - 1].get_pixmap(dpi=300, clip=fitz.Rect(region))
+                doc.close()
+                cropped = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            else:
+                img = Image.open(input_path)
+                cropped = img.crop(region)
             
             import tempfile
             with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
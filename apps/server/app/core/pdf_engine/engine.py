@@ -1,12 +1,18 @@
 import fitz
 import pikepdf
-import pdfplumber
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 import os
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
+from app.core.pdf_engine.extractor.positioned import PositionedText
+from app.core.pdf_engine.extractor.text import TableExtractor, TextExtractor
+from app.core.pdf_engine.page_index import PageIndex
+from app.core.pdf_engine.renderer import PageRenderer, render_page_image
+from app.core.pdf_engine.merger import merge_deduplicated, merge_streaming, merge_with_outline
+from app.core.pdf_engine.watermark import apply_watermark, watermark_files
+
 executor = ThreadPoolExecutor(max_workers=4)
 
 
@@ -15,24 +21,12 @@ class PdfEngine:
         pass
     
     async def get_metadata(self, file_path: str) -> Dict[str, Any]:
-        def _get_metadata():
-            doc = fitz.open(file_path)
-            metadata = doc.metadata
-            return {
-                "title": metadata.get("title", ""),
-                "author": metadata.get("author", ""),
-                "subject": metadata.get("subject", ""),
-                "keywords": metadata.get("keywords", ""),
-                "creator": metadata.get("creator", ""),
-                "producer": metadata.get("producer", ""),
-                "creation_date": metadata.get("creationDate", ""),
-                "modification_date": metadata.get("modDate", ""),
-                "page_count": doc.page_count,
-                "file_size": os.path.getsize(file_path),
-            }
-        
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _get_metadata)
+        index = await PageIndex.get(file_path)
+        return {
+            **index.metadata,
+            "page_count": index.page_count,
+            "file_size": os.path.getsize(file_path),
+        }
     
     async def merge(self, input_paths: List[str], output_path: str) -> str:
         def _merge():
@@ -48,6 +42,23 @@ class PdfEngine:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _merge)
     
+    async def merge_deduplicated(self, input_paths: List[str], output_path: str) -> Dict[str, Any]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, merge_deduplicated, input_paths, output_path)
+    
+    async def merge_streaming(self, input_paths: List[str], output_path: str) -> Dict[str, Any]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, merge_streaming, input_paths, output_path)
+    
+    async def merge_with_bookmarks(
+        self,
+        input_paths: List[str],
+        output_path: str,
+        bookmark_names: Optional[List[str]] = None
+    ) -> str:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, merge_with_outline, input_paths, output_path, bookmark_names)
+    
     async def split(
         self,
         input_path: str,
@@ -141,46 +152,32 @@ class PdfEngine:
         font_color: str = "#CCCCCC",
         opacity: float = 0.3,
         rotation: int = -45,
-        position: str = "center"
+        position: str = "center",
+        pages: str = "all",
+        layer: str = "over"
     ) -> str:
-        def _add_watermark():
-            doc = fitz.open(input_path)
-            
-            for page in doc:
-                rect = page.rect
-                
-                if watermark_type == "text" and watermark_text:
-                    text_point = fitz.Point(rect.width / 2, rect.height / 2)
-                    
-                    shape = page.new_shape()
-                    shape.insert_text(
-                        text_point,
-                        watermark_text,
-                        fontsize=font_size,
-                        color=self._hex_to_rgb(font_color),
-                        rotate=rotation
-                    )
-                    shape.commit()
-                
-                elif watermark_type == "image" and watermark_image:
-                    img_rect = fitz.Rect(
-                        rect.width / 4,
-                        rect.height / 4,
-                        rect.width * 3 / 4,
-                        rect.height * 3 / 4
-                    )
-                    page.insert_image(img_rect, filename=watermark_image)
-            
-            doc.save(output_path)
-            doc.close()
-            return output_path
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _add_watermark)
+        result = await loop.run_in_executor(
+            executor,
+            apply_watermark,
+            input_path,
+            output_path,
+            watermark_type,
+            watermark_text,
+            watermark_image,
+            font_size,
+            font_color,
+            opacity,
+            rotation,
+            position,
+            pages,
+            layer
+        )
+        return result["output_path"]
     
-    def _hex_to_rgb(self, hex_color: str) -> tuple:
-        hex_color = hex_color.lstrip('#')
-        return tuple(int(hex_color[i:i+2], 16) / 255 for i in (0, 2, 4))
+    async def add_watermark_batch(self, jobs: List[Tuple[str, str]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, watermark_files, jobs, options)
     
     async def compress(
         self,
@@ -264,34 +261,20 @@ class PdfEngine:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _extract)
     
+    async def extract_with_position(self, input_path: str) -> PositionedText:
+        return await TextExtractor.extract_with_position(input_path)
+    
     async def extract_tables(self, input_path: str) -> List[List[List[str]]]:
         def _extract():
-            tables = []
-            with pdfplumber.open(input_path) as pdf:
-                for page in pdf.pages:
-                    page_tables = page.extract_tables()
-                    tables.extend(page_tables)
-            return tables
+            return [table for _, table in TableExtractor.iter_tables(input_path)]
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _extract)
     
     async def get_page_info(self, input_path: str) -> List[Dict]:
-        def _get_info():
-            doc = fitz.open(input_path)
-            pages = []
-            for i, page in enumerate(doc):
-                pages.append({
-                    "number": i + 1,
-                    "width": page.rect.width,
-                    "height": page.rect.height,
-                    "rotation": page.rotation,
-                })
-            doc.close()
-            return pages
-        
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _get_info)
+        index = await PageIndex.get(input_path)
+        # Text counts stay None until the upload's background text pass has run
+        return index.pages()
     
     async def render_page(
         self,
@@ -302,14 +285,20 @@ class PdfEngine:
     ) -> bytes:
         def _render():
             doc = fitz.open(input_path)
-            page = doc[page_number - 1]
-            
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, rotate=rotation)
-            
-            img_data = pix.tobytes("png")
-            doc.close()
-            return img_data
+            try:
+                return render_page_image(doc, page_number, zoom, rotation)
+            finally:
+                doc.close()
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _render)
+    
+    async def iter_render_pages(
+        self,
+        input_path: str,
+        requests: List[Tuple[int, float, int]],
+        image_format: str = "png",
+        quality: int = 85
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for result in PageRenderer.iter_render(input_path, requests, image_format, quality):
+            yield result
@@ -0,0 +1,335 @@
+import fitz
+import numpy as np
+from typing import List, Dict, Any, Iterator, Sequence, Tuple
+from array import array
+import re
+import json
+import struct
+import unicodedata
+
+POSITIONED_MAGIC = b"PTXT"
+POSITIONED_VERSION = 1
+_HEADER = struct.Struct("<4sHII")
+# (attribute, dtype, values per span); serialized in this order after the fonts
+_COLUMNS = (
+    ("pages", np.dtype("<u4"), 1),
+    ("bboxes", np.dtype("<f4"), 4),
+    ("sizes", np.dtype("<f4"), 1),
+    ("fonts", np.dtype("<u4"), 1),
+)
+# Han, kana and Hangul are written without spaces, so each character is its own word
+CJK_CHAR = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+
+def is_word_char(ch: str) -> bool:
+    # Matches SQLite's unicode61 tokenizer: letters, numbers, private use and combining marks
+    category = unicodedata.category(ch)
+    return category[0] in "LN" or category in ("Co", "Mn")
+
+
+def _line_words(line: Dict[str, Any]) -> Iterator[Tuple[str, List[float], Dict[str, Any]]]:
+    # Words run across span boundaries; their boxes are the union of the glyph boxes
+    chars: List[str] = []
+    box: List[float] = []
+    owner: Dict[str, Any] = {}
+    for span in line["spans"]:
+        for char in span["chars"]:
+            ch = char["c"]
+            cjk = CJK_CHAR.match(ch) is not None
+            if is_word_char(ch) and not cjk:
+                x0, y0, x1, y1 = char["bbox"]
+                if chars:
+                    box = [min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1)]
+                else:
+                    box, owner = [x0, y0, x1, y1], span
+                chars.append(ch)
+                continue
+            if chars:
+                yield "".join(chars), box, owner
+                chars = []
+            if cjk:
+                yield ch, list(char["bbox"]), span
+    if chars:
+        yield "".join(chars), box, owner
+
+
+def _extract_positioned_chunk(file_path: str, start: int, end: int, words: bool = False) -> "PositionedText":
+    pages = array("I")
+    bboxes = array("f")
+    sizes = array("f")
+    font_ids = array("I")
+    offsets = array("q", [0])
+    font_table: Dict[str, int] = {}
+    text = bytearray()
+    
+    doc = fitz.open(file_path)
+    try:
+        for page_num in range(start, end):
+            for block in doc[page_num].get_text("rawdict" if words else "dict")["blocks"]:
+                for line in block.get("lines", []):
+                    if words:
+                        entries = _line_words(line)
+                    else:
+                        entries = ((span["text"], span["bbox"], span) for span in line["spans"])
+                    for value, bbox, span in entries:
+                        pages.append(page_num + 1)
+                        bboxes.extend(bbox)
+                        sizes.append(span["size"])
+                        font_ids.append(font_table.setdefault(span["font"], len(font_table)))
+                        text += value.encode("utf-8")
+                        offsets.append(len(text))
+    finally:
+        doc.close()
+    
+    return PositionedText(
+        np.frombuffer(pages, dtype=np.uint32),
+        np.frombuffer(bboxes, dtype=np.float32).reshape(-1, 4),
+        np.frombuffer(sizes, dtype=np.float32),
+        np.frombuffer(font_ids, dtype=np.uint32),
+        list(font_table),
+        np.frombuffer(offsets, dtype=np.int64),
+        bytes(text)
+    )
+
+
+class PositionedText:
+    def __init__(
+        self,
+        pages: np.ndarray,
+        bboxes: np.ndarray,
+        sizes: np.ndarray,
+        fonts: np.ndarray,
+        font_names: List[str],
+        offsets: np.ndarray,
+        text: bytes
+    ):
+        self.pages = pages
+        self.bboxes = bboxes
+        self.sizes = sizes
+        self.fonts = fonts
+        self.font_names = font_names
+        self.offsets = offsets
+        self.text = text
+    
+    @classmethod
+    def empty(cls) -> "PositionedText":
+        return cls(
+            np.empty(0, np.uint32),
+            np.empty((0, 4), np.float32),
+            np.empty(0, np.float32),
+            np.empty(0, np.uint32),
+            [],
+            np.zeros(1, np.int64),
+            b""
+        )
+    
+    def __len__(self) -> int:
+        return len(self.pages)
+    
+    def span_text(self, index: int) -> str:
+        return self.text[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+    
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return {
+            "page": int(self.pages[index]),
+            "text": self.span_text(index),
+            "bbox": tuple(float(v) for v in self.bboxes[index]),
+            "font": self.font_names[self.fonts[index]],
+            "size": float(self.sizes[index]),
+        }
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+    
+    def texts(self) -> List[str]:
+        return [self.span_text(i) for i in range(len(self))]
+    
+    @classmethod
+    def concat(cls, parts: Sequence["PositionedText"]) -> "PositionedText":
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        
+        font_table: Dict[str, int] = {}
+        fonts = []
+        offsets = [np.zeros(1, np.int64)]
+        base = 0
+        for part in parts:
+            remap = np.array(
+                [font_table.setdefault(name, len(font_table)) for name in part.font_names],
+                dtype=np.uint32
+            )
+            fonts.append(remap[part.fonts])
+            offsets.append(part.offsets[1:] + base)
+            base += len(part.text)
+        
+        return cls(
+            np.concatenate([part.pages for part in parts]),
+            np.concatenate([part.bboxes for part in parts]),
+            np.concatenate([part.sizes for part in parts]),
+            np.concatenate(fonts),
+            list(font_table),
+            np.concatenate(offsets),
+            b"".join(part.text for part in parts)
+        )
+    
+    def take(self, indices: np.ndarray) -> "PositionedText":
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        starts = self.offsets[indices]
+        ends = self.offsets[indices + 1]
+        lengths = ends - starts
+        offsets = np.zeros(len(indices) + 1, np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        text = b"".join(self.text[s:e] for s, e in zip(starts.tolist(), ends.tolist()))
+        return PositionedText(
+            self.pages[indices],
+            self.bboxes[indices],
+            self.sizes[indices],
+            self.fonts[indices],
+            self.font_names,
+            offsets,
+            text
+        )
+    
+    def region_mask(self, page: int, rect: Sequence[float], contained: bool = False) -> np.ndarray:
+        x0, y0, x1, y1 = rect
+        b = self.bboxes
+        if contained:
+            inside = (b[:, 0] >= x0) & (b[:, 1] >= y0) & (b[:, 2] <= x1) & (b[:, 3] <= y1)
+        else:
+            inside = (b[:, 0] < x1) & (b[:, 2] > x0) & (b[:, 1] < y1) & (b[:, 3] > y0)
+        return inside & (self.pages == page)
+    
+    def in_region(self, page: int, rect: Sequence[float], contained: bool = False) -> "PositionedText":
+        return self.take(self.region_mask(page, rect, contained))
+    
+    def line_ids(self, tolerance: float = 2.0) -> np.ndarray:
+        if not len(self):
+            return np.empty(0, np.int64)
+        centers = (self.bboxes[:, 1] + self.bboxes[:, 3]) / 2
+        order = np.lexsort((centers, self.pages))
+        sorted_centers = centers[order]
+        sorted_pages = self.pages[order]
+        breaks = np.empty(len(order), bool)
+        breaks[0] = False
+        breaks[1:] = (np.diff(sorted_centers) > tolerance) | (np.diff(sorted_pages) != 0)
+        ids = np.empty(len(order), np.int64)
+        ids[order] = np.cumsum(breaks)
+        return ids
+    
+    def group_lines(self, tolerance: float = 2.0) -> List[Dict[str, Any]]:
+        if not len(self):
+            return []
+        ids = self.line_ids(tolerance)
+        order = np.lexsort((self.bboxes[:, 0], ids))
+        sorted_ids = ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        boxes = self.bboxes[order]
+        x0 = np.minimum.reduceat(boxes[:, 0], starts)
+        y0 = np.minimum.reduceat(boxes[:, 1], starts)
+        x1 = np.maximum.reduceat(boxes[:, 2], starts)
+        y1 = np.maximum.reduceat(boxes[:, 3], starts)
+        
+        ends = np.r_[starts[1:], len(order)]
+        lines = []
+        for n, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            members = order[start:end]
+            lines.append({
+                "page": int(self.pages[members[0]]),
+                "text": " ".join(self.span_text(i) for i in members.tolist()),
+                "bbox": (float(x0[n]), float(y0[n]), float(x1[n]), float(y1[n])),
+            })
+        return lines
+    
+    def to_bytes(self) -> bytes:
+        fonts = json.dumps(self.font_names, ensure_ascii=False).encode("utf-8")
+        parts = [
+            _HEADER.pack(POSITIONED_MAGIC, POSITIONED_VERSION, len(self), len(self.text)),
+            struct.pack("<I", len(fonts)),
+            fonts,
+        ]
+        for name, dtype, _ in _COLUMNS:
+            parts.append(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+        parts.append(np.ascontiguousarray(self.offsets, dtype="<i8").tobytes())
+        parts.append(self.text)
+        return b"".join(parts)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "PositionedText":
+        magic, version, count, text_length = _HEADER.unpack_from(data)
+        if magic != POSITIONED_MAGIC or version != POSITIONED_VERSION:
+            raise ValueError("Not a positioned text buffer")
+        pos = _HEADER.size
+        (fonts_length,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        font_names = json.loads(data[pos:pos + fonts_length].decode("utf-8"))
+        pos += fonts_length
+        
+        columns = {}
+        for name, dtype, width in _COLUMNS:
+            column = np.frombuffer(data, dtype=dtype, count=count * width, offset=pos)
+            columns[name] = column.reshape(-1, width) if width > 1 else column
+            pos += column.nbytes
+        offsets = np.frombuffer(data, dtype="<i8", count=count + 1, offset=pos)
+        pos += offsets.nbytes
+        text = bytes(data[pos:pos + text_length])
+        return cls(
+            columns["pages"],
+            columns["bboxes"],
+            columns["sizes"],
+            columns["fonts"],
+            font_names,
+            offsets,
+            text
+        )
+    
+    def to_arrow(self):
+        import pyarrow as pa
+        
+        text = pa.LargeStringArray.from_buffers(
+            len(self),
+            pa.py_buffer(np.ascontiguousarray(self.offsets, dtype=np.int64)),
+            pa.py_buffer(self.text)
+        )
+        font = pa.DictionaryArray.from_arrays(
+            pa.array(self.fonts, type=pa.uint32()),
+            pa.array(self.font_names, type=pa.string())
+        )
+        return pa.table({
+            "page": pa.array(self.pages),
+            "text": text,
+            "x0": pa.array(self.bboxes[:, 0]),
+            "y0": pa.array(self.bboxes[:, 1]),
+            "x1": pa.array(self.bboxes[:, 2]),
+            "y1": pa.array(self.bboxes[:, 3]),
+            "font": font,
+            "size": pa.array(self.sizes),
+        })
+    
+    def to_arrow_ipc(self) -> bytes:
+        import pyarrow as pa
+        
+        table = self.to_arrow()
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    
+    def to_columns(self) -> Dict[str, Any]:
+        return {
+            "page": self.pages.tolist(),
+            "text": self.texts(),
+            "bbox": np.round(self.bboxes, 2).tolist(),
+            "font": self.fonts.tolist(),
+            "size": np.round(self.sizes, 2).tolist(),
+            "fonts": self.font_names,
+        }
@@ -1,11 +1,161 @@
 import fitz
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
+import os
 import asyncio
+from collections import deque
+from itertools import islice
 from concurrent.futures import ThreadPoolExecutor
 
+from app.core.executor import PROCESS_WORKERS, get_process_executor
+from app.core.pdf_engine.extractor.positioned import PositionedText, _extract_positioned_chunk
+
+TABLE_CHUNK_PAGES = 10
+POSITION_CHUNK_PAGES = 100
+# Strategies that only find tables drawn with ruling lines
+RULING_STRATEGIES = ("lines", "lines_strict")
+
 executor = ThreadPoolExecutor(max_workers=4)
 
 
+def _table_strategies(table_settings: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    settings = table_settings or {}
+    return (
+        settings.get("vertical_strategy", "lines"),
+        settings.get("horizontal_strategy", "lines"),
+    )
+
+
+def _count_ruling_edges(page: "fitz.Page", min_length: float = 3) -> Tuple[int, int]:
+    horizontal = vertical = 0
+    
+    def _segment(p1, p2):
+        nonlocal horizontal, vertical
+        dx, dy = abs(p2[0] - p1[0]), abs(p2[1] - p1[1])
+        if dy < 1 and dx >= min_length:
+            horizontal += 1
+        elif dx < 1 and dy >= min_length:
+            vertical += 1
+    
+    for path in page.get_cdrawings():
+        for item in path["items"]:
+            kind = item[0]
+            if kind == "l":
+                _segment(item[1], item[2])
+            elif kind == "c":
+                _segment(item[1], item[4])
+            elif kind == "re":
+                x0, y0, x1, y1 = item[1]
+                _segment((x0, y0), (x1, y0))
+                _segment((x0, y1), (x1, y1))
+                _segment((x0, y0), (x0, y1))
+                _segment((x1, y0), (x1, y1))
+            elif kind == "qu":
+                points = item[1]
+                for i in range(4):
+                    _segment(points[i], points[(i + 1) % 4])
+    
+    return horizontal, vertical
+
+
+def _has_aligned_text_columns(page: "fitz.Page", min_rows: int = 3, tolerance: float = 3) -> bool:
+    columns_by_row: Dict[Tuple[int, int], set] = {}
+    rows_by_column: Dict[int, int] = {}
+    for x0, y0, x1, y1, word, block_no, line_no, word_no in page.get_text("words"):
+        column = int(x0 // tolerance)
+        row = columns_by_row.setdefault((block_no, line_no), set())
+        if column not in row:
+            row.add(column)
+            rows_by_column[column] = rows_by_column.get(column, 0) + 1
+    
+    aligned = {column for column, count in rows_by_column.items() if count >= min_rows}
+    if len(aligned) < 2:
+        return False
+    
+    tabular_rows = sum(1 for row in columns_by_row.values() if len(row & aligned) >= 3)
+    return tabular_rows >= min_rows
+
+
+def may_contain_table(page: "fitz.Page", table_settings: Optional[Dict[str, Any]] = None) -> bool:
+    """Cheap check whether pdfplumber could find a table on this page"""
+    settings = table_settings or {}
+    strategies = _table_strategies(settings)
+    # Explicit lines come from the caller, not the page, so there is nothing to check
+    if "explicit" in strategies or settings.get("explicit_vertical_lines") or settings.get("explicit_horizontal_lines"):
+        return True
+    if "text" in strategies:
+        return _has_aligned_text_columns(page)
+    if any(strategy not in RULING_STRATEGIES for strategy in strategies):
+        return True
+    
+    horizontal, vertical = _count_ruling_edges(page)
+    return horizontal >= 2 and vertical >= 2
+
+
+def _extract_table_chunk(
+    file_path: str,
+    page_numbers: List[int],
+    table_settings: Optional[Dict[str, Any]] = None,
+    prefilter: bool = True
+) -> List[Tuple[int, List[List[str]]]]:
+    import pdfplumber
+    
+    if prefilter:
+        doc = fitz.open(file_path)
+        page_numbers = [
+            p for p in page_numbers
+            if may_contain_table(doc[p - 1], table_settings)
+        ]
+        doc.close()
+        if not page_numbers:
+            return []
+    
+    results = []
+    with pdfplumber.open(file_path, pages=page_numbers) as pdf:
+        for page in pdf.pages:
+            for table in page.extract_tables(table_settings):
+                results.append((page.page_number, table))
+            page.close()
+    return results
+
+
+def _ordered_map(fn: Callable, args_list: List[tuple], window: int) -> Iterator[Any]:
+    pool = get_process_executor()
+    args_iter = iter(args_list)
+    pending = deque(
+        pool.submit(fn, *args)
+        for args in islice(args_iter, window)
+    )
+    
+    try:
+        while pending:
+            result = pending.popleft().result()
+            next_args = next(args_iter, None)
+            if next_args is not None:
+                pending.append(pool.submit(fn, *next_args))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def extract_positioned(file_path: str, words: bool = False) -> PositionedText:
+    """Spans with their boxes; with words, one entry per word with a box from its glyphs"""
+    doc = fitz.open(file_path)
+    page_count = doc.page_count
+    doc.close()
+    
+    if page_count <= POSITION_CHUNK_PAGES:
+        return _extract_positioned_chunk(file_path, 0, page_count, words)
+    starts = range(0, page_count, POSITION_CHUNK_PAGES)
+    return PositionedText.concat(list(get_process_executor().map(
+        _extract_positioned_chunk,
+        [file_path] * len(starts),
+        starts,
+        [min(start + POSITION_CHUNK_PAGES, page_count) for start in starts],
+        [words] * len(starts)
+    )))
+
+
 class TextExtractor:
     @staticmethod
     async def extract_all(file_path: str) -> str:
@@ -35,30 +185,9 @@ class TextExtractor:
         return await loop.run_in_executor(executor, _extract)
     
     @staticmethod
-    async def extract_with_position(file_path: str) -> List[Dict]:
-        def _extract():
-            doc = fitz.open(file_path)
-            results = []
-            
-            for page_num, page in enumerate(doc):
-                blocks = page.get_text("dict")["blocks"]
-                for block in blocks:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            for span in line["spans"]:
-                                results.append({
-                                    "page": page_num + 1,
-                                    "text": span["text"],
-                                    "bbox": span["bbox"],
-                                    "font": span["font"],
-                                    "size": span["size"],
-                                })
-            
-            doc.close()
-            return results
-        
+    async def extract_with_position(file_path: str, words: bool = False) -> PositionedText:
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _extract)
+        return await loop.run_in_executor(executor, extract_positioned, file_path, words)
 
 
 class ImageExtractor:
@@ -90,21 +219,45 @@ class ImageExtractor:
 
 
 class TableExtractor:
+    @staticmethod
+    def iter_tables(
+        file_path: str,
+        pages: Optional[List[int]] = None,
+        parallel: bool = True,
+        table_settings: Optional[Dict[str, Any]] = None,
+        prefilter: bool = True
+    ) -> Iterator[Tuple[int, List[List[str]]]]:
+        doc = fitz.open(file_path)
+        page_count = doc.page_count
+        doc.close()
+        
+        if pages:
+            page_numbers = sorted({p for p in pages if 1 <= p <= page_count})
+        else:
+            page_numbers = list(range(1, page_count + 1))
+        
+        chunks = [
+            (file_path, page_numbers[i:i + TABLE_CHUNK_PAGES], table_settings, prefilter)
+            for i in range(0, len(page_numbers), TABLE_CHUNK_PAGES)
+        ]
+        
+        if parallel and len(chunks) > 1:
+            results = _ordered_map(_extract_table_chunk, chunks, PROCESS_WORKERS * 2)
+        else:
+            results = (_extract_table_chunk(*chunk) for chunk in chunks)
+        
+        for chunk_tables in results:
+            yield from chunk_tables
+    
     @staticmethod
     async def extract_all(file_path: str) -> List[List[List[str]]]:
         def _extract():
             try:
                 import pdfplumber
-                
-                tables = []
-                with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        page_tables = page.extract_tables()
-                        tables.extend(page_tables)
-                
-                return tables
             except ImportError:
                 return []
+            
+            return [table for _, table in TableExtractor.iter_tables(file_path)]
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _extract)
@@ -1,10 +1,310 @@
 import fitz
-from typing import List
+import pikepdf
+import hashlib
+import os
+import re
+from array import array
+from collections import deque
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
 
 executor = ThreadPoolExecutor(max_workers=4)
 
+_REFERENCE_PATTERN = re.compile(rb"(\d+) 0 R\b")
+_NEVER_SHARED_TYPES = {"/Page", "/Pages", "/Catalog", "/Annot"}
+_INHERITABLE_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+_CATALOG_NUM = 1
+_PAGES_NUM = 2
+
+
+def _object_digest(doc: fitz.Document, xref: int, source: bytes) -> bytes:
+    digest = hashlib.sha256(source)
+    if doc.xref_is_stream(xref):
+        digest.update(b"\x00stream\x00")
+        digest.update(doc.xref_stream_raw(xref))
+    return digest.digest()
+
+
+def _deduplicate_objects(
+    doc: fitz.Document,
+    first_xref: int,
+    seen: Dict[bytes, int]
+) -> int:
+    mapping: Dict[int, int] = {}
+    digests: Dict[int, bytes] = {}
+    candidates = []
+    for xref in range(first_xref, doc.xref_length()):
+        obj_type = doc.xref_get_key(xref, "Type")[1]
+        if obj_type not in _NEVER_SHARED_TYPES:
+            candidates.append(xref)
+    live = set(range(first_xref, doc.xref_length()))
+    
+    def _remap(match):
+        target = mapping.get(int(match.group(1)))
+        return b"%d 0 R" % target if target else match.group(0)
+    
+    # Each pass folds objects whose children were folded in the previous pass
+    # (streams, then font descriptors, fonts, resource dicts, ...), so the
+    # work stays linear in the number of new objects per pass.
+    changed = True
+    while changed:
+        changed = False
+        for xref in list(live):
+            if not mapping:
+                break
+            source = doc.xref_object(xref, compressed=True).encode("latin-1")
+            rewritten = _REFERENCE_PATTERN.sub(_remap, source)
+            if rewritten != source:
+                doc.update_object(xref, rewritten.decode("latin-1"))
+        
+        for xref in candidates:
+            if xref in mapping:
+                continue
+            source = doc.xref_object(xref, compressed=True).encode("latin-1")
+            digest = _object_digest(doc, xref, source)
+            # A rewritten object no longer owns the digest of its old content
+            previous = digests.get(xref)
+            if previous is not None and previous != digest and seen.get(previous) == xref:
+                del seen[previous]
+            digests[xref] = digest
+            original = seen.get(digest)
+            if original is None:
+                seen[digest] = xref
+            elif original != xref:
+                mapping[xref] = original
+                live.discard(xref)
+                changed = True
+    
+    for xref in mapping:
+        if doc.xref_is_stream(xref):
+            doc.update_stream(xref, b"")
+        doc.update_object(xref, "null")
+    
+    return len(mapping)
+
+
+def merge_deduplicated(input_paths: List[str], output_path: str) -> Dict[str, Any]:
+    result = fitz.open()
+    seen: Dict[bytes, int] = {}
+    deduplicated = 0
+    input_size = 0
+    
+    for path in input_paths:
+        first_xref = result.xref_length()
+        doc = fitz.open(path)
+        try:
+            result.insert_pdf(doc)
+        finally:
+            doc.close()
+        input_size += os.path.getsize(path)
+        deduplicated += _deduplicate_objects(result, first_xref, seen)
+    
+    page_count = result.page_count
+    result.save(output_path, garbage=1, deflate=True, use_objstms=1)
+    result.close()
+    
+    output_size = os.path.getsize(output_path)
+    return {
+        "output_path": output_path,
+        "page_count": page_count,
+        "input_size": input_size,
+        "output_size": output_size,
+        "saved_bytes": input_size - output_size,
+        "deduplicated_objects": deduplicated,
+    }
+
+
+class StreamingPdfWriter:
+    # Writes a merged PDF object by object: each input is opened lazily with
+    # pikepdf, objects reachable from its pages are renumbered and written
+    # straight to the output, and only object offsets are kept until the xref
+    # table is written at the end.
+    def __init__(self, output_path: str):
+        self._file = open(output_path, "wb")
+        self._file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets = array("Q", [0, 0, 0])
+        self._kids = array("Q")
+        self._refs: Dict[Tuple[int, int], int] = {}
+        self._queue: deque = deque()
+    
+    @property
+    def page_count(self) -> int:
+        return len(self._kids)
+    
+    def _new_number(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets) - 1
+    
+    def _reference(self, obj: pikepdf.Object, enqueue: bool = True) -> int:
+        num = self._refs.get(obj.objgen)
+        if num is None:
+            num = self._new_number()
+            self._refs[obj.objgen] = num
+            if enqueue:
+                self._queue.append((num, obj))
+        return num
+    
+    def _serialize(self, value, top_level: bool = False) -> bytes:
+        if isinstance(value, pikepdf.Object):
+            if value.is_indirect and not top_level:
+                if isinstance(value, pikepdf.Dictionary) and value.get("/Type") == "/Pages":
+                    return b"null"
+                return b"%d 0 R" % self._reference(value)
+            if isinstance(value, pikepdf.Dictionary) or isinstance(value, pikepdf.Stream):
+                return self._serialize_dict(value.items())
+            if isinstance(value, pikepdf.Array):
+                return b"[" + b" ".join(self._serialize(item) for item in value) + b"]"
+            return value.unparse()
+        if value is None:
+            return b"null"
+        if isinstance(value, bool):
+            return b"true" if value else b"false"
+        if isinstance(value, int):
+            return b"%d" % value
+        if isinstance(value, (Decimal, float)):
+            return format(Decimal(value), "f").encode("ascii")
+        raise TypeError(f"Cannot serialize PDF value of type {type(value).__name__}")
+    
+    def _serialize_dict(self, items) -> bytes:
+        parts = [b"<<"]
+        for key, value in items:
+            parts.append(pikepdf.Name(key).unparse())
+            parts.append(self._serialize(value))
+        parts.append(b">>")
+        return b" ".join(parts)
+    
+    def _write_object(self, num: int, body: bytes, stream: Optional[bytes] = None):
+        self._offsets[num] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % num)
+        self._file.write(body)
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+    
+    def _write_queued(self):
+        while self._queue:
+            num, obj = self._queue.popleft()
+            if isinstance(obj, pikepdf.Stream):
+                raw = obj.read_raw_bytes()
+                items = [(key, value) for key, value in obj.items() if key != "/Length"]
+                items.append(("/Length", len(raw)))
+                self._write_object(num, self._serialize_dict(items), raw)
+            else:
+                self._write_object(num, self._serialize(obj, top_level=True))
+    
+    def _write_page(self, num: int, page: pikepdf.Dictionary):
+        items = {key: value for key, value in page.items() if key != "/Parent"}
+        parent = page.get("/Parent")
+        while parent is not None:
+            for key in _INHERITABLE_PAGE_KEYS:
+                if key not in items and key in parent:
+                    items[key] = parent[key]
+            parent = parent.get("/Parent")
+        
+        body = self._serialize_dict(items.items())
+        self._write_object(num, body[:-2] + b"/Parent %d 0 R >>" % _PAGES_NUM)
+        self._kids.append(num)
+    
+    def add_document(self, path: str, password: str = ""):
+        with pikepdf.open(path, password=password) as pdf:
+            self._refs = {}
+            # Number every page first so links and annotations that point at
+            # other pages resolve to them instead of copying them as plain objects.
+            page_nums = [self._reference(page.obj, enqueue=False) for page in pdf.pages]
+            for num, page in zip(page_nums, pdf.pages):
+                self._write_page(num, page.obj)
+                self._write_queued()
+        self._refs = {}
+    
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % num for num in self._kids)
+        self._write_object(_PAGES_NUM, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._kids)))
+        self._write_object(_CATALOG_NUM, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES_NUM)
+        
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self._offsets))
+        for offset in self._offsets[1:]:
+            self._file.write(b"%010d 00000 n \n" % offset)
+        self._file.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self._offsets), _CATALOG_NUM, xref_offset)
+        )
+        self._file.close()
+    
+    def abort(self):
+        self._file.close()
+
+
+def merge_streaming(input_paths: List[str], output_path: str) -> Dict[str, Any]:
+    writer = StreamingPdfWriter(output_path)
+    input_size = 0
+    try:
+        for path in input_paths:
+            writer.add_document(path)
+            input_size += os.path.getsize(path)
+        writer.close()
+    except Exception:
+        writer.abort()
+        os.remove(output_path)
+        raise
+    
+    return {
+        "output_path": output_path,
+        "page_count": writer.page_count,
+        "input_size": input_size,
+        "output_size": os.path.getsize(output_path),
+    }
+
+
+def _rebase_toc(toc: List[list], page_offset: int) -> List[list]:
+    rebased = []
+    previous_level = 1
+    for level, title, page in toc:
+        # Nest under the per-file entry and repair level jumps that set_toc rejects
+        level = min(level + 1, previous_level + 1)
+        target = page + page_offset if page > 0 else -1
+        rebased.append([level, title, target])
+        previous_level = level
+    return rebased
+
+
+def merge_with_outline(
+    input_paths: List[str],
+    output_path: str,
+    bookmark_names: Optional[List[str]] = None
+) -> str:
+    result = fitz.open()
+    toc = []
+    
+    for i, path in enumerate(input_paths):
+        try:
+            doc = fitz.open(path)
+        except Exception as e:
+            logger.warning(f"Error merging {path}: {e}")
+            continue
+        
+        try:
+            start_page = result.page_count
+            result.insert_pdf(doc)
+            if bookmark_names and i < len(bookmark_names) and bookmark_names[i]:
+                title = bookmark_names[i]
+            else:
+                title = os.path.splitext(os.path.basename(path))[0]
+            toc.append([1, title, start_page + 1])
+            toc.extend(_rebase_toc(doc.get_toc(simple=True), start_page))
+        finally:
+            doc.close()
+    
+    result.set_toc(toc)
+    result.save(output_path, garbage=1, deflate=True)
+    result.close()
+    return output_path
+
 
 class PdfMerger:
     @staticmethod
@@ -27,34 +327,21 @@ class PdfMerger:
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _merge)
     
+    @staticmethod
+    async def merge_deduplicated(input_paths: List[str], output_path: str) -> Dict[str, Any]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, merge_deduplicated, input_paths, output_path)
+    
+    @staticmethod
+    async def merge_streaming(input_paths: List[str], output_path: str) -> Dict[str, Any]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, merge_streaming, input_paths, output_path)
+    
     @staticmethod
     async def merge_with_bookmarks(
         input_paths: List[str],
         output_path: str,
         bookmark_names: List[str] = None
     ) -> str:
-        def _merge():
-            result = fitz.open()
-            
-            for i, path in enumerate(input_paths):
-                try:
-                    doc = fitz.open(path)
-                    start_page = result.page_count
-                    result.insert_pdf(doc)
-                    
-                    if bookmark_names and i < len(bookmark_names):
-                        result.set_page_text(
-                            start_page,
-                            bookmark_names[i]
-                        )
-                    
-                    doc.close()
-                except Exception as e:
-                    print(f"Error merging {path}: {e}")
-            
-            result.save(output_path)
-            result.close()
-            return output_path
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _merge)
+        return await loop.run_in_executor(executor, merge_with_outline, input_paths, output_path, bookmark_names)
@@ -0,0 +1,230 @@
+import fitz
+from typing import List, Dict, Any, Optional, Tuple
+from array import array
+from collections import OrderedDict
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config.settings import settings
+from app.core.executor import PROCESS_WORKERS, get_process_executor
+
+executor = ThreadPoolExecutor(max_workers=2)
+
+PARALLEL_INDEX_MIN_PAGES = 200
+MAX_LOADED_INDEXES = 64
+
+INDEX_MAGIC = b"PIDX"
+INDEX_VERSION = 2
+_HEADER = struct.Struct("<4sHIB")
+# (attribute, array typecode); stored in this order after the header.
+# Layout columns come from a cheap per-page scan. Text columns need a full
+# text extraction, so they are filled in later and flagged in the header.
+LAYOUT_COLUMNS = (
+    ("widths", "f"),
+    ("heights", "f"),
+    ("rotations", "H"),
+    ("image_counts", "I"),
+)
+TEXT_COLUMNS = (
+    ("char_counts", "I"),
+    ("has_text", "B"),
+)
+INDEX_COLUMNS = LAYOUT_COLUMNS + TEXT_COLUMNS
+
+_loaded: "OrderedDict[Tuple[str, int, int], PageIndex]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _scan_layout(file_path: str, start: int, end: int) -> Dict[str, List]:
+    columns = {name: [] for name, _ in LAYOUT_COLUMNS}
+    doc = fitz.open(file_path)
+    try:
+        for page_num in range(start, end):
+            page = doc[page_num]
+            rect = page.rect
+            columns["widths"].append(rect.width)
+            columns["heights"].append(rect.height)
+            columns["rotations"].append(page.rotation)
+            columns["image_counts"].append(len(page.get_images()))
+    finally:
+        doc.close()
+    return columns
+
+
+def _scan_text(file_path: str, start: int, end: int) -> Dict[str, List]:
+    columns = {name: [] for name, _ in TEXT_COLUMNS}
+    doc = fitz.open(file_path)
+    try:
+        for page_num in range(start, end):
+            chars = sum(1 for ch in doc[page_num].get_text() if not ch.isspace())
+            columns["char_counts"].append(chars)
+            columns["has_text"].append(1 if chars else 0)
+    finally:
+        doc.close()
+    return columns
+
+
+def _scan(scan, file_path: str, page_count: int, spec: Tuple[Tuple[str, str], ...]) -> Dict[str, array]:
+    if page_count >= PARALLEL_INDEX_MIN_PAGES:
+        chunk = -(-page_count // PROCESS_WORKERS)
+        starts = range(0, page_count, chunk)
+        parts = list(get_process_executor().map(
+            scan,
+            [file_path] * len(starts),
+            starts,
+            [min(start + chunk, page_count) for start in starts]
+        ))
+    else:
+        parts = [scan(file_path, 0, page_count)]
+    
+    columns = {}
+    for name, typecode in spec:
+        column = array(typecode)
+        for part in parts:
+            column.extend(part[name])
+        columns[name] = column
+    return columns
+
+
+class PageIndex:
+    def __init__(self, metadata: Dict[str, Any], columns: Dict[str, array], text_indexed: bool = False):
+        self.metadata = metadata
+        for name, _ in LAYOUT_COLUMNS:
+            setattr(self, name, columns[name])
+        page_count = len(self.widths)
+        for name, typecode in TEXT_COLUMNS:
+            setattr(self, name, columns.get(name, array(typecode, [0]) * page_count))
+        self.text_indexed = text_indexed
+        self._text_lock = threading.Lock()
+    
+    @property
+    def page_count(self) -> int:
+        return len(self.widths)
+    
+    def page(self, page_number: int) -> Dict[str, Any]:
+        """Page info; char_count and has_text are None until index_text has run"""
+        i = page_number - 1
+        return {
+            "number": page_number,
+            "width": self.widths[i],
+            "height": self.heights[i],
+            "rotation": self.rotations[i],
+            "char_count": self.char_counts[i] if self.text_indexed else None,
+            "image_count": self.image_counts[i],
+            "has_text": bool(self.has_text[i]) if self.text_indexed else None,
+        }
+    
+    def pages(self) -> List[Dict[str, Any]]:
+        return [self.page(i + 1) for i in range(self.page_count)]
+    
+    @staticmethod
+    def _source_key(file_path: str) -> Tuple[str, int, int]:
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    
+    @staticmethod
+    def get_index_path(file_path: str) -> str:
+        digest = hashlib.sha1(repr(PageIndex._source_key(file_path)).encode("utf-8")).hexdigest()
+        return os.path.join(settings.CACHE_DIR, "page_index", f"{digest}.pidx")
+    
+    def save(self, index_path: str):
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        metadata = json.dumps(self.metadata).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.page_count, int(self.text_indexed)))
+                for name, _ in INDEX_COLUMNS:
+                    getattr(self, name).tofile(f)
+                f.write(struct.pack("<I", len(metadata)))
+                f.write(metadata)
+            os.replace(tmp_path, index_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+    
+    @classmethod
+    def load(cls, index_path: str) -> Optional["PageIndex"]:
+        try:
+            with open(index_path, "rb") as f:
+                magic, version, page_count, text_indexed = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    return None
+                columns = {}
+                for name, typecode in INDEX_COLUMNS:
+                    column = array(typecode)
+                    column.fromfile(f, page_count)
+                    columns[name] = column
+                (length,) = struct.unpack("<I", f.read(4))
+                metadata = json.loads(f.read(length).decode("utf-8"))
+        except (OSError, EOFError, struct.error, ValueError):
+            return None
+        return cls(metadata, columns, bool(text_indexed))
+    
+    @classmethod
+    def build(cls, file_path: str) -> "PageIndex":
+        doc = fitz.open(file_path)
+        raw = doc.metadata
+        page_count = doc.page_count
+        doc.close()
+        
+        metadata = {
+            "title": raw.get("title", ""),
+            "author": raw.get("author", ""),
+            "subject": raw.get("subject", ""),
+            "keywords": raw.get("keywords", ""),
+            "creator": raw.get("creator", ""),
+            "producer": raw.get("producer", ""),
+            "creation_date": raw.get("creationDate", ""),
+            "modification_date": raw.get("modDate", ""),
+        }
+        
+        return cls(metadata, _scan(_scan_layout, file_path, page_count, LAYOUT_COLUMNS))
+    
+    def index_text(self, file_path: str) -> bool:
+        """Fill in the text columns; returns False if another caller already did"""
+        with self._text_lock:
+            if self.text_indexed:
+                return False
+            columns = _scan(_scan_text, file_path, self.page_count, TEXT_COLUMNS)
+            for name, _ in TEXT_COLUMNS:
+                setattr(self, name, columns[name])
+            self.text_indexed = True
+            return True
+    
+    @classmethod
+    def load_or_build(cls, file_path: str, with_text: bool = False) -> "PageIndex":
+        key = cls._source_key(file_path)
+        with _loaded_lock:
+            index = _loaded.get(key)
+            if index is not None:
+                _loaded.move_to_end(key)
+        
+        index_path = cls.get_index_path(file_path)
+        if index is None:
+            index = cls.load(index_path)
+            if index is None:
+                index = cls.build(file_path)
+                index.save(index_path)
+            with _loaded_lock:
+                # A concurrent caller may have loaded it first; everyone shares one instance
+                index = _loaded.setdefault(key, index)
+                _loaded.move_to_end(key)
+                while len(_loaded) > MAX_LOADED_INDEXES:
+                    _loaded.popitem(last=False)
+        
+        if with_text and index.index_text(file_path):
+            index.save(index_path)
+        return index
+    
+    @classmethod
+    async def get(cls, file_path: str, with_text: bool = False) -> "PageIndex":
+        """Load the index; with_text also fills in the per-page text columns, which costs a full text pass"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, cls.load_or_build, file_path, with_text)
@@ -3,38 +3,21 @@ from typing import List, Dict, Any, Optional
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from app.core.pdf_engine.page_index import PageIndex
+
 executor = ThreadPoolExecutor(max_workers=4)
 
 
 class PdfReader:
     @staticmethod
     async def get_page_count(file_path: str) -> int:
-        def _read():
-            doc = fitz.open(file_path)
-            count = doc.page_count
-            doc.close()
-            return count
-        
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _read)
+        index = await PageIndex.get(file_path)
+        return index.page_count
     
     @staticmethod
     async def get_page_info(file_path: str) -> List[Dict]:
-        def _read():
-            doc = fitz.open(file_path)
-            pages = []
-            for i, page in enumerate(doc):
-                pages.append({
-                    "number": i + 1,
-                    "width": page.rect.width,
-                    "height": page.rect.height,
-                    "rotation": page.rotation,
-                })
-            doc.close()
-            return pages
-        
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _read)
+        index = await PageIndex.get(file_path)
+        return index.pages()
     
     @staticmethod
     async def get_text(file_path: str, page_number: Optional[int] = None) -> str:
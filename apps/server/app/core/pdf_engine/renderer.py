@@ -0,0 +1,347 @@
+import fitz
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
+from collections import OrderedDict, deque
+import os
+import io
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from app.config.settings import settings
+from app.core.executor import get_process_executor
+
+executor = ThreadPoolExecutor(max_workers=4)
+# A single thread keeps speculative renders from competing with real requests
+prefetch_executor = ThreadPoolExecutor(max_workers=1)
+
+PARALLEL_RENDER_MIN_PAGES = 4
+RENDER_BATCH_SIZE = 4
+PREFETCH_AHEAD = 3
+PREFETCH_BEHIND = 1
+PREFETCH_ZOOM_LEVELS = 2
+NAVIGATION_HISTORY = 8
+MAX_TRACKED_VIEWERS = 256
+RENDER_FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+
+RenderRequest = Tuple[int, float, int]
+
+def render_page_image(
+    doc: fitz.Document,
+    page_number: int,
+    zoom: float = 1.0,
+    rotation: int = 0,
+    image_format: str = "png",
+    quality: int = 85
+) -> bytes:
+    page = doc[page_number - 1]
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(rotation))
+    if image_format == "webp":
+        from PIL import Image
+        
+        buf = io.BytesIO()
+        Image.frombytes("RGB", (pix.width, pix.height), pix.samples).save(buf, "WEBP", quality=quality)
+        return buf.getvalue()
+    return pix.tobytes(image_format, jpg_quality=quality)
+
+
+def normalize_render_format(image_format: str) -> str:
+    fmt = image_format.lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"Unsupported render format: {image_format}")
+    return fmt
+
+
+def _render_batch(
+    file_path: str,
+    requests: List[RenderRequest],
+    image_format: str,
+    quality: int
+) -> List[Tuple[RenderRequest, bytes]]:
+    doc = fitz.open(file_path)
+    try:
+        return [
+            ((page, zoom, rotation), render_page_image(doc, page, zoom, rotation, image_format, quality))
+            for page, zoom, rotation in requests
+        ]
+    finally:
+        doc.close()
+
+
+class PageRenderer:
+    @staticmethod
+    async def iter_render(
+        file_path: str,
+        requests: List[RenderRequest],
+        image_format: str = "png",
+        quality: int = 85
+    ) -> AsyncIterator[Dict[str, Any]]:
+        image_format = normalize_render_format(image_format)
+        
+        loop = asyncio.get_event_loop()
+        if len(requests) < PARALLEL_RENDER_MIN_PAGES:
+            futures = [
+                loop.run_in_executor(executor, _render_batch, file_path, requests, image_format, quality)
+            ]
+        else:
+            futures = [
+                loop.run_in_executor(
+                    get_process_executor(),
+                    _render_batch,
+                    file_path,
+                    requests[i:i + RENDER_BATCH_SIZE],
+                    image_format,
+                    quality
+                )
+                for i in range(0, len(requests), RENDER_BATCH_SIZE)
+            ]
+        
+        try:
+            for future in asyncio.as_completed(futures):
+                for (page, zoom, rotation), data in await future:
+                    yield {
+                        "page": page,
+                        "zoom": zoom,
+                        "rotation": rotation,
+                        "format": image_format,
+                        "data": data,
+                    }
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+RenderKey = Tuple[str, int, int, int, float, int, str]
+
+
+class RenderCache:
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RENDER_CACHE_SIZE
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[RenderKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(
+        file_path: str,
+        page_number: int,
+        zoom: float,
+        rotation: int,
+        image_format: str
+    ) -> RenderKey:
+        stat = os.stat(file_path)
+        return (
+            os.path.abspath(file_path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            page_number,
+            round(zoom, 3),
+            rotation % 360,
+            image_format,
+        )
+    
+    def __contains__(self, key: RenderKey) -> bool:
+        with self._lock:
+            return key in self._entries
+    
+    def get(self, key: RenderKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+    
+    def put(self, key: RenderKey, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def _render_uncached(file_path: str, page_number: int, zoom: float, rotation: int, image_format: str) -> bytes:
+    doc = fitz.open(file_path)
+    try:
+        return render_page_image(doc, page_number, zoom, rotation, image_format)
+    finally:
+        doc.close()
+
+
+def _prefetch_page(
+    cache: RenderCache,
+    key: RenderKey,
+    handle: Dict[str, fitz.Document],
+    file_path: str,
+    page_number: int,
+    zoom: float,
+    rotation: int,
+    image_format: str
+):
+    if key in cache:
+        return
+    # The handle lives only as long as one speculation run, so the server
+    # never keeps user files open while the viewer is idle
+    doc = handle.get("doc")
+    if doc is None:
+        doc = handle["doc"] = fitz.open(file_path)
+    if page_number > doc.page_count:
+        return
+    cache.put(key, render_page_image(doc, page_number, zoom, rotation, image_format))
+
+
+def _close_prefetch_handle(handle: Dict[str, fitz.Document]):
+    doc = handle.pop("doc", None)
+    if doc is not None:
+        doc.close()
+
+
+class PagePrefetcher:
+    def __init__(self, cache: Optional[RenderCache] = None, ahead: int = PREFETCH_AHEAD):
+        self.cache = cache or RenderCache()
+        self.ahead = ahead
+        self._history: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+    
+    def _record(self, session_id: str, file_path: str, page_number: int, zoom: float) -> deque:
+        key = (session_id, os.path.abspath(file_path))
+        history = self._history.pop(key, None) or deque(maxlen=NAVIGATION_HISTORY)
+        history.append((page_number, zoom))
+        self._history[key] = history
+        while len(self._history) > MAX_TRACKED_VIEWERS:
+            self._history.popitem(last=False)
+        return history
+    
+    def predict(self, history: deque) -> List[Tuple[int, float]]:
+        page_number, zoom = history[-1]
+        direction = 1
+        if len(history) >= 2 and history[-1][0] < history[-2][0]:
+            direction = -1
+        
+        zooms = [zoom]
+        for _, previous_zoom in reversed(history):
+            if previous_zoom not in zooms and len(zooms) < PREFETCH_ZOOM_LEVELS:
+                zooms.append(previous_zoom)
+        
+        pages = [page_number + direction * step for step in range(1, self.ahead + 1)]
+        pages += [page_number - direction * step for step in range(1, PREFETCH_BEHIND + 1)]
+        candidates = [(page, zoom) for page in pages if page >= 1]
+        for other_zoom in zooms[1:]:
+            candidates += [(page, other_zoom) for page in [page_number] + pages[:1] if page >= 1]
+        return candidates
+    
+    def _forget(self, session_id: str, task: asyncio.Task):
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+    
+    def cancel(self, session_id: str):
+        task = self._tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+    
+    async def _speculate(
+        self,
+        file_path: str,
+        candidates: List[Tuple[int, float]],
+        rotation: int,
+        image_format: str
+    ):
+        loop = asyncio.get_event_loop()
+        handle: Dict[str, fitz.Document] = {}
+        try:
+            for page_number, zoom in candidates:
+                key = RenderCache.make_key(file_path, page_number, zoom, rotation, image_format)
+                if key in self.cache:
+                    continue
+                try:
+                    await loop.run_in_executor(
+                        prefetch_executor,
+                        _prefetch_page,
+                        self.cache,
+                        key,
+                        handle,
+                        file_path,
+                        page_number,
+                        zoom,
+                        rotation,
+                        image_format
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.debug(f"Prefetch of page {page_number} failed: {e}")
+        finally:
+            # Queued on the single prefetch thread, so it runs after any render
+            # that is still using the handle when the task is cancelled
+            prefetch_executor.submit(_close_prefetch_handle, handle)
+    
+    def navigate(
+        self,
+        session_id: str,
+        file_path: str,
+        page_number: int,
+        zoom: float = 1.0,
+        rotation: int = 0,
+        image_format: str = "png"
+    ) -> List[Tuple[int, float]]:
+        image_format = normalize_render_format(image_format)
+        history = self._record(session_id, file_path, page_number, zoom)
+        candidates = self.predict(history)
+        
+        self.cancel(session_id)
+        task = asyncio.ensure_future(self._speculate(file_path, candidates, rotation, image_format))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda done: self._forget(session_id, done))
+        return candidates
+    
+    async def render(
+        self,
+        session_id: str,
+        file_path: str,
+        page_number: int,
+        zoom: float = 1.0,
+        rotation: int = 0,
+        image_format: str = "png"
+    ) -> bytes:
+        image_format = normalize_render_format(image_format)
+        # Real requests take precedence: drop queued speculative work first
+        self.cancel(session_id)
+        
+        key = RenderCache.make_key(file_path, page_number, zoom, rotation, image_format)
+        data = self.cache.get(key)
+        if data is None:
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(
+                executor,
+                _render_uncached,
+                file_path,
+                page_number,
+                zoom,
+                rotation,
+                image_format
+            )
+            self.cache.put(key, data)
+        
+        self.navigate(session_id, file_path, page_number, zoom, rotation, image_format)
+        return data
@@ -0,0 +1,158 @@
+import numpy as np
+from typing import Dict, Tuple, Sequence
+from collections import OrderedDict
+import os
+import hashlib
+import tempfile
+import threading
+
+from app.config.settings import settings
+from app.core.pdf_engine.extractor.positioned import PositionedText
+from app.core.pdf_engine.extractor.text import extract_positioned
+
+GRID_CELL_SIZE = 36.0
+MAX_CACHED_INDEXES = 16
+
+_indexes: "OrderedDict[Tuple[str, int, int, bool], DocumentSpatialIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class PageGrid:
+    def __init__(self, bboxes: np.ndarray, span_ids: np.ndarray, cell_size: float = GRID_CELL_SIZE):
+        self.bboxes = bboxes
+        self.span_ids = span_ids
+        self.cell_size = cell_size
+        if not len(bboxes):
+            self.origin = (0.0, 0.0)
+            self.shape = (0, 0)
+            self.cell_spans = np.empty(0, np.int64)
+            self.cell_starts = np.zeros(1, np.int64)
+            return
+        
+        self.origin = (float(bboxes[:, 0].min()), float(bboxes[:, 1].min()))
+        nx = int((bboxes[:, 2].max() - self.origin[0]) // cell_size) + 1
+        ny = int((bboxes[:, 3].max() - self.origin[1]) // cell_size) + 1
+        self.shape = (nx, ny)
+        
+        cx0, cy0, cx1, cy1 = self._cells(bboxes)
+        widths = cx1 - cx0 + 1
+        counts = widths * (cy1 - cy0 + 1)
+        owners = np.repeat(np.arange(len(bboxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (
+            (np.repeat(cy0, counts) + local // np.repeat(widths, counts)) * nx
+            + np.repeat(cx0, counts) + local % np.repeat(widths, counts)
+        )
+        order = np.argsort(cells, kind="stable")
+        self.cell_spans = owners[order]
+        self.cell_starts = np.searchsorted(cells[order], np.arange(nx * ny + 1))
+    
+    def _cells(self, boxes: np.ndarray) -> Tuple[np.ndarray, ...]:
+        nx, ny = self.shape
+        x = (boxes[:, [0, 2]] - self.origin[0]) // self.cell_size
+        y = (boxes[:, [1, 3]] - self.origin[1]) // self.cell_size
+        return (
+            np.clip(x[:, 0], 0, nx - 1).astype(np.int64),
+            np.clip(y[:, 0], 0, ny - 1).astype(np.int64),
+            np.clip(x[:, 1], 0, nx - 1).astype(np.int64),
+            np.clip(y[:, 1], 0, ny - 1).astype(np.int64),
+        )
+    
+    def query(self, rect: Sequence[float], contained: bool = False) -> np.ndarray:
+        if not len(self.bboxes):
+            return np.empty(0, np.int64)
+        x0, y0, x1, y1 = rect
+        nx, ny = self.shape
+        gx, gy = self.origin
+        if x1 < gx or y1 < gy or x0 > gx + nx * self.cell_size or y0 > gy + ny * self.cell_size:
+            return np.empty(0, np.int64)
+        cx0, cy0, cx1, cy1 = (int(v[0]) for v in self._cells(np.array([rect], dtype=np.float64)))
+        
+        chunks = [
+            self.cell_spans[self.cell_starts[row * nx + cx0]:self.cell_starts[row * nx + cx1 + 1]]
+            for row in range(cy0, cy1 + 1)
+        ]
+        candidates = np.unique(np.concatenate(chunks))
+        b = self.bboxes[candidates]
+        if contained:
+            hit = (b[:, 0] >= x0) & (b[:, 1] >= y0) & (b[:, 2] <= x1) & (b[:, 3] <= y1)
+        else:
+            hit = (b[:, 0] < x1) & (b[:, 2] > x0) & (b[:, 1] < y1) & (b[:, 3] > y0)
+        return self.span_ids[candidates[hit]]
+
+
+class DocumentSpatialIndex:
+    def __init__(self, positions: PositionedText):
+        self.positions = positions
+        order = np.argsort(positions.pages, kind="stable")
+        pages, starts = np.unique(positions.pages[order], return_index=True)
+        ends = np.r_[starts[1:], len(order)]
+        self._order = order
+        self._page_starts = {
+            int(page): (int(start), int(end))
+            for page, start, end in zip(pages, starts, ends)
+        }
+        self._grids: Dict[int, PageGrid] = {}
+        self._lock = threading.Lock()
+    
+    def grid(self, page_number: int) -> PageGrid:
+        grid = self._grids.get(page_number)
+        if grid is None:
+            start, end = self._page_starts.get(page_number, (0, 0))
+            span_ids = self._order[start:end]
+            grid = PageGrid(self.positions.bboxes[span_ids], span_ids)
+            with self._lock:
+                self._grids[page_number] = grid
+        return grid
+    
+    def query(self, page_number: int, rect: Sequence[float], contained: bool = False) -> np.ndarray:
+        return np.sort(self.grid(page_number).query(rect, contained))
+    
+    def page_text(self, page_number: int) -> PositionedText:
+        start, end = self._page_starts.get(page_number, (0, 0))
+        return self.positions.take(self._order[start:end])
+    
+    def text_in_rect(self, page_number: int, rect: Sequence[float], contained: bool = False) -> PositionedText:
+        return self.positions.take(self.query(page_number, rect, contained))
+    
+    @staticmethod
+    def _source_key(file_path: str) -> Tuple[str, int, int]:
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    
+    @staticmethod
+    def get_cache_path(file_path: str, words: bool = False) -> str:
+        digest = hashlib.sha1(repr(DocumentSpatialIndex._source_key(file_path)).encode("utf-8")).hexdigest()
+        return os.path.join(settings.CACHE_DIR, "positions", f"{digest}{'.words' if words else ''}.ptxt")
+    
+    @classmethod
+    def for_file(cls, file_path: str, words: bool = False) -> "DocumentSpatialIndex":
+        key = (*cls._source_key(file_path), words)
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is not None:
+                _indexes.move_to_end(key)
+                return index
+        
+        cache_path = cls.get_cache_path(file_path, words)
+        positions = None
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as f:
+                    positions = PositionedText.from_bytes(f.read())
+            except (OSError, ValueError):
+                positions = None
+        if positions is None:
+            positions = extract_positioned(file_path, words)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(positions.to_bytes())
+            os.replace(tmp_path, cache_path)
+        
+        index = cls(positions)
+        with _indexes_lock:
+            _indexes[key] = index
+            while len(_indexes) > MAX_CACHED_INDEXES:
+                _indexes.popitem(last=False)
+        return index
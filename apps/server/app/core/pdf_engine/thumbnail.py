@@ -0,0 +1,186 @@
+import fitz
+from typing import List, Dict, Any, Tuple
+import os
+import json
+import shutil
+import tempfile
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config.settings import settings
+from app.core.executor import get_process_executor
+from app.utils.file import get_file_hash
+
+executor = ThreadPoolExecutor(max_workers=2)
+
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+SHEET_FORMATS = {"webp": "WEBP", "jpeg": "JPEG", "png": "PNG"}
+MAX_CACHED_HASHES = 4096
+
+_hash_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_hash_cache_lock = threading.Lock()
+
+
+def _render_sheets(
+    input_path: str,
+    first_page: int,
+    last_page: int,
+    width: int,
+    sheet_dir: str,
+    image_format: str,
+    quality: int
+) -> List[Dict[str, Any]]:
+    from PIL import Image
+    
+    pages_per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    entries = []
+    
+    doc = fitz.open(input_path)
+    try:
+        for sheet_start in range(first_page, last_page, pages_per_sheet):
+            sheet_end = min(sheet_start + pages_per_sheet, last_page)
+            sheet_index = sheet_start // pages_per_sheet
+            
+            thumbs = []
+            for page_num in range(sheet_start, sheet_end):
+                page = doc[page_num]
+                zoom = width / page.rect.width
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                thumbs.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+            
+            cell_width = max(t.width for t in thumbs)
+            cell_height = max(t.height for t in thumbs)
+            columns = min(SPRITE_COLUMNS, len(thumbs))
+            rows = -(-len(thumbs) // SPRITE_COLUMNS)
+            
+            sheet = Image.new("RGB", (cell_width * columns, cell_height * rows), "white")
+            for i, thumb in enumerate(thumbs):
+                x = (i % SPRITE_COLUMNS) * cell_width
+                y = (i // SPRITE_COLUMNS) * cell_height
+                sheet.paste(thumb, (x, y))
+                entries.append({
+                    "page": sheet_start + i + 1,
+                    "sheet": sheet_index,
+                    "x": x,
+                    "y": y,
+                    "width": thumb.width,
+                    "height": thumb.height,
+                })
+            
+            sheet_path = os.path.join(sheet_dir, f"sheet_{sheet_index}.{image_format}")
+            sheet.save(sheet_path, format=SHEET_FORMATS[image_format], quality=quality)
+    finally:
+        doc.close()
+    
+    return entries
+
+
+def _content_hash(file_path: str) -> str:
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_cache_lock:
+        file_hash = _hash_cache.get(key)
+        if file_hash is not None:
+            _hash_cache.move_to_end(key)
+            return file_hash
+    
+    file_hash = get_file_hash(file_path)
+    with _hash_cache_lock:
+        _hash_cache[key] = file_hash
+        while len(_hash_cache) > MAX_CACHED_HASHES:
+            _hash_cache.popitem(last=False)
+    return file_hash
+
+
+class ThumbnailGenerator:
+    @staticmethod
+    def get_cache_dir(file_hash: str, width: int, image_format: str, quality: int) -> str:
+        return os.path.join(
+            settings.CACHE_DIR,
+            "thumbnails",
+            f"{file_hash}_{width}_{image_format}_q{quality}"
+        )
+    
+    @staticmethod
+    async def generate(
+        file_path: str,
+        width: int = 160,
+        image_format: str = "webp",
+        quality: int = 75
+    ) -> Dict[str, Any]:
+        if image_format not in SHEET_FORMATS:
+            raise ValueError(f"Unsupported sprite format: {image_format}")
+        
+        loop = asyncio.get_event_loop()
+        file_hash = await loop.run_in_executor(executor, _content_hash, file_path)
+        cache_dir = ThumbnailGenerator.get_cache_dir(file_hash, width, image_format, quality)
+        index_path = os.path.join(cache_dir, "index.json")
+        
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        
+        doc = fitz.open(file_path)
+        page_count = doc.page_count
+        doc.close()
+        
+        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+        work_dir = tempfile.mkdtemp(dir=os.path.dirname(cache_dir))
+        
+        try:
+            pages_per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+            if page_count <= pages_per_sheet:
+                ranges = [(0, page_count)]
+                pool = executor
+            else:
+                ranges = [
+                    (start, min(start + pages_per_sheet, page_count))
+                    for start in range(0, page_count, pages_per_sheet)
+                ]
+                pool = get_process_executor()
+            
+            results = await asyncio.gather(*[
+                loop.run_in_executor(
+                    pool,
+                    _render_sheets,
+                    file_path,
+                    start,
+                    end,
+                    width,
+                    work_dir,
+                    image_format,
+                    quality
+                )
+                for start, end in ranges
+            ])
+            
+            thumbnails = [entry for entries in results for entry in entries]
+            sheet_count = -(-page_count // pages_per_sheet)
+            index = {
+                "hash": file_hash,
+                "width": width,
+                "format": image_format,
+                "page_count": page_count,
+                "columns": SPRITE_COLUMNS,
+                "sheets": [
+                    os.path.abspath(os.path.join(cache_dir, f"sheet_{i}.{image_format}"))
+                    for i in range(sheet_count)
+                ],
+                "thumbnails": thumbnails,
+            }
+            
+            with open(os.path.join(work_dir, "index.json"), "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            
+            try:
+                os.replace(work_dir, cache_dir)
+            except OSError:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            
+            return index
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
@@ -0,0 +1,248 @@
+import fitz
+import pikepdf
+import io
+import math
+import uuid
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.executor import get_process_executor
+
+WATERMARK_POSITIONS = ("center", "tile", "top-left", "top-right", "bottom-left", "bottom-right")
+WATERMARK_MARGIN = 36.0
+TILE_GAP = 72.0
+# Image stamps are fitted into this share of the visible page
+IMAGE_PAGE_FRACTION = 0.5
+
+
+def _hex_to_rgb(hex_color: str) -> Tuple[float, float, float]:
+    hex_color = hex_color.lstrip("#")
+    return tuple(int(hex_color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def parse_page_selection(pages: Optional[str], page_count: int) -> List[int]:
+    if not pages or pages.strip().lower() == "all":
+        return list(range(page_count))
+    selected = set()
+    for part in pages.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-")
+            selected.update(range(int(start), int(end) + 1))
+        elif part:
+            selected.add(int(part))
+    return sorted(p - 1 for p in selected if 1 <= p <= page_count)
+
+
+def build_stamp(
+    watermark_type: str,
+    text: Optional[str] = None,
+    image_path: Optional[str] = None,
+    font_size: int = 48,
+    font_color: str = "#CCCCCC"
+) -> bytes:
+    stamp = fitz.open()
+    try:
+        if watermark_type == "text":
+            if not text:
+                raise ValueError("Text watermark requires watermark_text")
+            lines = text.splitlines() or [text]
+            # Only the glyphs used are embedded, once, whatever the page count
+            font = fitz.Font("helv" if all(ord(c) < 256 for c in text) else "cjk")
+            width = max(font.text_length(line, font_size) for line in lines)
+            line_height = font_size * 1.2
+            page = stamp.new_page(width=width, height=line_height * len(lines))
+            writer = fitz.TextWriter(page.rect, color=_hex_to_rgb(font_color))
+            for i, line in enumerate(lines):
+                writer.append((0, line_height * i + font_size), line, font=font, fontsize=font_size)
+            writer.write_text(page)
+            stamp.subset_fonts()
+        elif watermark_type == "image":
+            if not image_path:
+                raise ValueError("Image watermark requires watermark_image")
+            # The image is read and embedded a single time, then shared by every page
+            pixmap = fitz.Pixmap(image_path)
+            page = stamp.new_page(width=pixmap.width, height=pixmap.height)
+            page.insert_image(page.rect, filename=image_path)
+        else:
+            raise ValueError(f"Unknown watermark type: {watermark_type}")
+        return stamp.tobytes(garbage=3, deflate=True)
+    finally:
+        stamp.close()
+
+
+def _inherited(obj: pikepdf.Dictionary, key: str) -> Any:
+    while obj is not None:
+        if key in obj:
+            return obj[key]
+        obj = obj.get("/Parent")
+    return None
+
+
+def _stamp_form(
+    pdf: pikepdf.Pdf,
+    stamp_pdf: pikepdf.Pdf,
+    rotation: float,
+    opacity: float
+) -> Tuple[pikepdf.Object, float, float]:
+    inner = pdf.copy_foreign(pikepdf.Page(stamp_pdf.pages[0]).as_form_xobject())
+    x0, y0, x1, y1 = (float(v) for v in inner.BBox)
+    
+    angle = math.radians(rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+    corners = [(x * cos - y * sin, x * sin + y * cos) for x in (x0, x1) for y in (y0, y1)]
+    min_x = min(x for x, _ in corners)
+    min_y = min(y for _, y in corners)
+    width = max(x for x, _ in corners) - min_x
+    height = max(y for _, y in corners) - min_y
+    
+    # Rotation and opacity live in one wrapper form, so pages only place it
+    outer = pdf.make_stream(
+        b"q /WmGS gs %.6f %.6f %.6f %.6f %.4f %.4f cm /WmStamp Do Q"
+        % (cos, sin, -sin, cos, -min_x, -min_y)
+    )
+    outer.Type = pikepdf.Name.XObject
+    outer.Subtype = pikepdf.Name.Form
+    outer.BBox = pikepdf.Array([0, 0, width, height])
+    outer.Resources = pikepdf.Dictionary(
+        XObject=pikepdf.Dictionary(WmStamp=inner),
+        ExtGState=pikepdf.Dictionary(
+            WmGS=pikepdf.Dictionary(Type=pikepdf.Name.ExtGState, ca=opacity, CA=opacity)
+        )
+    )
+    return outer, width, height
+
+
+def _visible_to_user(box: Tuple[float, float, float, float], rotate: int) -> fitz.Matrix:
+    x0, y0, x1, y1 = box
+    w, h = x1 - x0, y1 - y0
+    to_unrotated = {
+        0: fitz.Matrix(1, 0, 0, 1, 0, 0),
+        90: fitz.Matrix(0, 1, -1, 0, w, 0),
+        180: fitz.Matrix(-1, 0, 0, -1, w, h),
+        270: fitz.Matrix(0, -1, 1, 0, 0, h),
+    }[rotate]
+    return to_unrotated * fitz.Matrix(1, 0, 0, 1, x0, y0)
+
+
+def _placements(
+    visible_width: float,
+    visible_height: float,
+    stamp_width: float,
+    stamp_height: float,
+    position: str,
+    fit: float
+) -> List[Tuple[float, float, float]]:
+    # Stamps are only ever shrunk, to fit inside the margins or the given share of the page
+    scale = min(
+        1.0,
+        min(visible_width * fit, visible_width - 2 * WATERMARK_MARGIN) / stamp_width,
+        min(visible_height * fit, visible_height - 2 * WATERMARK_MARGIN) / stamp_height
+    )
+    w, h = stamp_width * scale, stamp_height * scale
+    m = WATERMARK_MARGIN
+    if position == "tile":
+        cols = max(1, int((visible_width + TILE_GAP) // (w + TILE_GAP)))
+        rows = max(1, int((visible_height + TILE_GAP) // (h + TILE_GAP)))
+        left = (visible_width - cols * w - (cols - 1) * TILE_GAP) / 2
+        bottom = (visible_height - rows * h - (rows - 1) * TILE_GAP) / 2
+        return [
+            (scale, left + c * (w + TILE_GAP), bottom + r * (h + TILE_GAP))
+            for r in range(rows)
+            for c in range(cols)
+        ]
+    origin = {
+        "center": ((visible_width - w) / 2, (visible_height - h) / 2),
+        "top-left": (m, visible_height - h - m),
+        "top-right": (visible_width - w - m, visible_height - h - m),
+        "bottom-left": (m, m),
+        "bottom-right": (visible_width - w - m, m),
+    }[position]
+    return [(scale, origin[0], origin[1])]
+
+
+def apply_watermark(
+    input_path: str,
+    output_path: str,
+    watermark_type: str,
+    watermark_text: Optional[str] = None,
+    watermark_image: Optional[str] = None,
+    font_size: int = 48,
+    font_color: str = "#CCCCCC",
+    opacity: float = 0.3,
+    rotation: float = -45,
+    position: str = "center",
+    pages: Optional[str] = "all",
+    layer: str = "over"
+) -> Dict[str, Any]:
+    if position not in WATERMARK_POSITIONS:
+        raise ValueError(f"Unknown watermark position: {position}")
+    if layer not in ("over", "under"):
+        raise ValueError(f"Unknown watermark layer: {layer}")
+    stamp = build_stamp(watermark_type, watermark_text, watermark_image, font_size, font_color)
+    fit = IMAGE_PAGE_FRACTION if watermark_type == "image" else 1.0
+    
+    # The stamp stays open until the save, since copied stream data is read from it lazily
+    with pikepdf.open(io.BytesIO(stamp)) as stamp_pdf, pikepdf.open(input_path) as pdf:
+        form, stamp_width, stamp_height = _stamp_form(pdf, stamp_pdf, rotation, max(0.0, min(1.0, opacity)))
+        name = pikepdf.Name("/Wm" + uuid.uuid4().hex[:8])
+        save_state = pdf.make_stream(b"q")
+        restore_state = pdf.make_stream(b"Q")
+        # Pages with the same box and rotation share one placement stream
+        placements: Dict[Tuple, pikepdf.Object] = {}
+        
+        selected = parse_page_selection(pages, len(pdf.pages))
+        for index in selected:
+            page = pdf.pages[index].obj
+            box = _inherited(page, "/CropBox") or _inherited(page, "/MediaBox")
+            x0, y0, x1, y1 = (float(v) for v in box)
+            box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+            rotate = int(_inherited(page, "/Rotate") or 0) % 360
+            
+            key = (box, rotate)
+            placement = placements.get(key)
+            if placement is None:
+                width, height = box[2] - box[0], box[3] - box[1]
+                if rotate in (90, 270):
+                    width, height = height, width
+                to_user = _visible_to_user(box, rotate)
+                ops = []
+                for scale, x, y in _placements(width, height, stamp_width, stamp_height, position, fit):
+                    m = fitz.Matrix(scale, 0, 0, scale, x, y) * to_user
+                    ops.append(b"q %.6f %.6f %.6f %.6f %.4f %.4f cm %s Do Q" % (m.a, m.b, m.c, m.d, m.e, m.f, bytes(str(name), "ascii")))
+                placement = placements[key] = pdf.make_stream(b"\n".join(ops))
+            
+            if "/Resources" not in page:
+                inherited = _inherited(page, "/Resources")
+                page.Resources = pikepdf.Dictionary(inherited.items()) if inherited is not None else pikepdf.Dictionary()
+            resources = page.Resources
+            if "/XObject" not in resources:
+                resources.XObject = pikepdf.Dictionary()
+            resources.XObject[name] = form
+            
+            contents = page.get("/Contents")
+            existing = list(contents) if isinstance(contents, pikepdf.Array) else [contents] if contents is not None else []
+            if layer == "over":
+                page.Contents = pikepdf.Array([save_state, *existing, restore_state, placement])
+            else:
+                page.Contents = pikepdf.Array([placement, *existing])
+        
+        pdf.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.preserve)
+    
+    return {"output_path": output_path, "pages": len(selected)}
+
+
+def _watermark_job(input_path: str, output_path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        apply_watermark(input_path, output_path, **options)
+        return {"input": input_path, "output": output_path, "status": "success"}
+    except Exception as e:
+        return {"input": input_path, "output": None, "status": "failed", "error": str(e)}
+
+
+def watermark_files(jobs: List[Tuple[str, str]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return list(get_process_executor().map(
+        _watermark_job,
+        [input_path for input_path, _ in jobs],
+        [output_path for _, output_path in jobs],
+        [options] * len(jobs)
+    ))
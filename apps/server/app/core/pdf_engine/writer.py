@@ -1,31 +1,179 @@
 import fitz
-from typing import List, Dict, Any
+import io
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import asyncio
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 
 executor = ThreadPoolExecutor(max_workers=4)
+decode_executor = ThreadPoolExecutor(max_workers=4)
+
+IMAGE_PREFETCH = 8
+IMAGE_FLUSH_BYTES = 64 * 1024 * 1024
+# Formats MuPDF embeds straight from the file bytes; JPEG and JPEG 2000 keep
+# their DCT/JPX streams untouched.
+PASSTHROUGH_IMAGE_FORMATS = {"JPEG", "JPEG2000", "PNG", "TIFF", "BMP", "GIF", "PPM"}
+
+ImageFrame = Tuple[bytes, int, int, Tuple[float, float]]
+
+
+def _image_dpi(info: Dict[str, Any]) -> Tuple[float, float]:
+    dpi = info.get("dpi") or (72, 72)
+    return tuple(float(d) if d and d > 1 else 72.0 for d in dpi[:2])
+
+
+def _load_image_frames(image_path: str) -> List[ImageFrame]:
+    from PIL import Image, ImageSequence, UnidentifiedImageError
+    
+    try:
+        img = Image.open(image_path)
+    except (UnidentifiedImageError, OSError) as e:
+        raise ValueError(f"Invalid image file: {image_path}") from e
+    
+    with img:
+        n_frames = getattr(img, "n_frames", 1)
+        if img.format in PASSTHROUGH_IMAGE_FORMATS and (n_frames == 1 or img.format != "TIFF"):
+            with open(image_path, "rb") as f:
+                return [(f.read(), img.width, img.height, _image_dpi(img.info))]
+        
+        frames = []
+        for frame in ImageSequence.Iterator(img):
+            buf = io.BytesIO()
+            if frame.mode == "1":
+                frame.save(buf, "TIFF", compression="group4")
+            else:
+                if frame.mode not in ("RGB", "RGBA", "L", "LA"):
+                    frame = frame.convert("RGB")
+                frame.save(buf, "PNG", compress_level=1)
+            frames.append((buf.getvalue(), frame.width, frame.height, _image_dpi(frame.info or img.info)))
+        return frames
+
+
+def _prefetch_images(image_paths: List[str], window: int) -> Iterator[List[ImageFrame]]:
+    paths = iter(image_paths)
+    pending = deque()
+    for path in paths:
+        pending.append(decode_executor.submit(_load_image_frames, path))
+        if len(pending) >= window:
+            break
+    
+    while pending:
+        frames = pending.popleft().result()
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append(decode_executor.submit(_load_image_frames, next_path))
+        yield frames
+
+
+def _page_size(
+    page_size: str,
+    orientation: str,
+    custom_width: Optional[float],
+    custom_height: Optional[float]
+) -> Optional[Tuple[float, float]]:
+    if page_size == "fit":
+        return None
+    if page_size == "custom":
+        if not custom_width or not custom_height:
+            raise ValueError("custom page size requires custom_width and custom_height")
+        width, height = custom_width, custom_height
+    else:
+        width, height = fitz.paper_size(page_size)
+        if width < 0:
+            raise ValueError(f"Unknown page size: {page_size}")
+    
+    if orientation == "landscape":
+        return max(width, height), min(width, height)
+    return min(width, height), max(width, height)
+
+
+def _place_image(
+    page_rect: fitz.Rect,
+    image_width: float,
+    image_height: float,
+    margin: float,
+    align: str
+) -> fitz.Rect:
+    box = page_rect + (margin, margin, -margin, -margin)
+    scale = min(box.width / image_width, box.height / image_height)
+    width, height = image_width * scale, image_height * scale
+    
+    if align == "left":
+        x0 = box.x0
+    elif align == "right":
+        x0 = box.x1 - width
+    else:
+        x0 = box.x0 + (box.width - width) / 2
+    y0 = box.y0 + (box.height - height) / 2
+    return fitz.Rect(x0, y0, x0 + width, y0 + height)
+
+
+def write_images_to_pdf(
+    image_paths: List[str],
+    output_path: str,
+    page_size: str = "fit",
+    orientation: str = "portrait",
+    margin: float = 0,
+    align: str = "center",
+    custom_width: Optional[float] = None,
+    custom_height: Optional[float] = None
+) -> str:
+    if not image_paths:
+        raise ValueError("No images to convert")
+    
+    fixed_size = _page_size(page_size, orientation, custom_width, custom_height)
+    doc = fitz.open()
+    saved = False
+    pending_bytes = 0
+    
+    try:
+        for frames in _prefetch_images(image_paths, IMAGE_PREFETCH):
+            for data, width_px, height_px, (dpi_x, dpi_y) in frames:
+                natural_width = width_px * 72 / dpi_x
+                natural_height = height_px * 72 / dpi_y
+                if fixed_size is None:
+                    page = doc.new_page(width=natural_width + 2 * margin, height=natural_height + 2 * margin)
+                else:
+                    page = doc.new_page(width=fixed_size[0], height=fixed_size[1])
+                
+                rect = _place_image(page.rect, natural_width, natural_height, margin, align)
+                page.insert_image(rect, stream=data, keep_proportion=False)
+                pending_bytes += len(data)
+            
+            # Flush finished pages to disk and reopen so image streams from
+            # earlier batches are read lazily instead of staying in memory.
+            if pending_bytes >= IMAGE_FLUSH_BYTES:
+                if saved:
+                    doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                else:
+                    doc.save(output_path, deflate=True)
+                    saved = True
+                doc.close()
+                doc = fitz.open(output_path)
+                pending_bytes = 0
+        
+        if not saved:
+            doc.save(output_path, deflate=True)
+        elif pending_bytes:
+            doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    finally:
+        doc.close()
+    
+    return output_path
 
 
 class PdfWriter:
     @staticmethod
-    async def create_from_images(image_paths: List[str], output_path: str) -> str:
+    async def create_from_images(
+        image_paths: List[str],
+        output_path: str,
+        page_size: str = "fit",
+        orientation: str = "portrait",
+        margin: float = 0,
+        align: str = "center"
+    ) -> str:
         def _write():
-            doc = fitz.open()
-            
-            for img_path in image_paths:
-                img_doc = fitz.open(img_path)
-                rect = img_doc[0].rect
-                pdf_bytes = img_doc.convert_to_pdf()
-                img_doc.close()
-                
-                img_pdf = fitz.open("pdf", pdf_bytes)
-                page = doc.new_page(width=rect.width, height=rect.height)
-                page.show_pdf_page(rect, img_pdf, 0)
-                img_pdf.close()
-            
-            doc.save(output_path)
-            doc.close()
-            return output_path
+            return write_images_to_pdf(image_paths, output_path, page_size, orientation, margin, align)
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _write)
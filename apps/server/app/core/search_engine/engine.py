@@ -0,0 +1,351 @@
+import fitz
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import os
+import re
+import asyncio
+import hashlib
+import weakref
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from loguru import logger
+
+from app.core.pdf_engine.extractor.positioned import CJK_CHAR, PositionedText, is_word_char
+from app.core.pdf_engine.spatial import DocumentSpatialIndex
+
+executor = ThreadPoolExecutor(max_workers=2)
+
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Han, kana and Hangul are written without spaces; FTS5's unicode61 tokenizer
+# would index a whole run as one token, so every character becomes its own
+# token and multi-character queries are matched as phrases.
+_CJK_CHAR = re.compile(f"({CJK_CHAR.pattern})")
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS search_documents (
+        id INTEGER PRIMARY KEY,
+        file_path TEXT NOT NULL UNIQUE,
+        file_size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        page_count INTEGER NOT NULL,
+        indexed_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_pages (
+        id INTEGER PRIMARY KEY,
+        document_id INTEGER NOT NULL REFERENCES search_documents(id) ON DELETE CASCADE,
+        page INTEGER NOT NULL,
+        text_hash TEXT NOT NULL,
+        UNIQUE (document_id, page)
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        content,
+        tokenize = '{SEARCH_TOKENIZER}'
+    )
+    """,
+)
+
+
+def segment_cjk(value: str) -> str:
+    return _CJK_CHAR.sub(r" \1 ", value)
+
+
+def build_match_query(query: str) -> str:
+    phrases = []
+    for term in query.split():
+        phrase = " ".join(segment_cjk(term).split())
+        if phrase:
+            phrases.append('"' + phrase.replace('"', '""') + '"')
+    return " AND ".join(phrases)
+
+
+def normalize_token(value: str) -> str:
+    # Case and diacritics are folded the way remove_diacritics 2 folds them
+    stripped = "".join(ch for ch in unicodedata.normalize("NFD", value) if unicodedata.category(ch) != "Mn")
+    return unicodedata.normalize("NFC", stripped).lower()
+
+
+def tokenize(value: str) -> List[str]:
+    tokens = []
+    current = []
+    for ch in value:
+        cjk = CJK_CHAR.match(ch) is not None
+        if is_word_char(ch) and not cjk:
+            current.append(ch)
+            continue
+        if current:
+            tokens.append(normalize_token("".join(current)))
+            current = []
+        if cjk:
+            tokens.append(ch)
+    if current:
+        tokens.append(normalize_token("".join(current)))
+    return tokens
+
+
+def _join_words(words: List[str]) -> str:
+    parts = []
+    for i, word in enumerate(words):
+        if i and not (CJK_CHAR.match(word) and CJK_CHAR.match(words[i - 1])):
+            parts.append(" ")
+        parts.append(word)
+    return "".join(parts)
+
+
+def _extract_document(file_path: str) -> List[Tuple[int, str, str]]:
+    # Word entries are split exactly where the FTS tokenizer splits, so the
+    # indexed content and the highlight boxes come from the same words
+    index = DocumentSpatialIndex.for_file(file_path, words=True)
+    doc = fitz.open(file_path)
+    page_count = doc.page_count
+    doc.close()
+    
+    pages = []
+    for page in range(1, page_count + 1):
+        content = " ".join(index.page_text(page).texts())
+        pages.append((page, hashlib.sha1(content.encode("utf-8")).hexdigest(), content))
+    return pages
+
+
+def _highlight(words: PositionedText, phrases: List[List[str]]) -> Tuple[List[Dict[str, Any]], str]:
+    tokens = [normalize_token(word) for word in words.texts()]
+    lines = words.line_ids()
+    highlights = []
+    first = None
+    for phrase in phrases:
+        size = len(phrase)
+        for start in range(len(tokens) - size + 1):
+            if tokens[start:start + size] != phrase:
+                continue
+            first = start if first is None else min(first, start)
+            # A phrase that wraps gets one box per line
+            by_line: Dict[int, List[int]] = {}
+            for i in range(start, start + size):
+                by_line.setdefault(int(lines[i]), []).append(i)
+            for members in by_line.values():
+                boxes = words.bboxes[members]
+                highlights.append({
+                    "text": _join_words([words.span_text(i) for i in members]),
+                    "bbox": [
+                        round(float(boxes[:, 0].min()), 2),
+                        round(float(boxes[:, 1].min()), 2),
+                        round(float(boxes[:, 2].max()), 2),
+                        round(float(boxes[:, 3].max()), 2),
+                    ],
+                })
+    
+    snippet = ""
+    if first is not None:
+        line = (lines == lines[first]).nonzero()[0]
+        line = line[words.bboxes[line, 0].argsort(kind="stable")]
+        snippet = _join_words([words.span_text(i) for i in line.tolist()])
+    return highlights, snippet
+
+
+def _page_highlights(file_path: str, page: int, phrases: List[List[str]]) -> Tuple[List[Dict[str, Any]], str]:
+    try:
+        index = DocumentSpatialIndex.for_file(file_path, words=True)
+    except OSError:
+        return [], ""
+    return _highlight(index.page_text(page), phrases)
+
+
+class SearchEngine:
+    def __init__(self, db_engine: Optional[AsyncEngine] = None):
+        if db_engine is None:
+            from app.db.database import engine as db_engine
+        self.db = db_engine
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        # One lock per file, dropped once no index run holds it
+        self._index_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+    
+    async def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        async with self._schema_lock:
+            if self._schema_ready:
+                return
+            database = self.db.url.database
+            if self.db.url.get_backend_name() == "sqlite" and database and database != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+            async with self.db.begin() as conn:
+                for statement in SCHEMA:
+                    await conn.execute(text(statement))
+            self._schema_ready = True
+    
+    async def index_document(self, file_path: str, force: bool = False) -> Dict[str, Any]:
+        await self._ensure_schema()
+        file_path = os.path.abspath(file_path)
+        lock = self._index_locks.get(file_path)
+        if lock is None:
+            lock = self._index_locks[file_path] = asyncio.Lock()
+        # A second caller for the same file waits and then finds it unchanged
+        async with lock:
+            return await self._index_document(file_path, force)
+    
+    async def _index_document(self, file_path: str, force: bool) -> Dict[str, Any]:
+        stat = os.stat(file_path)
+        
+        async with self.db.connect() as conn:
+            row = (await conn.execute(
+                text("SELECT id, file_size, mtime_ns FROM search_documents WHERE file_path = :path"),
+                {"path": file_path}
+            )).first()
+        if row is not None and not force and (row.file_size, row.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return {"file_path": file_path, "status": "unchanged", "updated": 0, "removed": 0}
+        
+        loop = asyncio.get_event_loop()
+        pages = await loop.run_in_executor(executor, _extract_document, file_path)
+        
+        updated = 0
+        async with self.db.begin() as conn:
+            values = {
+                "path": file_path,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "count": len(pages),
+                "now": datetime.utcnow().isoformat(),
+            }
+            if row is None:
+                result = await conn.execute(
+                    text(
+                        "INSERT INTO search_documents (file_path, file_size, mtime_ns, page_count, indexed_at) "
+                        "VALUES (:path, :size, :mtime, :count, :now)"
+                    ),
+                    values
+                )
+                document_id = result.lastrowid
+                existing = {}
+            else:
+                document_id = row.id
+                await conn.execute(
+                    text(
+                        "UPDATE search_documents SET file_size = :size, mtime_ns = :mtime, "
+                        "page_count = :count, indexed_at = :now WHERE id = :id"
+                    ),
+                    {**values, "id": document_id}
+                )
+                existing = {
+                    page: (page_id, text_hash)
+                    for page_id, page, text_hash in await conn.execute(
+                        text("SELECT id, page, text_hash FROM search_pages WHERE document_id = :id"),
+                        {"id": document_id}
+                    )
+                }
+            
+            # Only pages whose text changed are rewritten in the FTS index
+            for page, text_hash, content in pages:
+                previous = existing.pop(page, None)
+                if previous is not None and previous[1] == text_hash:
+                    continue
+                if previous is None:
+                    result = await conn.execute(
+                        text(
+                            "INSERT INTO search_pages (document_id, page, text_hash) "
+                            "VALUES (:id, :page, :hash)"
+                        ),
+                        {"id": document_id, "page": page, "hash": text_hash}
+                    )
+                    page_id = result.lastrowid
+                else:
+                    page_id = previous[0]
+                    await conn.execute(
+                        text("UPDATE search_pages SET text_hash = :hash WHERE id = :page_id"),
+                        {"hash": text_hash, "page_id": page_id}
+                    )
+                    await conn.execute(text("DELETE FROM search_fts WHERE rowid = :page_id"), {"page_id": page_id})
+                await conn.execute(
+                    text("INSERT INTO search_fts (rowid, content) VALUES (:page_id, :content)"),
+                    {"page_id": page_id, "content": content}
+                )
+                updated += 1
+            
+            removed = [page_id for page_id, _ in existing.values()]
+            for page_id in removed:
+                await conn.execute(text("DELETE FROM search_fts WHERE rowid = :page_id"), {"page_id": page_id})
+                await conn.execute(text("DELETE FROM search_pages WHERE id = :page_id"), {"page_id": page_id})
+        
+        logger.info(f"Indexed {file_path}: {updated} of {len(pages)} pages updated, {len(removed)} removed")
+        return {
+            "file_path": file_path,
+            "status": "indexed" if row is None else "updated",
+            "page_count": len(pages),
+            "updated": updated,
+            "removed": len(removed),
+        }
+    
+    async def remove_document(self, file_path: str) -> bool:
+        await self._ensure_schema()
+        file_path = os.path.abspath(file_path)
+        async with self.db.begin() as conn:
+            row = (await conn.execute(
+                text("SELECT id FROM search_documents WHERE file_path = :path"),
+                {"path": file_path}
+            )).first()
+            if row is None:
+                return False
+            await conn.execute(
+                text("DELETE FROM search_fts WHERE rowid IN (SELECT id FROM search_pages WHERE document_id = :id)"),
+                {"id": row.id}
+            )
+            await conn.execute(text("DELETE FROM search_pages WHERE document_id = :id"), {"id": row.id})
+            await conn.execute(text("DELETE FROM search_documents WHERE id = :id"), {"id": row.id})
+        return True
+    
+    async def search(
+        self,
+        query: str,
+        file_path: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        match = build_match_query(query)
+        if not match:
+            return []
+        
+        if file_path is not None:
+            file_path = os.path.abspath(file_path)
+            await self.index_document(file_path)
+        else:
+            await self._ensure_schema()
+        
+        sql = (
+            "SELECT d.file_path, p.page, bm25(search_fts) AS score "
+            "FROM search_fts "
+            "JOIN search_pages p ON p.id = search_fts.rowid "
+            "JOIN search_documents d ON d.id = p.document_id "
+            "WHERE search_fts MATCH :match"
+        )
+        params = {"match": match, "limit": limit, "offset": offset}
+        if file_path is not None:
+            sql += " AND d.file_path = :path"
+            params["path"] = file_path
+        sql += " ORDER BY score LIMIT :limit OFFSET :offset"
+        
+        async with self.db.connect() as conn:
+            rows = (await conn.execute(text(sql), params)).all()
+        
+        # Highlights come from the cached word boxes, matched token by token
+        phrases = [tokens for tokens in (tokenize(term) for term in query.split()) if tokens]
+        loop = asyncio.get_event_loop()
+        hits = []
+        for row in rows:
+            highlights, snippet = await loop.run_in_executor(
+                executor, _page_highlights, row.file_path, row.page, phrases
+            )
+            hits.append({
+                "file_path": row.file_path,
+                "page": row.page,
+                "score": -row.score,
+                "snippet": snippet,
+                "highlights": highlights,
+            })
+        return hits
@@ -0,0 +1,149 @@
+import pikepdf
+import numpy as np
+from typing import List, Dict, Any, Optional, Callable
+import time
+import asyncio
+
+from app.core.executor import get_process_executor
+
+# Security handler revision per method: R3 is RC4-128, R4 is AES-128 (PDF 1.6),
+# R6 is AES-256 (PDF 2.0)
+ENCRYPTION_METHODS = {
+    "rc4": 3,
+    "aes-128": 4,
+    "aes-256": 6,
+}
+DEFAULT_ENCRYPTION_METHOD = "aes-256"
+LATENCY_PERCENTILES = (50, 90, 99)
+
+DEFAULT_PERMISSIONS = {
+    "print": True,
+    "copy": False,
+    "modify": False,
+    "annotate": True,
+}
+
+
+def build_encryption(
+    user_password: str,
+    owner_password: Optional[str] = None,
+    permissions: Optional[Dict[str, bool]] = None,
+    method: str = DEFAULT_ENCRYPTION_METHOD
+) -> pikepdf.Encryption:
+    if method not in ENCRYPTION_METHODS:
+        raise ValueError(f"Unsupported encryption method: {method}")
+    permissions = {**DEFAULT_PERMISSIONS, **(permissions or {})}
+    revision = ENCRYPTION_METHODS[method]
+    return pikepdf.Encryption(
+        owner=owner_password or user_password,
+        user=user_password,
+        R=revision,
+        aes=revision >= 4,
+        metadata=revision >= 4,
+        allow=pikepdf.Permissions(
+            print_lowres=permissions["print"],
+            print_highres=permissions["print"],
+            extract=permissions["copy"],
+            modify_other=permissions["modify"],
+            modify_annotation=permissions["annotate"],
+        )
+    )
+
+
+def encrypt_file(
+    input_path: str,
+    output_path: str,
+    user_password: str,
+    owner_password: Optional[str] = None,
+    permissions: Optional[Dict[str, bool]] = None,
+    method: str = DEFAULT_ENCRYPTION_METHOD
+) -> str:
+    encryption = build_encryption(user_password, owner_password, permissions, method)
+    # qpdf reads objects lazily from the mapped file and copies stream data
+    # through without recompressing, so large inputs are never fully loaded
+    with pikepdf.open(input_path, access_mode=pikepdf.AccessMode.mmap) as pdf:
+        pdf.save(output_path, encryption=encryption, object_stream_mode=pikepdf.ObjectStreamMode.preserve)
+    return output_path
+
+
+def decrypt_file(input_path: str, output_path: str, password: str) -> str:
+    with pikepdf.open(input_path, password=password, access_mode=pikepdf.AccessMode.mmap) as pdf:
+        pdf.save(output_path, object_stream_mode=pikepdf.ObjectStreamMode.preserve)
+    return output_path
+
+
+def _run_job(operation: str, input_path: str, output_path: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        if operation == "encrypt":
+            encrypt_file(
+                input_path,
+                output_path,
+                options.get("password", ""),
+                options.get("owner_password"),
+                options.get("permissions"),
+                options.get("method", DEFAULT_ENCRYPTION_METHOD)
+            )
+        elif operation == "decrypt":
+            decrypt_file(input_path, output_path, options.get("password", ""))
+        else:
+            raise ValueError(f"Unknown security operation: {operation}")
+        result = {"input": input_path, "output": output_path, "status": "success"}
+    except Exception as e:
+        result = {"input": input_path, "output": None, "status": "failed", "error": str(e)}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.asarray(latencies)
+    summary = {
+        f"p{p}": float(v)
+        for p, v in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES))
+    }
+    summary["mean"] = float(values.mean())
+    summary["max"] = float(values.max())
+    return summary
+
+
+async def run_security_batch(
+    operation: str,
+    jobs: List[tuple],
+    options: Dict[str, Any],
+    progress_callback: Optional[Callable[[int], None]] = None
+) -> Dict[str, Any]:
+    if operation == "encrypt":
+        # Reject a bad method once instead of failing every file in the pool
+        build_encryption(options.get("password", ""), method=options.get("method", DEFAULT_ENCRYPTION_METHOD))
+    
+    start = time.perf_counter()
+    loop = asyncio.get_event_loop()
+    
+    async def _indexed(index: int, input_path: str, output_path: str):
+        return index, await loop.run_in_executor(
+            get_process_executor(), _run_job, operation, input_path, output_path, options
+        )
+    
+    futures = [_indexed(i, input_path, output_path) for i, (input_path, output_path) in enumerate(jobs)]
+    results = [None] * len(jobs)
+    for done, future in enumerate(asyncio.as_completed(futures), 1):
+        index, result = await future
+        results[index] = result
+        if progress_callback:
+            progress_callback(int(done / len(futures) * 100))
+    
+    elapsed = time.perf_counter() - start
+    succeeded = [r["seconds"] for r in results if r["status"] == "success"]
+    return {
+        "results": results,
+        "stats": {
+            "total": len(results),
+            "succeeded": len(succeeded),
+            "failed": len(results) - len(succeeded),
+            "elapsed": elapsed,
+            "files_per_second": len(results) / elapsed if elapsed else 0.0,
+            "latency": latency_summary(succeeded),
+        },
+    }
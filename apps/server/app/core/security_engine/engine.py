@@ -1,12 +1,34 @@
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Callable
 import os
+import time
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from loguru import logger
+
+from app.core.security_engine.batch import (
+    DEFAULT_ENCRYPTION_METHOD,
+    decrypt_file,
+    encrypt_file,
+    latency_summary,
+    run_security_batch,
+)
+from app.core.security_engine.inspector import check_password, inspect_permissions
+from app.core.security_engine.redactor import auto_redact_document
+from app.core.security_engine.signer import Signer, sign_documents, sign_pdf, verify_pdf
 
 executor = ThreadPoolExecutor(max_workers=2)
 
 
+def _redaction_rect(redaction: Dict):
+    import fitz
+    
+    return fitz.Rect(
+        redaction["x"],
+        redaction["y"],
+        redaction["x"] + redaction["width"],
+        redaction["y"] + redaction["height"]
+    )
+
+
 class SecurityEngine:
     def __init__(self):
         pass
@@ -17,37 +39,20 @@ class SecurityEngine:
         output_path: str,
         user_password: str,
         owner_password: Optional[str] = None,
-        permissions: Dict = None
+        permissions: Dict = None,
+        method: str = DEFAULT_ENCRYPTION_METHOD
     ) -> str:
-        def _encrypt():
-            import pikepdf
-            
-            if permissions is None:
-                permissions = {
-                    "print": True,
-                    "copy": False,
-                    "modify": False,
-                    "annotate": True,
-                }
-            
-            with pikepdf.open(input_path) as pdf:
-                encryption = pikepdf.Encryption(
-                    owner=owner_password or user_password,
-                    user=user_password,
-                    R=6,
-                    allow=pikepdf.Permissions(
-                        print=permissions.get("print", True),
-                        extract=permissions.get("copy", False),
-                        modify=permissions.get("modify", False),
-                        modify_annotations=permissions.get("annotate", True),
-                    )
-                )
-                pdf.save(output_path, encryption=encryption)
-            
-            return output_path
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _encrypt)
+        return await loop.run_in_executor(
+            executor,
+            encrypt_file,
+            input_path,
+            output_path,
+            user_password,
+            owner_password,
+            permissions,
+            method
+        )
     
     async def decrypt(
         self,
@@ -55,16 +60,33 @@ class SecurityEngine:
         output_path: str,
         password: str
     ) -> str:
-        def _decrypt():
-            import pikepdf
-            
-            with pikepdf.open(input_path, password=password) as pdf:
-                pdf.save(output_path)
-            
-            return output_path
-        
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(executor, _decrypt)
+        return await loop.run_in_executor(executor, decrypt_file, input_path, output_path, password)
+    
+    async def batch_encrypt(
+        self,
+        jobs: List[tuple],
+        user_password: str,
+        owner_password: Optional[str] = None,
+        permissions: Dict = None,
+        method: str = DEFAULT_ENCRYPTION_METHOD,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        options = {
+            "password": user_password,
+            "owner_password": owner_password,
+            "permissions": permissions,
+            "method": method,
+        }
+        return await run_security_batch("encrypt", jobs, options, progress_callback)
+    
+    async def batch_decrypt(
+        self,
+        jobs: List[tuple],
+        password: str,
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> Dict:
+        return await run_security_batch("decrypt", jobs, {"password": password}, progress_callback)
     
     async def sign(
         self,
@@ -73,66 +95,68 @@ class SecurityEngine:
         certificate_path: str,
         certificate_password: str,
         reason: Optional[str] = None,
-        location: Optional[str] = None
+        location: Optional[str] = None,
+        contact: Optional[str] = None,
+        page_number: int = 1,
+        position: Optional[Dict[str, float]] = None,
+        appearance: Optional[Dict] = None
     ) -> str:
         def _sign():
-            try:
-                from endesive import pdf
-                
-                with open(input_path, 'rb') as f:
-                    data = f.read()
-                
-                with open(certificate_path, 'rb') as f:
-                    cert_data = f.read()
-                
-                signature = pdf.cms.sign(
-                    data,
-                    {
-                        'sigflags': 3,
-                        'contact': 'PDF Master',
-                        'location': location or 'Unknown',
-                        'signingdate': 'D:20240101120000+08\'00\'',
-                        'reason': reason or 'Document signed by PDF Master',
-                    },
-                    cert_data,
-                    certificate_password.encode(),
-                    'sha256'
-                )
-                
-                with open(output_path, 'wb') as f:
-                    f.write(data)
-                    f.write(signature)
-                
-                return output_path
-            except ImportError:
-                logger.warning("endesive not installed")
-                raise RuntimeError("Digital signature requires endesive package")
+            signer = Signer.load(certificate_path, certificate_password)
+            return sign_pdf(
+                input_path, output_path, signer, reason, location, contact, page_number, position, appearance
+            )
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _sign)
     
+    async def sign_batch(
+        self,
+        jobs: List[tuple],
+        certificate_path: str,
+        certificate_password: str,
+        reason: Optional[str] = None,
+        location: Optional[str] = None,
+        contact: Optional[str] = None
+    ) -> Dict:
+        def _sign_batch():
+            start = time.perf_counter()
+            signer = Signer.load(certificate_path, certificate_password)
+            results = sign_documents(jobs, signer, reason, location, contact)
+            elapsed = time.perf_counter() - start
+            succeeded = [r["seconds"] for r in results if r["status"] == "success"]
+            return {
+                "results": results,
+                "stats": {
+                    "total": len(results),
+                    "succeeded": len(succeeded),
+                    "failed": len(results) - len(succeeded),
+                    "elapsed": elapsed,
+                    "files_per_second": len(results) / elapsed if elapsed else 0.0,
+                    "latency": latency_summary(succeeded),
+                },
+            }
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, _sign_batch)
+    
     async def verify_signature(self, file_path: str) -> Dict:
         def _verify():
-            try:
-                from endesive import pdf
-                
-                with open(file_path, 'rb') as f:
-                    data = f.read()
-                
-                result = pdf.verify(data)
-                
-                return {
-                    "valid": result.get('valid', False),
-                    "signer": result.get('signer', 'Unknown'),
-                    "signed_at": result.get('signingdate', None),
-                    "reason": result.get('reason', None),
-                    "location": result.get('location', None),
-                }
-            except ImportError:
-                return {
-                    "valid": False,
-                    "error": "Signature verification requires endesive package"
-                }
+            signatures = verify_pdf(file_path)
+            if not signatures:
+                return {"valid": False, "signatures": [], "error": "Document is not signed"}
+            latest = signatures[-1]
+            # Anything appended after the last signature is covered by no signature
+            modified = not latest["covers_document"]
+            return {
+                "valid": all(s["valid"] for s in signatures) and not modified,
+                "modified_after_signing": modified,
+                "signer": latest["signer"],
+                "signed_at": latest["signed_at"],
+                "reason": latest["reason"],
+                "location": latest["location"],
+                "signatures": signatures,
+            }
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _verify)
@@ -143,40 +167,70 @@ class SecurityEngine:
         password: Optional[str] = None
     ) -> Dict:
         def _get_permissions():
-            import pikepdf
-            
-            try:
-                with pikepdf.open(file_path, password=password or '') as pdf:
-                    if pdf.is_encrypted:
-                        return {
-                            "encrypted": True,
-                            "permissions": {
-                                "print": pdf.allow.print,
-                                "copy": pdf.allow.extract,
-                                "modify": pdf.allow.modify,
-                                "annotate": pdf.allow.modify_annotations,
-                            }
-                        }
-                    else:
-                        return {
-                            "encrypted": False,
-                            "permissions": {
-                                "print": True,
-                                "copy": True,
-                                "modify": True,
-                                "annotate": True,
-                            }
-                        }
-            except pikepdf.PasswordError:
+            info = inspect_permissions(file_path)
+            # Only a supplied password needs a real open; the header read covers the rest
+            if password and info["encrypted"] and not check_password(file_path, password):
                 return {
                     "encrypted": True,
                     "permissions": None,
                     "error": "Incorrect password"
                 }
+            return info
         
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(executor, _get_permissions)
     
+    async def get_permissions_batch(self, file_paths: List[str]) -> List[Dict]:
+        def _get_permissions_batch():
+            results = []
+            for file_path in file_paths:
+                try:
+                    results.append({"file_path": file_path, **inspect_permissions(file_path)})
+                except Exception as e:
+                    results.append({"file_path": file_path, "encrypted": None, "permissions": None, "error": str(e)})
+            return results
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, _get_permissions_batch)
+    
+    async def preview_redactions(self, input_path: str, redactions: List[Dict]) -> List[Dict]:
+        def _preview():
+            from app.core.pdf_engine.spatial import DocumentSpatialIndex
+            
+            index = DocumentSpatialIndex.for_file(input_path)
+            results = []
+            for redaction in redactions:
+                page_number = redaction.get("page", 1)
+                spans = index.text_in_rect(page_number, tuple(_redaction_rect(redaction)))
+                results.append({
+                    "page": page_number,
+                    "spans": [{"text": span["text"], "bbox": span["bbox"]} for span in spans],
+                })
+            return results
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, _preview)
+    
+    async def auto_redact(
+        self,
+        input_path: str,
+        output_path: str,
+        patterns: List[Dict],
+        color: str = "#000000"
+    ) -> Dict:
+        hex_color = color.lstrip('#')
+        fill = tuple(int(hex_color[i:i+2], 16) / 255 for i in (0, 2, 4))
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            executor,
+            auto_redact_document,
+            input_path,
+            output_path,
+            patterns,
+            fill
+        )
+    
     async def redact(
         self,
         input_path: str,
@@ -188,19 +242,19 @@ class SecurityEngine:
             
             doc = fitz.open(input_path)
             
+            by_page: Dict[int, List[Dict]] = {}
             for redaction in redactions:
-                page_num = redaction.get("page", 1) - 1
-                rect = fitz.Rect(
-                    redaction["x"],
-                    redaction["y"],
-                    redaction["x"] + redaction["width"],
-                    redaction["y"] + redaction["height"]
-                )
-                
-                if 0 <= page_num < doc.page_count:
-                    page = doc[page_num]
-                    page.add_redact_annot(rect, fill=(0, 0, 0))
-                    page.apply_redactions()
+                by_page.setdefault(redaction.get("page", 1) - 1, []).append(redaction)
+            
+            # apply_redactions rewrites the page content stream, so it runs
+            # once per page rather than once per rectangle
+            for page_num, page_redactions in sorted(by_page.items()):
+                if not 0 <= page_num < doc.page_count:
+                    continue
+                page = doc[page_num]
+                for redaction in page_redactions:
+                    page.add_redact_annot(_redaction_rect(redaction), fill=(0, 0, 0))
+                page.apply_redactions()
             
             doc.save(output_path)
             doc.close()
@@ -0,0 +1,94 @@
+import fitz
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import os
+import copy
+import threading
+
+MAX_CACHED_PERMISSIONS = 4096
+
+PERMISSION_FLAGS = {
+    "print": fitz.PDF_PERM_PRINT,
+    "modify": fitz.PDF_PERM_MODIFY,
+    "copy": fitz.PDF_PERM_COPY,
+    "annotate": fitz.PDF_PERM_ANNOTATE,
+}
+FULL_PERMISSIONS = {name: True for name in PERMISSION_FLAGS}
+CRYPT_FILTER_METHODS = {"/AESV2": "aes-128", "/AESV3": "aes-256"}
+
+_permissions: OrderedDict[Tuple[str, int, int], Dict[str, Any]] = OrderedDict()
+_permissions_lock = threading.Lock()
+
+
+def _encrypt_value(doc: fitz.Document, key: str) -> Optional[str]:
+    kind, value = doc.xref_get_key(-1, f"Encrypt/{key}")
+    return None if kind == "null" else value
+
+
+def _encryption_method(doc: fitz.Document) -> str:
+    if int(_encrypt_value(doc, "R") or 2) >= 5:
+        return "aes-256"
+    stream_filter = _encrypt_value(doc, "StmF")
+    if stream_filter and stream_filter != "/Identity":
+        cfm = _encrypt_value(doc, f"CF/{stream_filter.lstrip('/')}/CFM")
+        if cfm in CRYPT_FILTER_METHODS:
+            return CRYPT_FILTER_METHODS[cfm]
+    return "rc4"
+
+
+def read_encryption_info(file_path: str) -> Dict[str, Any]:
+    # The trailer's Encrypt dictionary is readable without the password, so
+    # the method and /P flags are known even when the file is locked
+    doc = fitz.open(file_path)
+    try:
+        if doc.xref_get_key(-1, "Encrypt")[0] == "null":
+            return {"encrypted": False, "method": None, "revision": None, "user_password": False, "permissions": dict(FULL_PERMISSIONS)}
+        
+        revision = _encrypt_value(doc, "R")
+        security_handler = _encrypt_value(doc, "Filter")
+        if security_handler != "/Standard":
+            return {
+                "encrypted": True,
+                "method": None,
+                "revision": int(revision) if revision else None,
+                "user_password": bool(doc.needs_pass),
+                "permissions": None,
+                "error": f"Unsupported security handler: {security_handler}",
+            }
+        
+        flags = int(_encrypt_value(doc, "P") or 0) if doc.needs_pass else doc.permissions
+        return {
+            "encrypted": True,
+            "method": _encryption_method(doc),
+            "revision": int(revision) if revision else None,
+            "user_password": bool(doc.needs_pass),
+            "permissions": {name: bool(flags & flag) for name, flag in PERMISSION_FLAGS.items()},
+        }
+    finally:
+        doc.close()
+
+
+def inspect_permissions(file_path: str) -> Dict[str, Any]:
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _permissions_lock:
+        info = _permissions.get(key)
+        if info is not None:
+            _permissions.move_to_end(key)
+            # Callers get their own copy, nested permissions included, so the cache stays intact
+            return copy.deepcopy(info)
+    
+    info = read_encryption_info(file_path)
+    with _permissions_lock:
+        _permissions[key] = info
+        while len(_permissions) > MAX_CACHED_PERMISSIONS:
+            _permissions.popitem(last=False)
+    return copy.deepcopy(info)
+
+
+def check_password(file_path: str, password: str) -> bool:
+    doc = fitz.open(file_path)
+    try:
+        return bool(doc.authenticate(password))
+    finally:
+        doc.close()
@@ -0,0 +1,156 @@
+import fitz
+from typing import List, Dict, Any, Optional, Set, Tuple
+from functools import lru_cache
+from collections import Counter
+import re
+
+from app.core.executor import get_process_executor
+
+PARALLEL_REDACT_MIN_PAGES = 16
+REDACT_CHUNK_PAGES = 8
+
+REDACTION_PATTERNS = {
+    "id_card": r"(?<!\d)[1-9]\d{5}(?:18|19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\d{3}[\dXx](?!\d)",
+    "phone": r"(?<!\d)(?:\+?86[- ]?)?1[3-9]\d[- ]?\d{4}[- ]?\d{4}(?!\d)|(?<!\d)0\d{2,3}-\d{7,8}(?!\d)",
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    "bank_card": r"(?<!\d)(?:\d{4}[ -]?){3}\d{4}(?:\d{3})?(?!\d)",
+    "ip_address": r"(?<![\d.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?![\d.])",
+}
+
+# (type, regex source, case sensitive, page numbers or None for all)
+PatternSpec = Tuple[str, str, bool, Optional[Set[int]]]
+
+
+def parse_page_set(pages: str) -> Optional[Set[int]]:
+    if not pages or pages.strip().lower() == "all":
+        return None
+    selected = set()
+    for part in pages.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-")
+            selected.update(range(int(start), int(end) + 1))
+        elif part:
+            selected.add(int(part))
+    return selected
+
+
+def compile_pattern_specs(patterns: List[Dict[str, Any]]) -> List[PatternSpec]:
+    specs = []
+    for pattern in patterns:
+        kind = pattern.get("type", "custom")
+        source = pattern.get("pattern") or REDACTION_PATTERNS.get(kind)
+        if not source:
+            raise ValueError(f"Unknown redaction pattern type: {kind}")
+        case_sensitive = pattern.get("case_sensitive", False)
+        # Fail on bad expressions here rather than inside a worker process
+        _compiled(source, case_sensitive)
+        specs.append((kind, source, case_sensitive, parse_page_set(pattern.get("pages", "all"))))
+    return specs
+
+
+@lru_cache(maxsize=128)
+def _compiled(source: str, case_sensitive: bool) -> "re.Pattern":
+    return re.compile(source, 0 if case_sensitive else re.IGNORECASE)
+
+
+def _page_lines(page: fitz.Page) -> List[Tuple[str, List[Tuple[float, float, float, float]]]]:
+    lines = []
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", []):
+            chars = [char for span in line["spans"] for char in span["chars"]]
+            if chars:
+                lines.append(("".join(char["c"] for char in chars), [char["bbox"] for char in chars]))
+    return lines
+
+
+def _scan_redaction_chunk(
+    file_path: str,
+    page_numbers: List[int],
+    specs: List[PatternSpec]
+) -> List[Tuple[int, str, int, Tuple[float, float, float, float]]]:
+    matches = []
+    doc = fitz.open(file_path)
+    try:
+        for page_number in page_numbers:
+            active = [
+                (kind, _compiled(source, case_sensitive))
+                for kind, source, case_sensitive, pages in specs
+                if pages is None or page_number in pages
+            ]
+            if not active:
+                continue
+            for text, boxes in _page_lines(doc[page_number - 1]):
+                for kind, regex in active:
+                    for match in regex.finditer(text):
+                        if match.start() == match.end():
+                            continue
+                        hit = boxes[match.start():match.end()]
+                        rect = (
+                            min(box[0] for box in hit),
+                            min(box[1] for box in hit),
+                            max(box[2] for box in hit),
+                            max(box[3] for box in hit),
+                        )
+                        matches.append((page_number, kind, match.end() - match.start(), rect))
+    finally:
+        doc.close()
+    return matches
+
+
+def find_redactions(file_path: str, specs: List[PatternSpec]) -> List[Tuple[int, str, int, Tuple[float, ...]]]:
+    doc = fitz.open(file_path)
+    page_count = doc.page_count
+    doc.close()
+    
+    wanted = set()
+    for _, _, _, pages in specs:
+        wanted |= set(range(1, page_count + 1)) if pages is None else {p for p in pages if 1 <= p <= page_count}
+    page_numbers = sorted(wanted)
+    
+    if len(page_numbers) < PARALLEL_REDACT_MIN_PAGES:
+        return _scan_redaction_chunk(file_path, page_numbers, specs)
+    
+    chunks = [page_numbers[i:i + REDACT_CHUNK_PAGES] for i in range(0, len(page_numbers), REDACT_CHUNK_PAGES)]
+    matches = []
+    for part in get_process_executor().map(_scan_redaction_chunk, [file_path] * len(chunks), chunks, [specs] * len(chunks)):
+        matches.extend(part)
+    return matches
+
+
+def auto_redact_document(
+    input_path: str,
+    output_path: str,
+    patterns: List[Dict[str, Any]],
+    fill: Tuple[float, float, float] = (0, 0, 0)
+) -> Dict[str, Any]:
+    specs = compile_pattern_specs(patterns)
+    matches = find_redactions(input_path, specs)
+    
+    by_page: Dict[int, List[Tuple[float, ...]]] = {}
+    for page_number, _, _, rect in matches:
+        by_page.setdefault(page_number, []).append(rect)
+    
+    doc = fitz.open(input_path)
+    try:
+        for page_number, rects in sorted(by_page.items()):
+            page = doc[page_number - 1]
+            for rect in rects:
+                # The annots are applied straight away, so skip building the cross-out appearance
+                page.add_redact_annot(fitz.Rect(rect), fill=fill, cross_out=False)
+            page.apply_redactions()
+        doc.save(output_path, garbage=3, deflate=True)
+    finally:
+        doc.close()
+    
+    return {
+        "output_path": output_path,
+        "total": len(matches),
+        "by_type": dict(Counter(kind for _, kind, _, _ in matches)),
+        "pages": {page_number: len(rects) for page_number, rects in sorted(by_page.items())},
+        # Matched text is deliberately left out of the report
+        "redactions": [
+            {"page": page_number, "type": kind, "length": length, "bbox": [round(v, 2) for v in rect]}
+            for page_number, kind, length, rect in matches
+        ],
+    }
@@ -0,0 +1,546 @@
+import fitz
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+from collections import OrderedDict
+from datetime import datetime, timezone
+import os
+import re
+import shutil
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding, rsa
+from cryptography.hazmat.primitives.serialization import Encoding, pkcs12
+
+sign_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 2)
+
+SIGNATURE_SIZE = 16384
+DIGEST_CHUNK_SIZE = 1024 * 1024
+MAX_CACHED_SIGNERS = 8
+APPEARANCE_PADDING = 3.0
+APPEARANCE_MAX_FONT_SIZE = 10.0
+DEFAULT_APPEARANCE = {
+    "show_name": True,
+    "show_date": True,
+    "show_reason": True,
+    "show_location": True,
+    "show_logo": False,
+    "logo_path": None,
+    "background_color": None,
+    "border_color": None,
+}
+
+OID_DATA = "1.2.840.113549.1.7.1"
+OID_SIGNED_DATA = "1.2.840.113549.1.7.2"
+OID_CONTENT_TYPE = "1.2.840.113549.1.9.3"
+OID_MESSAGE_DIGEST = "1.2.840.113549.1.9.4"
+OID_SIGNING_TIME = "1.2.840.113549.1.9.5"
+OID_SHA256 = "2.16.840.1.101.3.4.2.1"
+OID_RSA = "1.2.840.113549.1.1.1"
+OID_ECDSA_SHA256 = "1.2.840.10045.4.3.2"
+
+_BYTE_RANGE_PLACEHOLDER = "[0 1111111111 2222222222 3333333333]"
+_BYTE_RANGE = re.compile(rb"/ByteRange\s*\[\s*0\s+1111111111\s+2222222222\s+3333333333\s*\]")
+_CONTENTS = re.compile(rb"/Contents\s*<(0{%d})>" % (SIGNATURE_SIZE * 2))
+
+_signers: "OrderedDict[Tuple[str, int, int, str], Signer]" = OrderedDict()
+_signers_lock = threading.Lock()
+
+
+# Minimal DER encoding/decoding for the CMS SignedData structure
+
+def _der(tag: int, content: bytes) -> bytes:
+    length = len(content)
+    if length < 0x80:
+        return bytes([tag, length]) + content
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([tag, 0x80 | len(encoded)]) + encoded + content
+
+
+def _seq(*items: bytes) -> bytes:
+    return _der(0x30, b"".join(items))
+
+
+def _set(*items: bytes) -> bytes:
+    return _der(0x31, b"".join(sorted(items)))
+
+
+def _int(value: int) -> bytes:
+    return _der(0x02, value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True))
+
+
+def _oid(dotted: str) -> bytes:
+    parts = [int(p) for p in dotted.split(".")]
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return _der(0x06, bytes(body))
+
+
+def _algorithm(dotted: str, null_params: bool = True) -> bytes:
+    return _seq(_oid(dotted), b"\x05\x00") if null_params else _seq(_oid(dotted))
+
+
+def _read(data: bytes, pos: int) -> Tuple[int, int, int]:
+    tag = data[pos]
+    length = data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7F
+        length = int.from_bytes(data[pos:pos + count], "big")
+        pos += count
+    return tag, pos, pos + length
+
+
+def _children(data: bytes, start: int, end: int) -> Iterator[Tuple[int, int, int, int]]:
+    pos = start
+    while pos < end:
+        tag, content_start, content_end = _read(data, pos)
+        yield tag, pos, content_start, content_end
+        pos = content_end
+
+
+def _decode_oid(body: bytes) -> str:
+    parts = [body[0] // 40, body[0] % 40]
+    value = 0
+    for byte in body[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(p) for p in parts)
+
+
+class Signer:
+    def __init__(self, key, certificate: x509.Certificate, chain: List[x509.Certificate]):
+        if not isinstance(key, (rsa.RSAPrivateKey, ec.EllipticCurvePrivateKey)):
+            raise ValueError("Only RSA and EC signing keys are supported")
+        self.key = key
+        self.certificate = certificate
+        self.chain = chain
+        self.name = _common_name(certificate)
+    
+    @classmethod
+    def load(cls, certificate_path: str, password: str) -> "Signer":
+        stat = os.stat(certificate_path)
+        key = (
+            os.path.abspath(certificate_path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            hashlib.sha256(password.encode("utf-8")).hexdigest(),
+        )
+        with _signers_lock:
+            signer = _signers.get(key)
+            if signer is not None:
+                _signers.move_to_end(key)
+                return signer
+        
+        with open(certificate_path, "rb") as f:
+            private_key, certificate, chain = pkcs12.load_key_and_certificates(f.read(), password.encode("utf-8"))
+        if private_key is None or certificate is None:
+            raise ValueError("Certificate file has no private key or certificate")
+        signer = cls(private_key, certificate, list(chain or []))
+        
+        with _signers_lock:
+            _signers[key] = signer
+            while len(_signers) > MAX_CACHED_SIGNERS:
+                _signers.popitem(last=False)
+        return signer
+    
+    def _sign_bytes(self, data: bytes) -> Tuple[bytes, bytes]:
+        if isinstance(self.key, rsa.RSAPrivateKey):
+            return _algorithm(OID_RSA), self.key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        return _algorithm(OID_ECDSA_SHA256, null_params=False), self.key.sign(data, ec.ECDSA(hashes.SHA256()))
+    
+    def cms_signature(self, digest: bytes, signing_time: datetime) -> bytes:
+        signed_attrs = [
+            _seq(_oid(OID_CONTENT_TYPE), _set(_oid(OID_DATA))),
+            _seq(_oid(OID_SIGNING_TIME), _set(_der(0x17, signing_time.astimezone(timezone.utc).strftime("%y%m%d%H%M%SZ").encode()))),
+            _seq(_oid(OID_MESSAGE_DIGEST), _set(_der(0x04, digest))),
+        ]
+        # The signature covers the attributes encoded as a SET; they are
+        # embedded with the [0] IMPLICIT tag instead
+        attrs_set = _set(*signed_attrs)
+        signature_algorithm, signature = self._sign_bytes(attrs_set)
+        
+        signer_info = _seq(
+            _int(1),
+            _seq(self.certificate.issuer.public_bytes(), _int(self.certificate.serial_number)),
+            _algorithm(OID_SHA256),
+            b"\xa0" + attrs_set[1:],
+            signature_algorithm,
+            _der(0x04, signature),
+        )
+        certificates = b"".join(c.public_bytes(Encoding.DER) for c in [self.certificate] + self.chain)
+        signed_data = _seq(
+            _int(1),
+            _set(_algorithm(OID_SHA256)),
+            _seq(_oid(OID_DATA)),
+            _der(0xA0, certificates),
+            _set(signer_info),
+        )
+        return _seq(_oid(OID_SIGNED_DATA), _der(0xA0, signed_data))
+
+
+def _common_name(certificate: x509.Certificate) -> str:
+    names = certificate.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME)
+    return names[0].value if names else certificate.subject.rfc4514_string()
+
+
+def _pdf_text(value: str) -> str:
+    return "<FEFF" + value.encode("utf-16-be").hex().upper() + ">"
+
+
+def _pdf_date(value: datetime) -> str:
+    offset = value.strftime("%z") or "+0000"
+    return value.strftime("D:%Y%m%d%H%M%S") + f"{offset[:3]}'{offset[3:]}'"
+
+
+def _append_to_array(doc: fitz.Document, xref: int, key: str, item: str):
+    kind, value = doc.xref_get_key(xref, key)
+    if kind == "array":
+        doc.xref_set_key(xref, key, value[:-1].rstrip() + f" {item}]")
+    elif kind == "xref":
+        target = int(value.split()[0])
+        doc.update_object(target, doc.xref_object(target, compressed=True)[:-1].rstrip() + f" {item}]")
+    else:
+        doc.xref_set_key(xref, key, f"[{item}]")
+
+
+def _hex_to_rgb(hex_color: str) -> Tuple[float, float, float]:
+    hex_color = hex_color.lstrip("#")
+    return tuple(int(hex_color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _build_appearance(
+    width: float,
+    height: float,
+    lines: List[str],
+    appearance: Dict[str, Any]
+) -> fitz.Document:
+    stamp = fitz.open()
+    page = stamp.new_page(width=width, height=height)
+    if appearance["background_color"] or appearance["border_color"]:
+        page.draw_rect(
+            page.rect,
+            color=_hex_to_rgb(appearance["border_color"]) if appearance["border_color"] else None,
+            fill=_hex_to_rgb(appearance["background_color"]) if appearance["background_color"] else None,
+            width=1
+        )
+    
+    text_rect = page.rect + (APPEARANCE_PADDING, APPEARANCE_PADDING, -APPEARANCE_PADDING, -APPEARANCE_PADDING)
+    if appearance["show_logo"] and appearance["logo_path"]:
+        logo_rect = fitz.Rect(text_rect.x0, text_rect.y0, text_rect.x0 + min(text_rect.height, text_rect.width / 3), text_rect.y1)
+        page.insert_image(logo_rect, filename=appearance["logo_path"], keep_proportion=True)
+        text_rect.x0 = logo_rect.x1 + APPEARANCE_PADDING
+    
+    if lines and not text_rect.is_empty:
+        font = fitz.Font("helv" if all(ord(c) < 256 for line in lines for c in line) else "cjk")
+        widest = max(font.text_length(line, 1) for line in lines) or 1
+        # Shrink the text until every line fits the box, never above the cap
+        font_size = min(APPEARANCE_MAX_FONT_SIZE, text_rect.height / (len(lines) * 1.2), text_rect.width / widest)
+        writer = fitz.TextWriter(page.rect)
+        for i, line in enumerate(lines):
+            writer.append((text_rect.x0, text_rect.y0 + font_size * (1.2 * i + 1)), line, font=font, fontsize=font_size)
+        writer.write_text(page)
+        stamp.subset_fonts()
+    return stamp
+
+
+def _appearance_form(doc: fitz.Document, stamp: fitz.Document) -> int:
+    # show_pdf_page wraps the stamp into a form XObject of the target document;
+    # the scratch page it is drawn on is removed again before saving
+    scratch = doc.new_page(width=stamp[0].rect.width, height=stamp[0].rect.height)
+    xref = scratch.show_pdf_page(scratch.rect, stamp, 0)
+    doc.delete_page(scratch.number)
+    return xref
+
+
+def _add_signature_field(
+    file_path: str,
+    page_number: int,
+    signing_time: datetime,
+    signer_name: str,
+    reason: Optional[str],
+    location: Optional[str],
+    contact: Optional[str],
+    position: Optional[Dict[str, float]] = None,
+    appearance: Optional[Dict[str, Any]] = None
+):
+    doc = fitz.open(file_path)
+    try:
+        if doc.needs_pass:
+            raise ValueError("Encrypted documents must be decrypted before signing")
+        page = doc[page_number - 1]
+        catalog = doc.pdf_catalog()
+        
+        # Invisible unless a position is given; the position is in page
+        # coordinates with the origin at the top left, like the viewer's
+        widget_entries = "/Rect [0 0 0 0] /F 132"
+        if position is not None:
+            rect = fitz.Rect(position["x"], position["y"], position["x"] + position["width"], position["y"] + position["height"])
+            if rect.is_empty:
+                raise ValueError("Signature position must have a positive width and height")
+            style = {**DEFAULT_APPEARANCE, **(appearance or {})}
+            lines = [
+                line for show, line in (
+                    ("show_name", signer_name),
+                    ("show_date", signing_time.strftime("%Y-%m-%d %H:%M:%S %z")),
+                    ("show_reason", reason),
+                    ("show_location", location),
+                ) if style[show] and line
+            ]
+            stamp = _build_appearance(rect.width, rect.height, lines, style)
+            try:
+                form_xref = _appearance_form(doc, stamp)
+            finally:
+                stamp.close()
+            page = doc[page_number - 1]
+            x0, y0, x1, y1 = rect * page.transformation_matrix
+            widget_entries = (
+                f"/Rect [{min(x0, x1):.2f} {min(y0, y1):.2f} {max(x0, x1):.2f} {max(y0, y1):.2f}] "
+                f"/F 132 /AP << /N {form_xref} 0 R >>"
+            )
+        elif appearance is not None:
+            raise ValueError("A signature appearance needs a position")
+        
+        entries = [
+            "/Type /Sig",
+            "/Filter /Adobe.PPKLite",
+            "/SubFilter /adbe.pkcs7.detached",
+            f"/ByteRange {_BYTE_RANGE_PLACEHOLDER}",
+            f"/Contents <{'0' * SIGNATURE_SIZE * 2}>",
+            f"/M ({_pdf_date(signing_time)})",
+            f"/Name {_pdf_text(signer_name)}",
+        ]
+        for key, value in (("Reason", reason), ("Location", location), ("ContactInfo", contact)):
+            if value:
+                entries.append(f"/{key} {_pdf_text(value)}")
+        sig_xref = doc.get_new_xref()
+        doc.update_object(sig_xref, "<< " + " ".join(entries) + " >>")
+        
+        existing = doc.xref_get_key(catalog, "AcroForm/Fields")
+        field_count = existing[1].count(" R") if existing[0] == "array" else 0
+        widget_xref = doc.get_new_xref()
+        doc.update_object(
+            widget_xref,
+            f"<< /Type /Annot /Subtype /Widget /FT /Sig {widget_entries} "
+            f"/T {_pdf_text(f'Signature{field_count + 1}')} /V {sig_xref} 0 R /P {page.xref} 0 R >>"
+        )
+        _append_to_array(doc, page.xref, "Annots", f"{widget_xref} 0 R")
+        
+        if doc.xref_get_key(catalog, "AcroForm")[0] == "null":
+            doc.xref_set_key(catalog, "AcroForm", f"<< /Fields [{widget_xref} 0 R] /SigFlags 3 >>")
+        else:
+            _append_to_array(doc, catalog, "AcroForm/Fields", f"{widget_xref} 0 R")
+            doc.xref_set_key(catalog, "AcroForm/SigFlags", "3")
+        
+        doc.saveIncr()
+    finally:
+        doc.close()
+
+
+def _stream_digest(file_path: str, byte_range: List[int]) -> bytes:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for start, length in zip(byte_range[0::2], byte_range[1::2]):
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(DIGEST_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                length -= len(chunk)
+    return digest.digest()
+
+
+def sign_pdf(
+    input_path: str,
+    output_path: str,
+    signer: Signer,
+    reason: Optional[str] = None,
+    location: Optional[str] = None,
+    contact: Optional[str] = None,
+    page_number: int = 1,
+    position: Optional[Dict[str, float]] = None,
+    appearance: Optional[Dict[str, Any]] = None
+) -> str:
+    signing_time = datetime.now(timezone.utc).astimezone()
+    original_size = os.path.getsize(input_path)
+    shutil.copyfile(input_path, output_path)
+    _add_signature_field(
+        output_path, page_number, signing_time, signer.name, reason, location, contact, position, appearance
+    )
+    
+    with open(output_path, "r+b") as f:
+        # Only the appended incremental update holds the placeholders
+        f.seek(original_size)
+        tail = f.read()
+        contents = None
+        for contents in _CONTENTS.finditer(tail):
+            pass
+        byte_range_match = None
+        for byte_range_match in _BYTE_RANGE.finditer(tail):
+            pass
+        if contents is None or byte_range_match is None:
+            raise RuntimeError("Signature placeholder not found in the incremental update")
+        
+        file_size = original_size + len(tail)
+        gap_start = original_size + contents.start(1) - 1
+        gap_end = original_size + contents.end(1) + 1
+        byte_range = [0, gap_start, gap_end, file_size - gap_end]
+        patched = "[0 {:010d} {:010d} {:010d}]".format(*byte_range[1:]).encode()
+        placeholder = byte_range_match.group(0)
+        f.seek(original_size + byte_range_match.start() + placeholder.index(b"["))
+        f.write(patched)
+        f.flush()
+        
+        digest = _stream_digest(output_path, byte_range)
+        cms = signer.cms_signature(digest, signing_time).hex().encode()
+        if len(cms) > SIGNATURE_SIZE * 2:
+            raise RuntimeError("Signature does not fit into the reserved space")
+        f.seek(gap_start + 1)
+        f.write(cms)
+    return output_path
+
+
+def _parse_cms(cms: bytes) -> Dict[str, Any]:
+    _, start, end = _read(cms, 0)
+    content_info = list(_children(cms, start, end))
+    _, _, explicit_start, explicit_end = content_info[1]
+    _, signed_start, signed_end = _read(cms, explicit_start)
+    fields = list(_children(cms, signed_start, signed_end))
+    
+    certificates = []
+    signer_info = None
+    for tag, header, content_start, content_end in fields:
+        if tag == 0xA0:
+            certificates = [
+                x509.load_der_x509_certificate(cms[cert_header:cert_end])
+                for _, cert_header, _, cert_end in _children(cms, content_start, content_end)
+            ]
+        elif tag == 0x31:
+            _, info_start, info_end = _read(cms, content_start)
+            signer_info = list(_children(cms, info_start, info_end))
+    if signer_info is None or not certificates:
+        raise ValueError("Malformed signature container")
+    
+    _, _, sid_start, sid_end = signer_info[1]
+    _, _, serial_start, serial_end = list(_children(cms, sid_start, sid_end))[1]
+    serial = int.from_bytes(cms[serial_start:serial_end], "big", signed=True)
+    certificate = next((c for c in certificates if c.serial_number == serial), certificates[0])
+    
+    attrs = next(child for child in signer_info if child[0] == 0xA0)
+    attrs_set = b"\x31" + cms[attrs[1] + 1:attrs[3]]
+    values = {}
+    for _, _, attr_start, attr_end in _children(cms, attrs[2], attrs[3]):
+        (_, _, oid_start, oid_end), (_, _, set_start, set_end) = list(_children(cms, attr_start, attr_end))
+        _, value_start, value_end = _read(cms, set_start)
+        values[_decode_oid(cms[oid_start:oid_end])] = cms[value_start:value_end]
+    signature = cms[signer_info[-1][2]:signer_info[-1][3]]
+    
+    return {
+        "certificate": certificate,
+        "signed_attrs": attrs_set,
+        "message_digest": values.get(OID_MESSAGE_DIGEST),
+        "signing_time": values.get(OID_SIGNING_TIME),
+        "signature": signature,
+    }
+
+
+def _check_signature(certificate: x509.Certificate, signature: bytes, data: bytes) -> bool:
+    public_key = certificate.public_key()
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+        else:
+            return False
+    except InvalidSignature:
+        return False
+    return True
+
+
+def _signature_dicts(file_path: str) -> List[Dict[str, Any]]:
+    doc = fitz.open(file_path)
+    try:
+        signatures = []
+        for xref in range(1, doc.xref_length()):
+            if doc.xref_get_key(xref, "Type") != ("name", "/Sig"):
+                continue
+            kind, value = doc.xref_get_key(xref, "ByteRange")
+            if kind != "array":
+                continue
+            entry = {"byte_range": [int(v) for v in value.strip("[]").split()]}
+            for key in ("Name", "Reason", "Location", "M"):
+                kind, text = doc.xref_get_key(xref, key)
+                entry[key.lower()] = text if kind == "string" else None
+            signatures.append(entry)
+        return signatures
+    finally:
+        doc.close()
+
+
+def verify_pdf(file_path: str) -> List[Dict[str, Any]]:
+    file_size = os.path.getsize(file_path)
+    results = []
+    for entry in _signature_dicts(file_path):
+        byte_range = entry["byte_range"]
+        result = {
+            "signer": entry["name"],
+            "signed_at": entry["m"],
+            "reason": entry["reason"],
+            "location": entry["location"],
+            "covers_document": byte_range[2] + byte_range[3] == file_size,
+            "valid": False,
+        }
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(byte_range[1] + 1)
+                cms = bytes.fromhex(f.read(byte_range[2] - byte_range[1] - 2).decode("ascii"))
+            parsed = _parse_cms(cms)
+            certificate = parsed["certificate"]
+            digest_ok = parsed["message_digest"] == _stream_digest(file_path, byte_range)
+            result["signer"] = _common_name(certificate)
+            result["certificate"] = {
+                "subject": certificate.subject.rfc4514_string(),
+                "issuer": certificate.issuer.rfc4514_string(),
+                "serial_number": format(certificate.serial_number, "x"),
+            }
+            result["digest_valid"] = digest_ok
+            result["valid"] = digest_ok and _check_signature(certificate, parsed["signature"], parsed["signed_attrs"])
+        except (ValueError, IndexError, StopIteration) as e:
+            result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+def sign_documents(
+    jobs: List[Tuple[str, str]],
+    signer: Signer,
+    reason: Optional[str] = None,
+    location: Optional[str] = None,
+    contact: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    def _sign_one(job: Tuple[str, str]) -> Dict[str, Any]:
+        input_path, output_path = job
+        start = time.perf_counter()
+        try:
+            sign_pdf(input_path, output_path, signer, reason, location, contact)
+            result = {"input": input_path, "output": output_path, "status": "success"}
+        except Exception as e:
+            result = {"input": input_path, "output": None, "status": "failed", "error": str(e)}
+        result["seconds"] = time.perf_counter() - start
+        return result
+    
+    # Hashing and file IO release the GIL, so threads share the one loaded key
+    return list(sign_executor.map(_sign_one, jobs))
@@ -4,6 +4,7 @@ from app.config.settings import settings
 from app.api.router import api_router
 from app.api.middleware.logging import LoggingMiddleware
 from app.api.middleware.error_handler import ErrorHandlerMiddleware
+from app.core.executor import shutdown_process_executor
 from loguru import logger
 import sys
 
@@ -46,6 +47,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("PDF Master Server shutting down...")
+    shutdown_process_executor()
 
 
 if __name__ == "__main__":
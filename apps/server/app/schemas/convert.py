@@ -45,6 +45,8 @@ class PdfToImageOptions(BaseModel):
     dpi: int = 150
     pages: Optional[List[int]] = None
     background_color: str = "#FFFFFF"
+    quality: int = 85
+    colorspace: str = "rgb"
 
 
 class ImageToPdfOptions(BaseModel):
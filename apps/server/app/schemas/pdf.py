@@ -46,6 +46,8 @@ class WatermarkRequest(BaseModel):
     opacity: float = 0.3
     rotation: int = -45
     position: str = "center"
+    pages: str = "all"
+    layer: str = "over"
 
 
 class CompressRequest(BaseModel):
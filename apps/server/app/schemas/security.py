@@ -85,6 +85,8 @@ class SignatureDetail(BaseModel):
 
 class SignatureInfo(BaseModel):
     has_signature: bool
+    is_valid: bool = False
+    modified_after_signing: bool = False
     signatures: List[SignatureDetail]
 
 
@@ -104,15 +104,18 @@ class ConvertService:
         output_dir: str,
         image_format: str = "png",
         dpi: int = 150,
-        pages: Optional[List[int]] = None
+        pages: Optional[List[int]] = None,
+        quality: int = 85,
+        colorspace: str = "rgb"
     ) -> List[str]:
-        return await asyncio.to_thread(
-            self.engine.pdf_to_image,
+        return await self.engine.pdf_to_image(
             input_path,
             output_dir,
             image_format,
             dpi,
-            pages
+            pages,
+            quality,
+            colorspace
         )
 
     async def image_to_pdf(
@@ -120,40 +123,73 @@ class ConvertService:
         input_paths: List[str],
         output_path: str,
         page_size: str = "a4",
-        margin: int = 0
+        margin: int = 0,
+        orientation: str = "portrait",
+        align: str = "center"
     ) -> str:
-        return await asyncio.to_thread(
-            self.engine.image_to_pdf,
+        return await self.engine.images_to_pdf(
             input_paths,
             output_path,
-            page_size,
-            margin
+            page_size=page_size,
+            orientation=orientation,
+            margin=margin,
+            align=align
         )
 
     async def pdf_to_word(
         self,
         input_path: str,
         output_path: str,
-        preserve_formatting: bool = True
+        preserve_formatting: bool = True,
+        progress_callback: Optional[Callable] = None
     ) -> str:
-        return await asyncio.to_thread(
-            self.engine.pdf_to_word,
-            input_path,
-            output_path,
-            preserve_formatting
+        task_id = f"pdf-to-word-{int(time.time() * 1000)}"
+        self._tasks[task_id] = ConvertProgress(
+            task_id=task_id,
+            status="processing",
+            progress=0,
+            current_page=0,
+            total_pages=0
         )
 
+        if progress_callback:
+            self._progress_callbacks[task_id] = [progress_callback]
+
+        def _on_chunk(completed_pages: int, total_pages: int):
+            self._update_progress(
+                task_id,
+                "processing",
+                completed_pages / total_pages * 90 if total_pages else 90,
+                current_page=completed_pages,
+                total_pages=total_pages
+            )
+
+        try:
+            result = await self.engine.pdf_to_word(
+                input_path,
+                output_path,
+                progress_callback=_on_chunk
+            )
+            self._update_progress(task_id, "completed", 100)
+            return result
+        except Exception as e:
+            self._update_progress(task_id, "failed", 0, str(e))
+            raise
+        finally:
+            self._cleanup_task(task_id)
+
     async def pdf_to_excel(
         self,
         input_path: str,
         output_path: str,
-        detect_tables: bool = True
+        csv_dir: Optional[str] = None,
+        parquet_dir: Optional[str] = None
     ) -> str:
-        return await asyncio.to_thread(
-            self.engine.pdf_to_excel,
+        return await self.engine.pdf_to_excel(
             input_path,
             output_path,
-            detect_tables
+            csv_dir,
+            parquet_dir
         )
 
     async def word_to_pdf(self, input_path: str, output_path: str) -> str:
@@ -199,13 +235,19 @@ class ConvertService:
         task_id: str,
         status: str,
         progress: float,
-        message: Optional[str] = None
+        message: Optional[str] = None,
+        current_page: Optional[int] = None,
+        total_pages: Optional[int] = None
     ):
         if task_id in self._tasks:
             self._tasks[task_id].status = status
             self._tasks[task_id].progress = progress
             if message:
                 self._tasks[task_id].message = message
+            if current_page is not None:
+                self._tasks[task_id].current_page = current_page
+            if total_pages is not None:
+                self._tasks[task_id].total_pages = total_pages
             
             for callback in self._progress_callbacks.get(task_id, []):
                 try:
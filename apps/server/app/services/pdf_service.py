@@ -59,7 +59,9 @@ class PdfService:
         font_color: str = "#CCCCCC",
         opacity: float = 0.3,
         rotation: int = -45,
-        position: str = "center"
+        position: str = "center",
+        pages: str = "all",
+        layer: str = "over"
     ) -> str:
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"File not found: {input_path}")
@@ -74,7 +76,9 @@ class PdfService:
             font_color,
             opacity,
             rotation,
-            position
+            position,
+            pages,
+            layer
         )
     
     async def compress_pdf(
@@ -3,10 +3,11 @@ import time
 import asyncio
 from typing import List, Optional, Dict, Any
 
+from ..core.pdf_engine.engine import PdfEngine
 from ..core.security_engine.engine import SecurityEngine
 from ..schemas.security import (
     EncryptOptions, DecryptOptions, DecryptResult, PermissionInfo,
-    SignatureOptions, SignatureInfo, WatermarkOptions,
+    SignatureOptions, SignatureInfo, SignatureDetail, WatermarkOptions,
     RedactionOptions, AutoRedactOptions
 )
 
@@ -14,17 +15,24 @@ from ..schemas.security import (
 class SecurityService:
     def __init__(self):
         self.engine = SecurityEngine()
+        self.pdf_engine = PdfEngine()
 
     async def encrypt(self, options: EncryptOptions) -> Dict[str, Any]:
-        return await asyncio.to_thread(
-            self.engine.encrypt,
+        allowed = {p.value for p in options.permissions}
+        output_path = await self.engine.encrypt(
             options.input_path,
             options.output_path,
+            options.user_password or "",
             options.owner_password,
-            user_password=options.user_password,
-            permissions=[p.value for p in options.permissions],
-            algorithm=options.algorithm.value
+            permissions={
+                "print": "print" in allowed or "print-hq" in allowed,
+                "copy": "copy" in allowed or "extract" in allowed,
+                "modify": "modify" in allowed or "assemble" in allowed,
+                "annotate": "annotate" in allowed or "fill-forms" in allowed,
+            },
+            method=options.algorithm.value
         )
+        return {"success": True, "output_path": output_path}
 
     async def decrypt(self, options: DecryptOptions) -> DecryptResult:
         result = await asyncio.to_thread(
@@ -40,15 +48,17 @@ class SecurityService:
         )
 
     async def get_permissions(self, file_path: str) -> PermissionInfo:
-        result = await asyncio.to_thread(
-            self.engine.get_permissions,
-            file_path
+        result = await self.engine.get_permissions(file_path)
+        return PermissionInfo(
+            is_encrypted=result["encrypted"],
+            permissions=result["permissions"] or {},
+            algorithm=result.get("method"),
+            owner_password_set=result["encrypted"],
+            user_password_set=result.get("user_password", False)
         )
-        return PermissionInfo(**result)
 
     async def sign(self, options: SignatureOptions) -> Dict[str, Any]:
-        return await asyncio.to_thread(
-            self.engine.sign,
+        output_path = await self.engine.sign(
             options.input_path,
             options.output_path,
             options.certificate_path,
@@ -60,31 +70,43 @@ class SecurityService:
             position=options.position,
             appearance=options.appearance.dict() if options.appearance else None
         )
+        return {"success": True, "output_path": output_path}
 
     async def verify_signature(self, file_path: str) -> SignatureInfo:
-        result = await asyncio.to_thread(
-            self.engine.verify_signature,
-            file_path
+        result = await self.engine.verify_signature(file_path)
+        return SignatureInfo(
+            has_signature=bool(result["signatures"]),
+            is_valid=result["valid"],
+            modified_after_signing=result.get("modified_after_signing", False),
+            signatures=[
+                SignatureDetail(
+                    name=s["signer"] or "",
+                    date=s["signed_at"] or "",
+                    reason=s["reason"],
+                    location=s["location"],
+                    is_valid=s["valid"],
+                    certificate_info=s.get("certificate", {})
+                )
+                for s in result["signatures"]
+            ]
         )
-        return SignatureInfo(**result)
 
     async def add_watermark(self, options: WatermarkOptions) -> Dict[str, Any]:
-        return await asyncio.to_thread(
-            self.engine.add_watermark,
+        output_path = await self.pdf_engine.add_watermark(
             options.input_path,
             options.output_path,
             options.type.value,
-            text=options.text,
-            image_path=options.image_path,
-            font_size=options.font_size,
-            font_family=options.font_family,
-            color=options.color,
-            opacity=options.opacity,
-            rotation=options.rotation,
-            position=options.position.value,
-            pages=options.pages,
-            layer=options.layer
+            options.text,
+            options.image_path,
+            options.font_size,
+            options.color,
+            options.opacity,
+            options.rotation,
+            options.position.value,
+            options.pages,
+            options.layer
         )
+        return {"success": True, "output_path": output_path}
 
     async def redact(self, options: RedactionOptions) -> Dict[str, Any]:
         redactions = [r.dict() for r in options.redactions]
@@ -97,8 +119,7 @@ class SecurityService:
 
     async def auto_redact(self, options: AutoRedactOptions) -> Dict[str, Any]:
         patterns = [p.dict() for p in options.patterns]
-        return await asyncio.to_thread(
-            self.engine.auto_redact,
+        return await self.engine.auto_redact(
             options.input_path,
             options.output_path,
             patterns,
@@ -1,9 +1,18 @@
 import os
 import re
+import hmac
+import time
 import uuid
+import base64
+import asyncio
 import hashlib
 import secrets
-from typing import Optional, List, Dict, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+
+from app.config.settings import settings
 
 
 def generate_uuid() -> str:
@@ -16,80 +25,242 @@ def generate_short_id(length: int = 8) -> str:
     return secrets.token_hex(length // 2 + 1)[:length]
 
 
-def hash_password(password: str, salt: Optional[str] = None) -> str:
-    """Hash password with salt"""
-    if salt is None:
-        salt = secrets.token_hex(16)
+KDF_PARAMETERS = {
+    # Tuned to the OWASP password storage recommendations
+    "pbkdf2-sha256": {"i": 600000},
+    "scrypt": {"ln": 15, "r": 8, "p": 3},
+    "argon2id": {"m": 19456, "t": 2, "p": 1},
+}
+# Stored hashes and tokens carry their own cost, so anything above these is refused
+KDF_PARAMETER_LIMITS = {
+    "pbkdf2-sha256": {"i": 1000000},
+    "scrypt": {"ln": 17, "r": 8, "p": 4},
+    "argon2id": {"m": 65536, "t": 4, "p": 4},
+}
+LEGACY_PBKDF2_PARAMETERS = {"i": 100000}
+LEGACY_DATA_SALT = b"pdf_master_salt"
+DERIVED_KEY_LENGTH = 32
+
+kdf_executor = ThreadPoolExecutor(max_workers=settings.KDF_WORKERS)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
     
-    hashed = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        100000
-    )
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
     
-    return f"{salt}:{hashed.hex()}"
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_fernet_keys = TTLCache(settings.KDF_CACHE_SIZE, settings.KDF_CACHE_TTL)
+_data_salts = TTLCache(settings.KDF_CACHE_SIZE, settings.KDF_CACHE_TTL)
+
+
+def derive_key(
+    secret: bytes,
+    salt: bytes,
+    algorithm: str,
+    params: Dict[str, int],
+    length: int = DERIVED_KEY_LENGTH
+) -> bytes:
+    """Derive key bytes from a secret"""
+    if algorithm == "pbkdf2-sha256":
+        return hashlib.pbkdf2_hmac("sha256", secret, salt, params["i"], length)
+    if algorithm == "scrypt":
+        n = 1 << params["ln"]
+        return hashlib.scrypt(
+            secret,
+            salt=salt,
+            n=n,
+            r=params["r"],
+            p=params["p"],
+            maxmem=256 * n * params["r"],
+            dklen=length
+        )
+    if algorithm == "argon2id":
+        try:
+            from argon2.low_level import Type, hash_secret_raw
+        except ImportError:
+            raise ValueError("argon2id requires the argon2-cffi package")
+        return hash_secret_raw(
+            secret,
+            salt,
+            time_cost=params["t"],
+            memory_cost=params["m"],
+            parallelism=params["p"],
+            hash_len=length,
+            type=Type.ID
+        )
+    raise ValueError(f"Unsupported key derivation algorithm: {algorithm}")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _encode_kdf(algorithm: str, params: Dict[str, int], salt: bytes, value: str) -> str:
+    encoded_params = ",".join(f"{name}={params[name]}" for name in sorted(params))
+    return f"${algorithm}${encoded_params}${_b64encode(salt)}${value}"
+
+
+def _check_kdf_parameters(algorithm: str, params: Dict[str, int]) -> None:
+    limits = KDF_PARAMETER_LIMITS.get(algorithm)
+    if limits is None or algorithm not in KDF_PARAMETERS:
+        raise ValueError(f"Unsupported key derivation algorithm: {algorithm}")
+    if params == KDF_PARAMETERS[algorithm]:
+        return
+    if params.keys() != limits.keys() or any(not 1 <= params[name] <= limit for name, limit in limits.items()):
+        raise ValueError(f"Key derivation parameters out of range for {algorithm}")
+
+
+def _decode_kdf(encoded: str) -> Tuple[str, Dict[str, int], bytes, str]:
+    _, algorithm, encoded_params, salt, value = encoded.split("$", 4)
+    params = {
+        name: int(number)
+        for name, number in (item.split("=") for item in encoded_params.split(","))
+    }
+    _check_kdf_parameters(algorithm, params)
+    return algorithm, params, _b64decode(salt), value
+
+
+def hash_password(password: str, salt: Optional[str] = None, algorithm: Optional[str] = None) -> str:
+    """Hash password with salt"""
+    algorithm = algorithm or settings.KDF_ALGORITHM
+    if algorithm not in KDF_PARAMETERS:
+        raise ValueError(f"Unsupported key derivation algorithm: {algorithm}")
+    params = KDF_PARAMETERS[algorithm]
+    salt_bytes = salt.encode("utf-8") if salt is not None else secrets.token_bytes(16)
+    hashed = derive_key(password.encode("utf-8"), salt_bytes, algorithm, params)
+    return _encode_kdf(algorithm, params, salt_bytes, _b64encode(hashed))
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
     try:
-        salt, hash_value = hashed_password.split(":")
+        if hashed_password.startswith("$"):
+            algorithm, params, salt, hash_value = _decode_kdf(hashed_password)
+            expected = _b64decode(hash_value)
+            if len(expected) != DERIVED_KEY_LENGTH:
+                return False
+            new_hash = derive_key(password.encode("utf-8"), salt, algorithm, params, len(expected))
+            return hmac.compare_digest(new_hash, expected)
         
-        new_hash = hashlib.pbkdf2_hmac(
-            "sha256",
+        # Hashes written before the algorithm was recorded: "salt:hex" with PBKDF2
+        salt, hash_value = hashed_password.split(":")
+        new_hash = derive_key(
             password.encode("utf-8"),
             salt.encode("utf-8"),
-            100000
+            "pbkdf2-sha256",
+            LEGACY_PBKDF2_PARAMETERS
         )
-        
-        return new_hash.hex() == hash_value
-    except:
+        return hmac.compare_digest(new_hash.hex(), hash_value)
+    except (ValueError, KeyError, TypeError):
         return False
 
 
-def encrypt_data(data: str, key: str) -> str:
-    """Encrypt data with key"""
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was made with other than the configured algorithm and cost"""
+    if not hashed_password.startswith("$"):
+        return True
+    try:
+        algorithm, params, _, _ = _decode_kdf(hashed_password)
+    except ValueError:
+        return True
+    return algorithm != settings.KDF_ALGORITHM or params != KDF_PARAMETERS.get(algorithm)
+
+
+def _fernet(key: str, salt: bytes, algorithm: str, params: Dict[str, int]):
     from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    import base64
-    
-    salt = b"pdf_master_salt"
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
     
-    key_bytes = kdf.derive(key.encode())
-    fernet_key = base64.urlsafe_b64encode(key_bytes)
-    fernet = Fernet(fernet_key)
+    # The cache is keyed by a digest so the plain key is not held in memory
+    cache_key = (hashlib.sha256(key.encode("utf-8")).digest(), salt, algorithm, tuple(sorted(params.items())))
+    fernet = _fernet_keys.get(cache_key)
+    if fernet is None:
+        key_bytes = derive_key(key.encode("utf-8"), salt, algorithm, params)
+        fernet = Fernet(base64.urlsafe_b64encode(key_bytes))
+        _fernet_keys.set(cache_key, fernet)
+    return fernet
+
+
+def encrypt_data(data: str, key: str) -> str:
+    """Encrypt data with key"""
+    algorithm = settings.KDF_ALGORITHM
+    params = KDF_PARAMETERS[algorithm]
+    # Reuse one random salt per key while it is cached; Fernet adds a fresh IV per token
+    salt_key = (hashlib.sha256(key.encode("utf-8")).digest(), algorithm)
+    salt = _data_salts.get(salt_key)
+    if salt is None:
+        salt = secrets.token_bytes(16)
+        _data_salts.set(salt_key, salt)
     
-    return fernet.encrypt(data.encode()).decode()
+    token = _fernet(key, salt, algorithm, params).encrypt(data.encode()).decode()
+    return _encode_kdf(algorithm, params, salt, token)
 
 
 def decrypt_data(encrypted_data: str, key: str) -> str:
     """Decrypt data with key"""
-    from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    import base64
-    
-    salt = b"pdf_master_salt"
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
-    
-    key_bytes = kdf.derive(key.encode())
-    fernet_key = base64.urlsafe_b64encode(key_bytes)
-    fernet = Fernet(fernet_key)
-    
-    return fernet.decrypt(encrypted_data.encode()).decode()
+    if encrypted_data.startswith("$"):
+        algorithm, params, salt, token = _decode_kdf(encrypted_data)
+    else:
+        # Tokens written before the salt was stored used a fixed salt
+        algorithm, params, salt, token = "pbkdf2-sha256", LEGACY_PBKDF2_PARAMETERS, LEGACY_DATA_SALT, encrypted_data
+    
+    return _fernet(key, salt, algorithm, params).decrypt(token.encode()).decode()
+
+
+async def hash_password_async(password: str, algorithm: Optional[str] = None) -> str:
+    """Hash password in the KDF thread pool"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(kdf_executor, hash_password, password, None, algorithm)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify password in the KDF thread pool"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(kdf_executor, verify_password, password, hashed_password)
+
+
+async def encrypt_data_async(data: str, key: str) -> str:
+    """Encrypt data in the KDF thread pool"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(kdf_executor, encrypt_data, data, key)
+
+
+async def decrypt_data_async(encrypted_data: str, key: str) -> str:
+    """Decrypt data in the KDF thread pool"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(kdf_executor, decrypt_data, encrypted_data, key)
 
 
 def calculate_hash(data: str, algorithm: str = "sha256") -> str:
@@ -1,8 +1,15 @@
 import os
 import io
+import time
+import numpy as np
+from functools import lru_cache
 from typing import List, Optional, Tuple, Dict, Any
 from PIL import Image
 
+from app.core.executor import PROCESS_WORKERS, get_process_executor
+
+RESIZE_REDUCING_GAP = 2.0
+
 
 def open_image(path: str) -> Image.Image:
     """Open image file"""
@@ -19,23 +26,38 @@ def resize_image(
     image: Image.Image,
     width: Optional[int] = None,
     height: Optional[int] = None,
-    maintain_aspect: bool = True
+    maintain_aspect: bool = True,
+    draft: bool = False
 ) -> Image.Image:
-    """Resize image"""
+    """Resize image; with draft, an undecoded JPEG is first reduced in place"""
     if width is None and height is None:
         return image
     
-    original_width, original_height = image.size
-    
+    size = _target_size(image.size, width, height, maintain_aspect)
+    if draft:
+        # Decoding at a reduced DCT scale changes the caller's image, so it is opt-in
+        _draft(image, size)
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP)
+
+
+def _target_size(
+    original: Tuple[int, int],
+    width: Optional[int],
+    height: Optional[int],
+    maintain_aspect: bool = True
+) -> Tuple[int, int]:
+    original_width, original_height = original
     if maintain_aspect:
         if width is None:
-            ratio = height / original_height
-            width = int(original_width * ratio)
+            width = int(original_width * height / original_height)
         elif height is None:
-            ratio = width / original_width
-            height = int(original_height * ratio)
-    
-    return image.resize((width, height), Image.Resampling.LANCZOS)
+            height = int(original_height * width / original_width)
+    return (width or original_width, height or original_height)
+
+
+def _draft(image: Image.Image, size: Tuple[int, int]) -> None:
+    if image.format == "JPEG" and getattr(image, "tile", None):
+        image.draft(image.mode, (int(size[0] * RESIZE_REDUCING_GAP), int(size[1] * RESIZE_REDUCING_GAP)))
 
 
 def crop_image(
@@ -76,16 +98,16 @@ def convert_format(image: Image.Image, format: str) -> Image.Image:
 
 def get_image_info(path: str) -> Dict[str, Any]:
     """Get image information"""
-    image = Image.open(path)
-    
-    return {
-        "path": path,
-        "width": image.width,
-        "height": image.height,
-        "format": image.format,
-        "mode": image.mode,
-        "size": os.path.getsize(path),
-    }
+    # Only the header is parsed; pixel data is never decoded
+    with Image.open(path) as image:
+        return {
+            "path": path,
+            "width": image.width,
+            "height": image.height,
+            "format": image.format,
+            "mode": image.mode,
+            "size": os.path.getsize(path),
+        }
 
 
 def image_to_bytes(image: Image.Image, format: str = "PNG", quality: int = 95) -> bytes:
@@ -114,29 +136,117 @@ def create_thumbnail(
         return image.resize(size, Image.Resampling.LANCZOS)
 
 
+def fade_alpha(image: Image.Image, opacity: float) -> Image.Image:
+    """Scale the alpha channel of an image by opacity"""
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    else:
+        image = image.copy()
+    
+    opacity = max(0.0, min(1.0, opacity))
+    alpha = image.getchannel("A").point([int(v * opacity) for v in range(256)])
+    image.putalpha(alpha)
+    return image
+
+
+def tile_watermark(
+    watermark: Image.Image,
+    size: Tuple[int, int],
+    offset: Tuple[int, int] = (0, 0),
+    spacing: Tuple[int, int] = (0, 0)
+) -> Image.Image:
+    """Repeat an RGBA watermark over a transparent layer of the given size"""
+    width, height = size
+    cell = np.zeros((watermark.height + spacing[1], watermark.width + spacing[0], 4), dtype=np.uint8)
+    cell[:watermark.height, :watermark.width] = np.asarray(watermark)
+    
+    reps = (-(-(height + cell.shape[0]) // cell.shape[0]), -(-(width + cell.shape[1]) // cell.shape[1]), 1)
+    layer = np.tile(cell, reps)
+    dx, dy = offset[0] % cell.shape[1], offset[1] % cell.shape[0]
+    layer = layer[cell.shape[0] - dy:cell.shape[0] - dy + height, cell.shape[1] - dx:cell.shape[1] - dx + width]
+    return Image.fromarray(np.ascontiguousarray(layer), "RGBA")
+
+
 def add_watermark(
     image: Image.Image,
     watermark: Image.Image,
     position: Tuple[int, int],
-    opacity: float = 0.5
+    opacity: float = 0.5,
+    mode: str = "single",
+    spacing: Tuple[int, int] = (0, 0)
 ) -> Image.Image:
     """Add watermark to image"""
     if image.mode != "RGBA":
         image = image.convert("RGBA")
     
-    if watermark.mode != "RGBA":
-        watermark = watermark.convert("RGBA")
-    
-    watermark_with_opacity = Image.new("RGBA", watermark.size)
-    for x in range(watermark.width):
-        for y in range(watermark.height):
-            r, g, b, a = watermark.getpixel((x, y))
-            watermark_with_opacity.putpixel((x, y), (r, g, b, int(a * opacity)))
+    watermark_with_opacity = watermark
+    if opacity < 1 or watermark.mode != "RGBA":
+        watermark_with_opacity = fade_alpha(watermark, opacity)
     
-    image.paste(watermark_with_opacity, position, watermark_with_opacity)
+    if mode == "single":
+        image.paste(watermark_with_opacity, position, watermark_with_opacity)
+    elif mode == "tile":
+        layer = tile_watermark(watermark_with_opacity, image.size, position, spacing)
+        image.paste(layer, (0, 0), layer)
+    else:
+        raise ValueError(f"Unknown watermark mode: {mode}")
     return image
 
 
+@lru_cache(maxsize=8)
+def _load_watermark(path: str, mtime: float, opacity: float) -> Image.Image:
+    with Image.open(path) as watermark:
+        return fade_alpha(watermark, opacity)
+
+
+def _watermark_image_file(
+    input_path: str,
+    output_path: str,
+    watermark_path: str,
+    position: Tuple[int, int],
+    opacity: float,
+    mode: str,
+    spacing: Tuple[int, int]
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        # Each worker fades the watermark once and reuses it for every image
+        watermark = _load_watermark(watermark_path, os.path.getmtime(watermark_path), opacity)
+        with Image.open(input_path) as image:
+            result = add_watermark(image, watermark, position, 1.0, mode, spacing)
+            if os.path.splitext(output_path)[1].lower() in (".jpg", ".jpeg", ".bmp"):
+                result = result.convert("RGB")
+            result.save(output_path)
+        return {"input": input_path, "output": output_path, "status": "success", "seconds": time.perf_counter() - start}
+    except Exception as e:
+        return {"input": input_path, "output": None, "status": "failed", "error": str(e), "seconds": time.perf_counter() - start}
+
+
+def watermark_images(
+    jobs: List[Tuple[str, str]],
+    watermark_path: str,
+    position: Tuple[int, int] = (0, 0),
+    opacity: float = 0.5,
+    mode: str = "single",
+    spacing: Tuple[int, int] = (0, 0)
+) -> List[Dict[str, Any]]:
+    """Watermark many image files in a process pool"""
+    if not jobs:
+        return []
+    count = len(jobs)
+    return list(get_process_executor().map(
+        _watermark_image_file,
+        [input_path for input_path, _ in jobs],
+        [output_path for _, output_path in jobs],
+        [watermark_path] * count,
+        [position] * count,
+        [opacity] * count,
+        [mode] * count,
+        [spacing] * count,
+        chunksize=max(1, count // (PROCESS_WORKERS * 4))
+    ))
+
+
 def convert_to_grayscale(image: Image.Image) -> Image.Image:
     """Convert image to grayscale"""
     return image.convert("L")
@@ -175,10 +285,12 @@ def apply_sharpen(image: Image.Image) -> Image.Image:
     return image.filter(ImageFilter.SHARPEN)
 
 
-def get_dominant_color(image: Image.Image) -> Tuple[int, int, int]:
-    """Get dominant color in image"""
+def get_dominant_color(image: Image.Image, draft: bool = False) -> Tuple[int, int, int]:
+    """Get dominant color in image; with draft, an undecoded JPEG is first reduced in place"""
+    if draft:
+        _draft(image, (100, 100))
+    image = image.resize((100, 100), reducing_gap=RESIZE_REDUCING_GAP)
     image = image.convert("RGB")
-    image = image.resize((100, 100))
     
     colors = image.getcolors(10000)
     if not colors:
@@ -191,8 +303,8 @@ def get_dominant_color(image: Image.Image) -> Tuple[int, int, int]:
 def is_image_file(path: str) -> bool:
     """Check if file is an image"""
     try:
-        Image.open(path)
-        return True
+        with Image.open(path):
+            return True
     except:
         return False
 
@@ -200,3 +312,179 @@ def is_image_file(path: str) -> bool:
 def get_supported_formats() -> List[str]:
     """Get supported image formats"""
     return ["PNG", "JPEG", "JPG", "GIF", "BMP", "TIFF", "WEBP", "ICO"]
+
+
+class ImagePipeline:
+    """Chain of image operations applied to each file with a single decode"""
+    
+    def __init__(self):
+        self.steps: List[Tuple[str, tuple]] = []
+    
+    def _add(self, name: str, *args) -> "ImagePipeline":
+        self.steps.append((name, args))
+        return self
+    
+    def resize(self, width: Optional[int] = None, height: Optional[int] = None, maintain_aspect: bool = True) -> "ImagePipeline":
+        return self._add("resize", width, height, maintain_aspect)
+    
+    def thumbnail(self, size: Tuple[int, int]) -> "ImagePipeline":
+        return self._add("thumbnail", tuple(size))
+    
+    def crop(self, left: int, top: int, right: int, bottom: int) -> "ImagePipeline":
+        return self._add("crop", (left, top, right, bottom))
+    
+    def rotate(self, degrees: float, expand: bool = False) -> "ImagePipeline":
+        return self._add("rotate", degrees, expand)
+    
+    def grayscale(self) -> "ImagePipeline":
+        return self._add("convert", "L")
+    
+    def convert(self, mode: str) -> "ImagePipeline":
+        return self._add("convert", mode)
+    
+    def watermark(
+        self,
+        watermark_path: str,
+        position: Tuple[int, int] = (0, 0),
+        opacity: float = 0.5,
+        mode: str = "single",
+        spacing: Tuple[int, int] = (0, 0)
+    ) -> "ImagePipeline":
+        return self._add("watermark", watermark_path, tuple(position), opacity, mode, tuple(spacing))
+    
+    def _draft_size(self, size: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        # Only leading downscales decide how small the JPEG can be decoded
+        for name, args in self.steps:
+            if name == "resize" and (args[0] or args[1]):
+                return _target_size(size, *args)
+            if name == "thumbnail":
+                scale = min(args[0][0] / size[0], args[0][1] / size[1], 1.0)
+                return (max(1, int(size[0] * scale)), max(1, int(size[1] * scale)))
+            if name != "convert":
+                return None
+        return None
+    
+    def apply(self, image: Image.Image, draft: bool = False) -> Image.Image:
+        """Run the chain on an opened image; with draft, an undecoded JPEG is first reduced in place"""
+        # Sizes are worked out from the full-resolution dimensions, not the drafted ones
+        source_size = image.size
+        size = self._draft_size(source_size) if draft else None
+        if size is not None:
+            _draft(image, size)
+        for name, args in self.steps:
+            if name == "resize":
+                if args[0] or args[1]:
+                    image = image.resize(
+                        _target_size(source_size, *args),
+                        Image.Resampling.LANCZOS,
+                        reducing_gap=RESIZE_REDUCING_GAP
+                    )
+            elif name == "thumbnail":
+                image.thumbnail(args[0], Image.Resampling.LANCZOS)
+            elif name == "crop":
+                image = image.crop(args[0])
+            elif name == "rotate":
+                image = image.rotate(args[0], expand=args[1])
+            elif name == "convert":
+                if image.mode != args[0]:
+                    image = image.convert(args[0])
+            elif name == "watermark":
+                watermark_path, position, opacity, mode, spacing = args
+                mark = _load_watermark(watermark_path, os.path.getmtime(watermark_path), opacity)
+                image = add_watermark(image, mark, position, 1.0, mode, spacing)
+            source_size = image.size
+        return image
+    
+    def run(
+        self,
+        input_path: str,
+        output_path: str,
+        format: Optional[str] = None,
+        quality: int = 85
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            with Image.open(input_path) as image:
+                source_size = image.size
+                # The file was opened here, so drafting cannot affect anyone else's image
+                result = self.apply(image, draft=True)
+                target_format = (format or os.path.splitext(output_path)[1].lstrip(".") or image.format).upper()
+                if target_format == "JPG":
+                    target_format = "JPEG"
+                if target_format in ("JPEG", "BMP") and result.mode not in ("RGB", "L"):
+                    result = result.convert("RGB")
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                result.save(output_path, format=target_format, quality=quality)
+                return {
+                    "input": input_path,
+                    "output": output_path,
+                    "status": "success",
+                    "source_size": source_size,
+                    "size": result.size,
+                    "seconds": time.perf_counter() - start,
+                }
+        except Exception as e:
+            return {"input": input_path, "output": None, "status": "failed", "error": str(e), "seconds": time.perf_counter() - start}
+    
+    def run_many(
+        self,
+        jobs: List[Tuple[str, str]],
+        format: Optional[str] = None,
+        quality: int = 85
+    ) -> List[Dict[str, Any]]:
+        """Run the pipeline over many files in a process pool"""
+        if not jobs:
+            return []
+        count = len(jobs)
+        return list(get_process_executor().map(
+            self.run,
+            [input_path for input_path, _ in jobs],
+            [output_path for _, output_path in jobs],
+            [format] * count,
+            [quality] * count,
+            chunksize=max(1, count // (PROCESS_WORKERS * 4))
+        ))
+    
+    def run_directory(
+        self,
+        input_dir: str,
+        output_dir: str,
+        format: Optional[str] = None,
+        quality: int = 85,
+        recursive: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Run the pipeline over every image in a directory, mirroring its layout"""
+        jobs = []
+        for path in list_images(input_dir, recursive):
+            relative = os.path.relpath(path, input_dir)
+            if format:
+                relative = os.path.splitext(relative)[0] + "." + format.lower().replace("jpeg", "jpg")
+            jobs.append((path, os.path.join(output_dir, relative)))
+        return self.run_many(jobs, format, quality)
+
+
+def list_images(directory: str, recursive: bool = False) -> List[str]:
+    """List image files in a directory by extension, without opening them"""
+    extensions = {f".{name.lower()}" for name in get_supported_formats()} | {".tif"}
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths.extend(
+            os.path.join(root, name)
+            for name in sorted(files)
+            if os.path.splitext(name)[1].lower() in extensions
+        )
+        if not recursive:
+            break
+    return paths
+
+
+def scan_images(directory: str, recursive: bool = False) -> List[Dict[str, Any]]:
+    """Header-only info for every readable image in a directory"""
+    results = []
+    for path in list_images(directory, recursive):
+        try:
+            results.append(get_image_info(path))
+        except (OSError, ValueError, SyntaxError):
+            continue
+    return results
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+import pikepdf
+from loguru import logger
+
+from app.core.security_engine.batch import ENCRYPTION_METHODS, latency_summary, run_security_batch
+
+PASSWORD = "benchmark"
+
+
+def generate_corpus(output_dir: str, documents: int, pages: int) -> list:
+    paths = []
+    for d in range(documents):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Document {d + 1}, page {p + 1}", fontsize=14)
+            page.insert_textbox(fitz.Rect(72, 100, 520, 760), "lorem ipsum dolor sit amet " * 120, fontsize=9)
+        path = os.path.join(output_dir, f"doc_{d + 1}.pdf")
+        doc.save(path, deflate=True)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def measure_open(paths: list, password: str) -> dict:
+    # Opening with the user password runs the revision's key derivation
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        with pikepdf.open(path, password=password):
+            pass
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def _ms(summary: dict) -> str:
+    return ", ".join(f"{key} {value * 1000:.1f}ms" for key, value in summary.items())
+
+
+async def main(paths: list, work_dir: str, methods: list):
+    for method in methods:
+        output_dir = os.path.join(work_dir, method)
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = [(path, os.path.join(output_dir, os.path.basename(path))) for path in paths]
+        
+        report = await run_security_batch("encrypt", jobs, {"password": PASSWORD, "method": method})
+        stats = report["stats"]
+        if stats["failed"]:
+            failure = next(r for r in report["results"] if r["status"] == "failed")
+            logger.error(f"{method}: {stats['failed']} files failed, e.g. {failure['error']}")
+            continue
+        logger.info(
+            f"{method:>8} R{ENCRYPTION_METHODS[method]} encrypt: {stats['files_per_second']:.1f} files/s, "
+            f"{_ms(stats['latency'])}"
+        )
+        
+        encrypted = [output for _, output in jobs]
+        logger.info(f"{method:>8} R{ENCRYPTION_METHODS[method]} open:    {_ms(measure_open(encrypted, PASSWORD))}")
+        shutil.rmtree(output_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batch encryption cost per security handler revision")
+    parser.add_argument("corpus", nargs="?", help="directory of PDF files")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N documents instead")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic document")
+    parser.add_argument("--methods", default=",".join(ENCRYPTION_METHODS), help="comma separated methods")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="encrypt_bench_")
+    if args.synthetic:
+        paths = generate_corpus(work_dir, args.synthetic, args.pages)
+    elif args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "**", "*.pdf"), recursive=True))
+    else:
+        parser.error("either a corpus directory or --synthetic is required")
+    
+    logger.info(f"Encrypting {len(paths)} documents")
+    asyncio.run(main(paths, work_dir, args.methods.split(",")))
+    shutil.rmtree(work_dir)
@@ -0,0 +1,99 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+from app.core.executor import PROCESS_WORKERS
+from app.core.security_engine.batch import latency_summary
+from app.utils.image import add_watermark, watermark_images
+
+
+def legacy_add_watermark(image: Image.Image, watermark: Image.Image, position, opacity: float = 0.5) -> Image.Image:
+    # The per-pixel getpixel/putpixel loop this module used before
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    if watermark.mode != "RGBA":
+        watermark = watermark.convert("RGBA")
+    watermark_with_opacity = Image.new("RGBA", watermark.size)
+    for x in range(watermark.width):
+        for y in range(watermark.height):
+            r, g, b, a = watermark.getpixel((x, y))
+            watermark_with_opacity.putpixel((x, y), (r, g, b, int(a * opacity)))
+    image.paste(watermark_with_opacity, position, watermark_with_opacity)
+    return image
+
+
+def _ms(summary: dict) -> str:
+    return ", ".join(f"{key} {value * 1000:.1f}ms" for key, value in summary.items())
+
+
+def measure(fn, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+def generate_images(output_dir: str, count: int, size: tuple) -> list:
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        path = os.path.join(output_dir, f"image_{i + 1}.jpg")
+        Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def main(args):
+    rng = np.random.default_rng(1)
+    image = Image.fromarray(rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8))
+    watermark = Image.fromarray(rng.integers(0, 255, (args.mark_height, args.mark_width, 4), dtype=np.uint8), "RGBA")
+    
+    legacy = measure(lambda: legacy_add_watermark(image, watermark, (20, 20), 0.4), args.legacy_repeat)
+    vectorized = measure(lambda: add_watermark(image, watermark, (20, 20), 0.4), args.repeat)
+    tiled = measure(lambda: add_watermark(image, watermark, (20, 20), 0.4, "tile", (40, 40)), args.repeat)
+    logger.info(f"{args.width}x{args.height} image, {args.mark_width}x{args.mark_height} watermark")
+    logger.info(f"legacy loop: {_ms(legacy)}")
+    logger.info(f"vectorized:  {_ms(vectorized)} ({legacy['p50'] / vectorized['p50']:.0f}x faster)")
+    logger.info(f"tiled:       {_ms(tiled)}")
+    
+    if not args.batch:
+        return
+    work_dir = tempfile.mkdtemp(prefix="image_watermark_bench_")
+    try:
+        paths = generate_images(work_dir, args.batch, (args.width, args.height))
+        watermark_path = os.path.join(work_dir, "watermark.png")
+        watermark.save(watermark_path)
+        jobs = [(path, path.replace(".jpg", "_marked.jpg")) for path in paths]
+        start = time.perf_counter()
+        results = watermark_images(jobs, watermark_path, (20, 20), 0.4, "tile", (40, 40))
+        elapsed = time.perf_counter() - start
+        failed = sum(r["status"] != "success" for r in results)
+        logger.info(
+            f"batch of {len(jobs)} with {PROCESS_WORKERS} worker(s): {len(jobs) / elapsed:.1f} images/s, "
+            f"{failed} failed, {_ms(latency_summary([r['seconds'] for r in results]))}"
+        )
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-pixel and vectorized image watermark paths")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--mark-width", type=int, default=400)
+    parser.add_argument("--mark-height", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20, help="calls per vectorized measurement")
+    parser.add_argument("--legacy-repeat", type=int, default=3, help="calls per legacy measurement")
+    parser.add_argument("--batch", type=int, default=200, help="images in the process pool batch, 0 to skip")
+    main(parser.parse_args())
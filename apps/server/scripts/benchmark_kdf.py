@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+
+from app.core.security_engine.batch import latency_summary
+from app.utils import crypto
+
+PASSWORD = "correct horse battery staple"
+
+
+def _ms(summary: dict) -> str:
+    return ", ".join(f"{key} {value * 1000:.1f}ms" for key, value in summary.items())
+
+
+def measure(fn, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latency_summary(latencies)
+
+
+async def measure_concurrent(algorithm: str, calls: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(crypto.hash_password_async(PASSWORD, algorithm) for _ in range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+async def measure_event_loop_stall(algorithm: str) -> float:
+    # Longest gap between ticks of a 1ms timer while a hash runs in the pool
+    stalls = []
+    
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stalls.append(now - last)
+            last = now
+    
+    task = asyncio.ensure_future(ticker())
+    await crypto.hash_password_async(PASSWORD, algorithm)
+    task.cancel()
+    return max(stalls, default=0.0)
+
+
+def main(algorithms: list, repeat: int, concurrency: int):
+    for algorithm in algorithms:
+        try:
+            hashed = crypto.hash_password(PASSWORD, algorithm=algorithm)
+        except ValueError as e:
+            logger.warning(f"{algorithm}: {e}")
+            continue
+        logger.info(f"{algorithm:>14} {crypto.KDF_PARAMETERS[algorithm]}")
+        logger.info(f"{algorithm:>14} hash:   {_ms(measure(lambda: crypto.hash_password(PASSWORD, algorithm=algorithm), repeat))}")
+        logger.info(f"{algorithm:>14} verify: {_ms(measure(lambda: crypto.verify_password(PASSWORD, hashed), repeat))}")
+        logger.info(
+            f"{algorithm:>14} async:  {asyncio.run(measure_concurrent(algorithm, concurrency)):.1f} hashes/s "
+            f"with {concurrency} concurrent calls"
+        )
+        logger.info(f"{algorithm:>14} loop stall while hashing: {asyncio.run(measure_event_loop_stall(algorithm)) * 1000:.1f}ms")
+    
+    crypto._fernet_keys.clear()
+    crypto._data_salts.clear()
+    logger.info(f"encrypt_data cold:   {_ms(measure(lambda: crypto.encrypt_data('payload', PASSWORD), 1))}")
+    logger.info(f"encrypt_data cached: {_ms(measure(lambda: crypto.encrypt_data('payload', PASSWORD), repeat))}")
+    token = crypto.encrypt_data("payload", PASSWORD)
+    logger.info(f"decrypt_data cached: {_ms(measure(lambda: crypto.decrypt_data(token, PASSWORD), repeat))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-call latency of the password hashing and key derivation helpers")
+    parser.add_argument("--algorithms", default=",".join(crypto.KDF_PARAMETERS), help="comma separated algorithms")
+    parser.add_argument("--repeat", type=int, default=10, help="calls per measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent async hash calls")
+    args = parser.parse_args()
+    
+    main(args.algorithms.split(","), args.repeat, args.concurrency)
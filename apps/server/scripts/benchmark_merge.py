@@ -0,0 +1,103 @@
+import argparse
+import glob
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+from loguru import logger
+
+from app.core.pdf_engine.merger import merge_streaming
+
+
+def generate_corpus(output_dir: str, documents: int, pages: int, image_kb: int) -> list:
+    import numpy as np
+    from PIL import Image
+    
+    rng = np.random.default_rng(42)
+    side = int((image_kb * 1024 / 1.1) ** 0.5)
+    pixels = (rng.random((side, side, 3)) * 255).astype("uint8")
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=90)
+    scan = buf.getvalue()
+    
+    paths = []
+    for d in range(documents):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            # Bytes after the JPEG EOI marker are ignored by decoders but keep
+            # every page image distinct, like real scans.
+            page.insert_image(page.rect, stream=scan + (d * pages + p).to_bytes(4, "big"))
+        path = os.path.join(output_dir, f"scan_{d + 1}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def merge_in_memory(paths: list, output_path: str):
+    result = fitz.open()
+    for path in paths:
+        doc = fitz.open(path)
+        result.insert_pdf(doc)
+        doc.close()
+    result.save(output_path)
+    result.close()
+
+
+def _run(method: str, paths: list, output_path: str, queue):
+    start = time.perf_counter()
+    if method == "in-memory":
+        merge_in_memory(paths, output_path)
+    else:
+        merge_streaming(paths, output_path)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def measure(method: str, paths: list, output_path: str) -> tuple:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(method, paths, output_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare peak memory of in-memory and streaming PDF merges")
+    parser.add_argument("corpus", nargs="?", help="directory of PDF files")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N scanned documents instead")
+    parser.add_argument("--pages", type=int, default=50, help="pages per synthetic document")
+    parser.add_argument("--image-kb", type=int, default=1000, help="approximate size of each page scan")
+    parser.add_argument("--skip-in-memory", action="store_true", help="only run the streaming merge")
+    args = parser.parse_args()
+    
+    work_dir = tempfile.mkdtemp(prefix="merge_bench_")
+    if args.synthetic:
+        paths = generate_corpus(work_dir, args.synthetic, args.pages, args.image_kb)
+    elif args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "**", "*.pdf"), recursive=True))
+    else:
+        parser.error("either a corpus directory or --synthetic is required")
+    
+    total = sum(os.path.getsize(path) for path in paths)
+    logger.info(f"Merging {len(paths)} documents, {total / 2 ** 30:.2f} GiB in total")
+    
+    methods = ["streaming"] if args.skip_in_memory else ["streaming", "in-memory"]
+    for method in methods:
+        output_path = os.path.join(work_dir, f"merged_{method}.pdf")
+        elapsed, peak = measure(method, paths, output_path)
+        logger.info(
+            f"{method:>10}: {elapsed:7.2f}s, peak RSS {peak / 2 ** 20:8.1f} MiB, "
+            f"output {os.path.getsize(output_path) / 2 ** 30:.2f} GiB"
+        )
+        os.remove(output_path)
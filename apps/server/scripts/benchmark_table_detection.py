@@ -0,0 +1,123 @@
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+import pdfplumber
+from loguru import logger
+
+from app.core.pdf_engine.extractor.text import may_contain_table
+
+TEXT_SETTINGS = {"vertical_strategy": "text", "horizontal_strategy": "text"}
+
+
+def generate_corpus(output_dir: str, documents: int, pages: int) -> list:
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, PageBreak
+    
+    random.seed(42)
+    styles = getSampleStyleSheet()
+    vocabulary = [
+        "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(2, 10)))
+        for _ in range(2000)
+    ]
+    
+    paths = []
+    for d in range(documents):
+        story = []
+        for p in range(pages):
+            prose = " ".join(random.choice(vocabulary) for _ in range(random.randint(150, 400)))
+            story.append(Paragraph(prose, styles["Normal"]))
+            if random.random() < 0.25:
+                rows = [["Item", "Qty", "Price", "Total"]] + [
+                    [random.choice(vocabulary), str(q), f"{q * 1.5:.2f}", f"{q * q * 1.5:.2f}"]
+                    for q in range(random.randint(3, 12))
+                ]
+                table = Table(rows)
+                if random.random() < 0.8:
+                    table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+                story.append(table)
+            story.append(PageBreak())
+        
+        path = os.path.join(output_dir, f"synthetic_{d + 1}.pdf")
+        SimpleDocTemplate(path).build(story)
+        paths.append(path)
+    return paths
+
+
+def benchmark(paths: list, table_settings: dict = None) -> dict:
+    stats = {
+        "pages": 0, "candidates": 0,
+        "tp": 0, "fp": 0, "fn": 0,
+        "filter_time": 0.0, "extract_time": 0.0, "candidate_extract_time": 0.0,
+    }
+    
+    for path in paths:
+        doc = fitz.open(path)
+        with pdfplumber.open(path) as pdf:
+            for page_index, page in enumerate(pdf.pages):
+                start = time.perf_counter()
+                candidate = may_contain_table(doc[page_index], table_settings)
+                stats["filter_time"] += time.perf_counter() - start
+                
+                start = time.perf_counter()
+                has_table = bool(page.extract_tables(table_settings))
+                elapsed = time.perf_counter() - start
+                page.close()
+                
+                stats["pages"] += 1
+                stats["extract_time"] += elapsed
+                if candidate:
+                    stats["candidates"] += 1
+                    stats["candidate_extract_time"] += elapsed
+                if candidate and has_table:
+                    stats["tp"] += 1
+                elif candidate:
+                    stats["fp"] += 1
+                elif has_table:
+                    stats["fn"] += 1
+        doc.close()
+    
+    return stats
+
+
+def report(stats: dict):
+    tp, fp, fn = stats["tp"], stats["fp"], stats["fn"]
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    filtered_time = stats["filter_time"] + stats["candidate_extract_time"]
+    saved = 1 - filtered_time / stats["extract_time"] if stats["extract_time"] else 0.0
+    
+    logger.info(f"Pages:               {stats['pages']}")
+    logger.info(f"Candidate pages:     {stats['candidates']}")
+    logger.info(f"Precision / recall:  {precision:.3f} / {recall:.3f} (tp={tp} fp={fp} fn={fn})")
+    logger.info(f"Full extraction:     {stats['extract_time']:.2f}s")
+    logger.info(f"Pre-filter + subset: {filtered_time:.2f}s (filter {stats['filter_time']:.2f}s)")
+    logger.info(f"Time saved:          {saved:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the table pre-filter against full pdfplumber extraction")
+    parser.add_argument("corpus", nargs="?", help="directory of PDF files")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate N synthetic documents instead")
+    parser.add_argument("--pages", type=int, default=40, help="pages per synthetic document")
+    parser.add_argument("--text-strategy", action="store_true", help="benchmark the text-alignment strategy")
+    args = parser.parse_args()
+    
+    if args.synthetic:
+        corpus_dir = tempfile.mkdtemp(prefix="table_bench_")
+        paths = generate_corpus(corpus_dir, args.synthetic, args.pages)
+    elif args.corpus:
+        paths = sorted(glob.glob(os.path.join(args.corpus, "**", "*.pdf"), recursive=True))
+    else:
+        parser.error("either a corpus directory or --synthetic is required")
+    
+    logger.info(f"Benchmarking {len(paths)} documents")
+    report(benchmark(paths, TEXT_SETTINGS if args.text_strategy else None))
@@ -0,0 +1,1094 @@
+import pytest
+import sys
+import os
+import shutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+
+from app.config.settings import settings
+from app.core.convert_engine.engine import ConvertEngine
+from app.core.pdf_engine.extractor.positioned import PositionedText
+from app.core.pdf_engine.extractor.text import TableExtractor, TextExtractor, may_contain_table
+from app.core.pdf_engine.merger import PdfMerger
+from app.core.pdf_engine.renderer import PageRenderer, PagePrefetcher, RenderCache
+from app.core.pdf_engine.spatial import DocumentSpatialIndex
+from app.core.pdf_engine.thumbnail import ThumbnailGenerator
+from app.core.search_engine.engine import SearchEngine
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    path = str(tmp_path / "sample.pdf")
+    doc = fitz.open()
+    for i in range(10):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}", fontsize=20)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def table_pdf(tmp_path):
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet
+    
+    path = str(tmp_path / "tables.pdf")
+    styles = getSampleStyleSheet()
+    story = []
+    for i in range(12):
+        story.append(Paragraph(f"Section {i + 1} " + "lorem ipsum " * 30, styles["Normal"]))
+        if i % 4 == 0:
+            table = Table([["Name", "Qty"]] + [[f"item-{i}-{j}", str(j)] for j in range(3)])
+            table.setStyle(TableStyle([("GRID", (0, 0), (-1, -1), 0.5, colors.black)]))
+            story.append(table)
+        story.append(PageBreak())
+    SimpleDocTemplate(path).build(story)
+    return path
+
+
+class TestConvertEngine:
+    @pytest.mark.asyncio
+    async def test_pdf_to_image_pages_subset(self, sample_pdf, tmp_path):
+        engine = ConvertEngine()
+        output_dir = str(tmp_path / "images")
+        images = await engine.pdf_to_image(sample_pdf, output_dir, "png", 72, pages=[5, 2, 99])
+        
+        assert [os.path.basename(p) for p in images] == ["page_2.png", "page_5.png"]
+        assert all(os.path.exists(p) for p in images)
+    
+    @pytest.mark.asyncio
+    async def test_pdf_to_image_mono_webp(self, sample_pdf, tmp_path):
+        from PIL import Image
+        
+        engine = ConvertEngine()
+        output_dir = str(tmp_path / "images")
+        images = await engine.pdf_to_image(sample_pdf, output_dir, "webp", 72, colorspace="mono")
+        
+        assert len(images) == 10
+        with Image.open(images[0]) as img:
+            assert img.format == "WEBP"
+    
+    @pytest.mark.asyncio
+    async def test_iter_pdf_to_image_streams_all_pages(self, sample_pdf, tmp_path):
+        engine = ConvertEngine()
+        output_dir = str(tmp_path / "images")
+        pages = [
+            item["page"]
+            async for item in engine.iter_pdf_to_image(sample_pdf, output_dir, "jpg", 72)
+        ]
+        
+        assert sorted(pages) == list(range(1, 11))
+    
+    @pytest.mark.asyncio
+    async def test_pdf_to_word_reports_progress(self, sample_pdf, tmp_path):
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "sample.docx")
+        progress = []
+        
+        result = await engine.pdf_to_word(
+            sample_pdf,
+            output_path,
+            progress_callback=lambda done, total: progress.append((done, total))
+        )
+        
+        assert result == output_path
+        assert os.path.exists(output_path)
+        assert progress[-1] == (10, 10)
+    
+    @pytest.mark.asyncio
+    async def test_pdf_to_excel_writes_one_sheet_per_table(self, table_pdf, tmp_path):
+        import openpyxl
+        
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "tables.xlsx")
+        csv_dir = str(tmp_path / "csv")
+        await engine.pdf_to_excel(table_pdf, output_path, csv_dir=csv_dir)
+        
+        wb = openpyxl.load_workbook(output_path)
+        assert wb.sheetnames == ["Table_1", "Table_2", "Table_3"]
+        assert next(wb["Table_1"].values) == ("Name", "Qty")
+        assert sorted(os.listdir(csv_dir)) == ["table_1.csv", "table_2.csv", "table_3.csv"]
+    
+    @pytest.mark.asyncio
+    async def test_pdf_to_html_escapes_text_and_dedups_images(self, tmp_path):
+        from PIL import Image
+        import io
+        
+        buf = io.BytesIO()
+        Image.new("RGB", (20, 20), "red").save(buf, "PNG")
+        input_path = str(tmp_path / "images.pdf")
+        doc = fitz.open()
+        for i in range(3):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"<b>{i}</b> & co")
+            page.insert_image(fitz.Rect(100, 100, 200, 200), stream=buf.getvalue())
+        doc.save(input_path)
+        doc.close()
+        
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "out.html")
+        await engine.pdf_to_html(input_path, output_path)
+        
+        with open(output_path, encoding="utf-8") as f:
+            content = f.read()
+        assert "&lt;b&gt;0&lt;/b&gt; &amp; co" in content
+        assert content.count('class="page"') == 3
+        assert len(os.listdir(tmp_path / "out_files")) == 1
+        
+        split_path = str(tmp_path / "split.html")
+        await engine.pdf_to_html(input_path, split_path, split_pages=True)
+        assert os.path.exists(tmp_path / "split_page_3.html")
+        with open(split_path, encoding="utf-8") as f:
+            assert f.read().count("<li>") == 3
+    
+    @pytest.mark.asyncio
+    async def test_word_to_pdf_flows_paragraphs_and_tables(self, tmp_path):
+        from docx import Document
+        
+        input_path = str(tmp_path / "doc.docx")
+        document = Document()
+        document.add_heading("Report <draft>", 1)
+        for i in range(80):
+            document.add_paragraph(f"Paragraph {i} " + "lorem ipsum " * 30)
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = "Key"
+        table.cell(1, 1).text = "Value"
+        document.save(input_path)
+        
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "doc.pdf")
+        await engine.word_to_pdf(input_path, output_path)
+        
+        doc = fitz.open(output_path)
+        text = "".join(page.get_text() for page in doc)
+        assert doc.page_count > 1
+        assert "Report <draft>" in text
+        assert "Value" in text
+        doc.close()
+    
+    @pytest.mark.asyncio
+    async def test_excel_to_pdf_paginates_rows(self, tmp_path):
+        from openpyxl import Workbook
+        
+        input_path = str(tmp_path / "sheet.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Data"
+        ws.append(["id", "name"])
+        for i in range(300):
+            ws.append([i, f"name-{i}"])
+        wb.save(input_path)
+        
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "sheet.pdf")
+        await engine.excel_to_pdf(input_path, output_path)
+        
+        doc = fitz.open(output_path)
+        assert doc.page_count > 1
+        assert "name-299" in doc[-1].get_text()
+        assert doc[1].get_text().split()[:2] == ["id", "name"]
+        doc.close()
+    
+    @pytest.mark.asyncio
+    async def test_excel_to_pdf_keeps_cjk_after_sample_rows(self, tmp_path):
+        from openpyxl import Workbook
+        
+        input_path = str(tmp_path / "late_cjk.xlsx")
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["id", "name"])
+        for i in range(300):
+            ws.append([i, "\u4e2d\u6587\u665a\u51fa\u73b0" if i == 250 else f"name-{i}"])
+        wb.save(input_path)
+        
+        output_path = str(tmp_path / "late_cjk.pdf")
+        await ConvertEngine().excel_to_pdf(input_path, output_path)
+        
+        doc = fitz.open(output_path)
+        # The column is sized from the leading rows, so the late cell wraps
+        text = "".join(page.get_text() for page in doc).replace("\n", "")
+        doc.close()
+        assert "\u4e2d\u6587\u665a\u51fa\u73b0" in text
+        assert "name-299" in text
+    
+    @pytest.mark.asyncio
+    async def test_images_to_pdf_passes_jpeg_through_and_splits_tiff(self, tmp_path):
+        from PIL import Image
+        
+        jpeg_path = str(tmp_path / "scan.jpg")
+        Image.new("RGB", (400, 300), "red").save(jpeg_path, quality=80)
+        tiff_path = str(tmp_path / "scan.tiff")
+        frames = [Image.new("1", (200, 300), 1) for _ in range(3)]
+        frames[0].save(tiff_path, save_all=True, append_images=frames[1:], compression="group4")
+        
+        engine = ConvertEngine()
+        output_path = str(tmp_path / "images.pdf")
+        await engine.images_to_pdf([jpeg_path, tiff_path], output_path, page_size="a4", margin=20)
+        
+        doc = fitz.open(output_path)
+        assert doc.page_count == 4
+        assert all(page.rect == fitz.paper_rect("a4") for page in doc)
+        xref, _, width, height, _, _, _, _, image_filter = doc[0].get_images()[0][:9]
+        assert (width, height, image_filter) == (400, 300, "DCTDecode")
+        with open(jpeg_path, "rb") as f:
+            assert doc.xref_stream_raw(xref) == f.read()
+        doc.close()
+
+
+class TestTableExtractor:
+    def test_iter_tables_in_page_order(self, table_pdf):
+        pages = [page for page, _ in TableExtractor.iter_tables(table_pdf)]
+        assert pages == [1, 5, 9]
+        
+        sequential = [page for page, _ in TableExtractor.iter_tables(table_pdf, parallel=False)]
+        assert sequential == pages
+    
+    def test_iter_tables_page_subset(self, table_pdf):
+        tables = list(TableExtractor.iter_tables(table_pdf, pages=[5, 6]))
+        assert [page for page, _ in tables] == [5]
+        assert tables[0][1][1] == ["item-4-0", "0"]
+    
+    def test_prefilter_skips_pages_without_ruling_lines(self, table_pdf):
+        doc = fitz.open(table_pdf)
+        candidates = [i + 1 for i, page in enumerate(doc) if may_contain_table(page)]
+        doc.close()
+        
+        assert candidates == [1, 5, 9]
+        unfiltered = list(TableExtractor.iter_tables(table_pdf, prefilter=False))
+        assert list(TableExtractor.iter_tables(table_pdf)) == unfiltered
+    
+    def test_prefilter_keeps_every_page_for_explicit_lines(self, table_pdf):
+        settings = {
+            "vertical_strategy": "explicit",
+            "horizontal_strategy": "lines",
+            "explicit_vertical_lines": [72, 300],
+        }
+        doc = fitz.open(table_pdf)
+        assert all(may_contain_table(page, settings) for page in doc)
+        doc.close()
+
+
+class TestPdfMerger:
+    @pytest.mark.asyncio
+    async def test_merge_deduplicated_shares_identical_resources(self, tmp_path):
+        from PIL import Image
+        import io
+        
+        buf = io.BytesIO()
+        Image.effect_noise((200, 100), 64).save(buf, "PNG")
+        font_buffer = fitz.Font("tiro").buffer
+        paths = []
+        for i in range(5):
+            path = str(tmp_path / f"invoice_{i}.pdf")
+            doc = fitz.open()
+            page = doc.new_page()
+            page.insert_font(fontname="F0", fontbuffer=font_buffer)
+            page.insert_text((72, 200), f"Invoice {i}", fontname="F0")
+            page.insert_image(fitz.Rect(72, 72, 272, 172), stream=buf.getvalue())
+            doc.save(path)
+            doc.close()
+            paths.append(path)
+        
+        output_path = str(tmp_path / "merged.pdf")
+        stats = await PdfMerger.merge_deduplicated(paths, output_path)
+        
+        assert stats["page_count"] == 5
+        assert stats["deduplicated_objects"] > 0
+        assert stats["output_size"] < stats["input_size"] / 2
+        doc = fitz.open(output_path)
+        assert [page.get_text().strip() for page in doc] == [f"Invoice {i}" for i in range(5)]
+        assert len({page.get_images()[0][0] for page in doc}) == 1
+        doc.close()
+    
+    def test_deduplicate_nested_font_copies(self, tmp_path):
+        from app.core.pdf_engine.merger import _deduplicate_objects
+        
+        # Two copies of one font in a single file: the FontFile streams fold
+        # first, then the descriptors, CID fonts and fonts that point at them
+        font_buffer = fitz.Font("tiro").buffer
+        doc = fitz.open()
+        for i in range(2):
+            part = fitz.open()
+            page = part.new_page()
+            page.insert_font(fontname="F0", fontbuffer=font_buffer)
+            page.insert_text((72, 200), f"Copy {i}", fontname="F0")
+            doc.insert_pdf(part)
+            part.close()
+        
+        seen = {}
+        assert _deduplicate_objects(doc, 1, seen) > 0
+        live = set()
+        for xref in range(1, doc.xref_length()):
+            try:
+                doc.xref_object(xref)
+                live.add(xref)
+            except RuntimeError:
+                pass
+        # Digests of rewritten objects must not point at folded-away xrefs
+        assert set(seen.values()) <= live
+        assert len({font[0] for page in doc for font in page.get_fonts()}) == 1
+        
+        path = str(tmp_path / "folded.pdf")
+        doc.save(path, garbage=1)
+        doc.close()
+        doc = fitz.open(path)
+        assert [page.get_text().strip() for page in doc] == ["Copy 0", "Copy 1"]
+        doc.close()
+    
+    @pytest.mark.asyncio
+    async def test_merge_streaming_keeps_pages_and_inherited_attributes(self, sample_pdf, tmp_path):
+        import pikepdf
+        
+        inherited_path = str(tmp_path / "inherited.pdf")
+        with pikepdf.open(sample_pdf) as pdf:
+            pdf.Root.Pages.MediaBox = pikepdf.Array([0, 442, 300, 842])
+            for page in pdf.pages:
+                del page.obj["/MediaBox"]
+            pdf.save(inherited_path)
+        
+        output_path = str(tmp_path / "merged.pdf")
+        stats = await PdfMerger.merge_streaming([sample_pdf, inherited_path], output_path)
+        
+        assert stats["page_count"] == 20
+        doc = fitz.open(output_path)
+        assert not doc.is_repaired
+        assert doc[0].get_text().strip() == "Page 1"
+        assert doc[19].get_text().strip() == "Page 10"
+        assert doc[19].rect == fitz.Rect(0, 0, 300, 400)
+        doc.close()
+    
+    @pytest.mark.asyncio
+    async def test_merge_with_bookmarks_rebases_outlines(self, sample_pdf, tmp_path):
+        with_toc = str(tmp_path / "with_toc.pdf")
+        doc = fitz.open(sample_pdf)
+        doc.set_toc([[1, "Intro", 1], [2, "Detail", 3], [1, "End", 10]])
+        doc.save(with_toc)
+        doc.close()
+        
+        output_path = str(tmp_path / "merged.pdf")
+        await PdfMerger.merge_with_bookmarks([sample_pdf, with_toc], output_path, ["First"])
+        
+        doc = fitz.open(output_path)
+        assert doc.get_toc() == [
+            [1, "First", 1],
+            [1, "with_toc", 11],
+            [2, "Intro", 11],
+            [3, "Detail", 13],
+            [2, "End", 20],
+        ]
+        doc.close()
+
+
+class TestPageRenderer:
+    @pytest.mark.asyncio
+    async def test_iter_render_returns_every_request(self, sample_pdf):
+        from PIL import Image
+        import io
+        
+        requests = [(page, 0.5, 0) for page in range(1, 11)] + [(1, 0.5, 90)]
+        results = [r async for r in PageRenderer.iter_render(sample_pdf, requests, "jpg")]
+        
+        assert sorted((r["page"], r["rotation"]) for r in results) == sorted((p, r) for p, _, r in requests)
+        rotated = next(r for r in results if r["rotation"] == 90)
+        with Image.open(io.BytesIO(rotated["data"])) as img:
+            assert img.format == "JPEG"
+            assert img.width > img.height
+    
+    @pytest.mark.asyncio
+    async def test_prefetcher_warms_following_pages(self, sample_pdf):
+        import asyncio
+        
+        prefetcher = PagePrefetcher(RenderCache(max_bytes=16 * 1024 * 1024), ahead=2)
+        await prefetcher.render("viewer", sample_pdf, 3, zoom=0.5)
+        await asyncio.gather(*prefetcher._tasks.values())
+        
+        for page in (4, 5, 2):
+            key = RenderCache.make_key(sample_pdf, page, 0.5, 0, "png")
+            assert key in prefetcher.cache
+        
+        await prefetcher.render("viewer", sample_pdf, 4, zoom=0.5)
+        assert prefetcher.cache.stats()["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_prefetcher_releases_tasks_and_handles(self, sample_pdf, monkeypatch):
+        import asyncio
+        from app.core.pdf_engine import renderer
+        
+        opened = []
+        
+        def _tracking_open(*args, **kwargs):
+            doc = fitz.Document(*args, **kwargs)
+            opened.append(doc)
+            return doc
+        
+        monkeypatch.setattr(renderer.fitz, "open", _tracking_open)
+        prefetcher = PagePrefetcher(RenderCache(max_bytes=16 * 1024 * 1024), ahead=2)
+        await prefetcher.render("viewer", sample_pdf, 3, zoom=0.5)
+        await asyncio.gather(*prefetcher._tasks.values())
+        await asyncio.sleep(0)
+        renderer.prefetch_executor.submit(lambda: None).result()
+        
+        assert prefetcher._tasks == {}
+        assert opened and all(doc.is_closed for doc in opened)
+    
+    def test_prefetcher_follows_backward_navigation(self):
+        from collections import deque
+        
+        prefetcher = PagePrefetcher(RenderCache(max_bytes=1024), ahead=2)
+        candidates = prefetcher.predict(deque([(10, 1.0), (9, 1.0)]))
+        
+        assert candidates[:3] == [(8, 1.0), (7, 1.0), (10, 1.0)]
+
+
+class TestThumbnailGenerator:
+    @pytest.mark.asyncio
+    async def test_generate_sprite_index_and_cache(self, sample_pdf, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+        
+        index = await ThumbnailGenerator.generate(sample_pdf, width=100)
+        
+        assert index["page_count"] == 10
+        assert len(index["sheets"]) == 1
+        assert os.path.exists(index["sheets"][0])
+        assert index["thumbnails"][3]["x"] == 300
+        assert all(t["width"] == 100 for t in index["thumbnails"])
+        
+        cached = await ThumbnailGenerator.generate(sample_pdf, width=100)
+        assert cached == index
+        
+        requality = await ThumbnailGenerator.generate(sample_pdf, width=100, quality=40)
+        assert requality["sheets"][0] != index["sheets"][0]
+        assert os.path.getsize(requality["sheets"][0]) < os.path.getsize(index["sheets"][0])
+    
+    def test_content_hash_cache_is_bounded(self, sample_pdf, tmp_path, monkeypatch):
+        import shutil
+        from collections import OrderedDict
+        from app.core.pdf_engine import thumbnail
+        
+        monkeypatch.setattr(thumbnail, "MAX_CACHED_HASHES", 2)
+        monkeypatch.setattr(thumbnail, "_hash_cache", OrderedDict())
+        paths = [shutil.copy(sample_pdf, tmp_path / f"copy_{i}.pdf") for i in range(3)]
+        hashes = {thumbnail._content_hash(str(path)) for path in paths}
+        assert len(hashes) == 1
+        assert len(thumbnail._hash_cache) == 2
+        assert os.path.abspath(paths[0]) not in {key[0] for key in thumbnail._hash_cache}
+
+
+class TestPageIndex:
+    @pytest.mark.asyncio
+    async def test_index_is_persisted_and_reloaded(self, table_pdf, tmp_path, monkeypatch):
+        from app.core.pdf_engine import page_index
+        from app.core.pdf_engine.page_index import PageIndex
+        
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+        
+        index = await PageIndex.get(table_pdf)
+        assert index.page_count == 12
+        assert os.path.exists(PageIndex.get_index_path(table_pdf))
+        assert not index.text_indexed
+        assert index.page(1)["char_count"] is None
+        
+        doc = fitz.open(table_pdf)
+        assert index.page(1)["width"] == pytest.approx(doc[0].rect.width)
+        assert index.metadata["producer"] == doc.metadata["producer"]
+        doc.close()
+        
+        index = await PageIndex.get(table_pdf, with_text=True)
+        assert index.text_indexed
+        assert index.page(1)["char_count"] > 0
+        
+        page_index._loaded.clear()
+        reloaded = PageIndex.load(PageIndex.get_index_path(table_pdf))
+        assert reloaded.text_indexed
+        assert reloaded.pages() == index.pages()
+        assert reloaded.metadata == index.metadata
+    
+    @pytest.mark.asyncio
+    async def test_page_info_skips_text_pass(self, table_pdf, tmp_path, monkeypatch):
+        import asyncio
+        from app.core.pdf_engine import page_index
+        from app.core.pdf_engine.engine import PdfEngine
+        from app.core.pdf_engine.page_index import PageIndex
+        
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+        monkeypatch.setattr(page_index, "_loaded", page_index.OrderedDict())
+        scans = []
+        original = page_index._scan_text
+        monkeypatch.setattr(page_index, "_scan_text", lambda *args: scans.append(args) or original(*args))
+        
+        pages = await PdfEngine().get_page_info(table_pdf)
+        assert pages[0]["char_count"] is None and pages[0]["has_text"] is None
+        assert not scans
+        
+        # Concurrent text passes on the shared index run the scan once
+        indexes = await asyncio.gather(*[PageIndex.get(table_pdf, with_text=True) for _ in range(4)])
+        assert len({id(index) for index in indexes}) == 1
+        assert len(scans) == 1
+        assert (await PdfEngine().get_page_info(table_pdf))[0]["char_count"] > 0
+
+
+class TestSearchEngine:
+    @pytest.fixture
+    def search_engine(self, tmp_path, monkeypatch):
+        from sqlalchemy.ext.asyncio import create_async_engine
+        
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+        return SearchEngine(create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}"))
+    
+    @pytest.mark.asyncio
+    async def test_search_returns_pages_and_highlights(self, search_engine, sample_pdf):
+        result = await search_engine.index_document(sample_pdf)
+        assert result["status"] == "indexed"
+        assert result["updated"] == 10
+        
+        hits = await search_engine.search("page 7")
+        assert [hit["page"] for hit in hits] == [7]
+        assert hits[0]["snippet"] == "Page 7"
+        x0, y0, x1, y1 = hits[0]["highlights"][0]["bbox"]
+        assert 72 <= x0 < x1 and y0 < 72 < y1
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_first_index(self, search_engine, sample_pdf):
+        import asyncio
+        
+        results = await asyncio.gather(*[search_engine.index_document(sample_pdf) for _ in range(3)])
+        assert sorted(r["status"] for r in results) == ["indexed", "unchanged", "unchanged"]
+        assert [hit["page"] for hit in await search_engine.search("page 7", file_path=sample_pdf)] == [7]
+    
+    @pytest.mark.asyncio
+    async def test_cjk_text_is_searchable(self, search_engine, tmp_path):
+        path = str(tmp_path / "cjk.pdf")
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "季度财务报告摘要", fontname="china-s", fontsize=14)
+        doc.save(path)
+        doc.close()
+        
+        hits = await search_engine.search("财务报告", file_path=path)
+        assert len(hits) == 1
+        assert hits[0]["highlights"][0]["text"] == "财务报告"
+        assert await search_engine.search("报告财务", file_path=path) == []
+    
+    @pytest.mark.asyncio
+    async def test_highlights_use_word_boxes(self, search_engine, tmp_path):
+        path = str(tmp_path / "words.pdf")
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "Contact: e-mail the Café team.", fontsize=12)
+        page.insert_text((72, 100), "Résumé attached", fontsize=12)
+        doc.save(path)
+        expected = {word: page.search_for(word)[0] for word in ("e-mail", "Café", "Résumé")}
+        doc.close()
+        
+        for query, word in (("e-mail", "e-mail"), ("cafe", "Café"), ("CAFÉ", "Café"), ("resume", "Résumé")):
+            hits = await search_engine.search(query, file_path=path)
+            assert len(hits) == 1, query
+            (highlight,) = hits[0]["highlights"]
+            box = expected[word]
+            assert highlight["bbox"][0] == pytest.approx(box.x0, abs=1)
+            assert highlight["bbox"][2] == pytest.approx(box.x1, abs=1)
+        hits = await search_engine.search("resume", file_path=path)
+        assert hits[0]["snippet"] == "Résumé attached"
+    
+    @pytest.mark.asyncio
+    async def test_reindex_only_touches_changed_pages(self, search_engine, sample_pdf):
+        await search_engine.index_document(sample_pdf)
+        assert (await search_engine.index_document(sample_pdf))["status"] == "unchanged"
+        
+        doc = fitz.open(sample_pdf)
+        doc[2].insert_text((72, 144), "Quarterly summary", fontsize=12)
+        doc.delete_page(9)
+        doc.saveIncr()
+        doc.close()
+        
+        result = await search_engine.index_document(sample_pdf)
+        assert result["status"] == "updated"
+        assert result["updated"] == 1
+        assert result["removed"] == 1
+        assert [hit["page"] for hit in await search_engine.search("quarterly")] == [3]
+        assert await search_engine.search("page 10") == []
+
+
+class TestPositionedText:
+    @pytest.mark.asyncio
+    async def test_columns_match_span_dicts(self, table_pdf, monkeypatch):
+        from app.core.pdf_engine.extractor import text
+        
+        monkeypatch.setattr(text, "POSITION_CHUNK_PAGES", 5)
+        positions = await TextExtractor.extract_with_position(table_pdf)
+        
+        doc = fitz.open(table_pdf)
+        expected = [
+            (page.number + 1, span["text"], span["font"])
+            for page in doc
+            for block in page.get_text("dict")["blocks"]
+            for line in block.get("lines", [])
+            for span in line["spans"]
+        ]
+        doc.close()
+        assert [(span["page"], span["text"], span["font"]) for span in positions] == expected
+        assert len(positions.font_names) == len({font for _, _, font in expected})
+    
+    @pytest.mark.asyncio
+    async def test_binary_round_trip_and_region_queries(self, table_pdf):
+        positions = await TextExtractor.extract_with_position(table_pdf)
+        restored = PositionedText.from_bytes(positions.to_bytes())
+        assert restored.texts() == positions.texts()
+        assert (restored.bboxes == positions.bboxes).all()
+        
+        header = positions.in_region(1, (0, 0, 600, 100))
+        assert set(header.pages.tolist()) == {1}
+        assert all(span["bbox"][1] < 100 for span in header)
+        
+        lines = positions.in_region(1, (0, 0, 600, 842)).group_lines()
+        rows = [line["text"] for line in lines]
+        assert "Name Qty" in rows
+        assert "item-0-1 1" in rows
+    
+    @pytest.mark.asyncio
+    async def test_word_entries(self, table_pdf):
+        import re
+        
+        words = await TextExtractor.extract_with_position(table_pdf, words=True)
+        page = words.take(words.pages == 1)
+        doc = fitz.open(table_pdf)
+        expected = [w for w in re.split(r"[\W_]+", doc[0].get_text()) if w]
+        spans = doc[0].get_text("dict")["blocks"][0]["lines"][0]["spans"]
+        doc.close()
+        assert page.texts() == expected
+        # A word box sits inside the span it came from
+        x0, y0, x1, y1 = spans[0]["bbox"]
+        assert x0 - 1 <= page[0]["bbox"][0] < page[0]["bbox"][2] <= x1 + 1
+
+
+class TestSpatialIndex:
+    @pytest.fixture(autouse=True)
+    def cache_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    
+    def test_grid_query_matches_full_scan(self, table_pdf):
+        import numpy as np
+        
+        index = DocumentSpatialIndex.for_file(table_pdf)
+        assert os.path.exists(DocumentSpatialIndex.get_cache_path(table_pdf))
+        
+        positions = index.positions
+        rng = np.random.default_rng(7)
+        for _ in range(200):
+            page = int(rng.integers(1, 13))
+            x, y = rng.uniform(-20, 600, 2)
+            rect = (x, y, x + rng.uniform(1, 250), y + rng.uniform(1, 150))
+            for contained in (False, True):
+                expected = np.flatnonzero(positions.region_mask(page, rect, contained))
+                assert np.array_equal(index.query(page, rect, contained), expected)
+    
+    @pytest.mark.asyncio
+    async def test_redaction_preview_and_region_text(self, table_pdf, tmp_path):
+        from app.core.ocr_engine.engine import OcrEngine
+        from app.core.security_engine.engine import SecurityEngine
+        
+        doc = fitz.open(table_pdf)
+        name_rect = doc[0].search_for("item-0-1")[0]
+        doc.close()
+        
+        redaction = {
+            "page": 1,
+            "x": name_rect.x0 - 1,
+            "y": name_rect.y0 - 1,
+            "width": name_rect.width + 2,
+            "height": name_rect.height + 2,
+        }
+        preview = await SecurityEngine().preview_redactions(table_pdf, [redaction])
+        assert [span["text"] for span in preview[0]["spans"]] == ["item-0-1"]
+        
+        region = (name_rect.x0 - 1, name_rect.y0 - 1, name_rect.x1 + 80, name_rect.y1 + 1)
+        assert await OcrEngine().recognize_region(table_pdf, region, page=1) == "item-0-1 1"
+        
+        output = str(tmp_path / "redacted.pdf")
+        await SecurityEngine().redact(table_pdf, output, [redaction, {**redaction, "page": 5}])
+        doc = fitz.open(output)
+        assert "item-0-1" not in doc[0].get_text()
+        assert "item-0-2" in doc[0].get_text()
+        doc.close()
+
+
+class TestAutoRedact:
+    @pytest.fixture
+    def pii_pdf(self, tmp_path):
+        path = str(tmp_path / "pii.pdf")
+        doc = fitz.open()
+        for i in range(20):
+            page = doc.new_page()
+            page.insert_text((72, 72), f"Contact: user{i}@example.com", fontsize=11)
+            page.insert_text((72, 100), f"Mobile 1380013{i:04d} ext", fontsize=11)
+            page.insert_text((72, 128), "ID 11010519491231002X on file", fontsize=11)
+            page.insert_text((72, 156), f"Invoice INV-{i:05d}", fontsize=11)
+        doc.save(path)
+        doc.close()
+        return path
+    
+    @pytest.mark.asyncio
+    async def test_patterns_are_redacted_and_reported(self, pii_pdf, tmp_path):
+        from app.core.security_engine.engine import SecurityEngine
+        
+        output = str(tmp_path / "redacted.pdf")
+        report = await SecurityEngine().auto_redact(pii_pdf, output, [
+            {"type": "email", "pattern": ""},
+            {"type": "phone", "pattern": ""},
+            {"type": "id_card", "pattern": "", "pages": "1-10"},
+            {"type": "custom", "pattern": r"INV-\d{5}", "case_sensitive": True, "pages": "3"},
+        ])
+        
+        assert report["total"] == 20 + 20 + 10 + 1
+        assert report["by_type"] == {"email": 20, "phone": 20, "id_card": 10, "custom": 1}
+        assert all("text" not in item for item in report["redactions"])
+        
+        doc = fitz.open(output)
+        first, third, last = doc[0].get_text(), doc[2].get_text(), doc[19].get_text()
+        doc.close()
+        assert "@example.com" not in first and "13800130000" not in first
+        assert "11010519491231002X" not in first and "on file" in first
+        assert "Contact:" in first and "ext" in first
+        assert "INV-00002" not in third and "INV-00000" in first
+        assert "11010519491231002X" in last
+    
+    @pytest.mark.asyncio
+    async def test_invalid_pattern_fails_before_scanning(self, pii_pdf, tmp_path):
+        import re
+        from app.core.security_engine.engine import SecurityEngine
+        
+        with pytest.raises(re.error):
+            await SecurityEngine().auto_redact(pii_pdf, str(tmp_path / "out.pdf"), [{"type": "custom", "pattern": "("}])
+        with pytest.raises(ValueError):
+            await SecurityEngine().auto_redact(pii_pdf, str(tmp_path / "out.pdf"), [{"type": "passport", "pattern": ""}])
+
+
+class TestBatchEncryption:
+    @pytest.mark.asyncio
+    async def test_encrypt_selects_revision(self, sample_pdf, tmp_path):
+        import pikepdf
+        from app.core.security_engine.engine import SecurityEngine
+        
+        for method, revision in (("aes-128", 4), ("aes-256", 6)):
+            output = str(tmp_path / f"{method}.pdf")
+            await SecurityEngine().encrypt(sample_pdf, output, "secret", method=method)
+            with pikepdf.open(output, password="secret") as pdf:
+                assert pdf.encryption.R == revision
+                assert not pdf.allow.extract
+                assert len(pdf.pages) == 10
+        
+        with pytest.raises(ValueError):
+            await SecurityEngine().encrypt(sample_pdf, str(tmp_path / "bad.pdf"), "secret", method="des")
+    
+    @pytest.mark.asyncio
+    async def test_batch_round_trip_reports_latency(self, sample_pdf, tmp_path):
+        from app.core.batch_engine.engine import BatchEngine
+        
+        inputs = []
+        for i in range(4):
+            path = str(tmp_path / f"in_{i}.pdf")
+            shutil.copy(sample_pdf, path)
+            inputs.append(path)
+        inputs.append(str(tmp_path / "missing.pdf"))
+        encrypted_dir = tmp_path / "encrypted"
+        decrypted_dir = tmp_path / "decrypted"
+        encrypted_dir.mkdir()
+        decrypted_dir.mkdir()
+        
+        progress = []
+        engine = BatchEngine()
+        report = await engine.process_security(
+            inputs, "encrypt", str(encrypted_dir), {"password": "pw", "method": "aes-128"}, progress.append
+        )
+        assert [r["status"] for r in report["results"]] == ["success"] * 4 + ["failed"]
+        assert report["stats"]["succeeded"] == 4
+        assert set(report["stats"]["latency"]) == {"p50", "p90", "p99", "mean", "max"}
+        assert progress[-1] == 100
+        
+        encrypted = [r["output"] for r in report["results"][:4]]
+        results = await engine.process(encrypted, "decrypt", str(decrypted_dir), options={"password": "pw"})
+        assert all(r["status"] == "success" for r in results)
+        doc = fitz.open(results[0]["output"])
+        assert not doc.needs_pass
+        doc.close()
+
+
+class TestSigning:
+    @pytest.fixture
+    def certificate(self, tmp_path):
+        import datetime
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.serialization import pkcs12
+        
+        key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "Test Signer")])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        path = str(tmp_path / "signer.p12")
+        with open(path, "wb") as f:
+            f.write(pkcs12.serialize_key_and_certificates(
+                b"signer", key, cert, None, serialization.BestAvailableEncryption(b"secret")
+            ))
+        return path
+    
+    @pytest.mark.asyncio
+    async def test_sign_and_verify(self, sample_pdf, certificate, tmp_path):
+        from app.core.security_engine.engine import SecurityEngine
+        from app.core.security_engine.signer import Signer
+        
+        engine = SecurityEngine()
+        signed = str(tmp_path / "signed.pdf")
+        await engine.sign(sample_pdf, signed, certificate, "secret", reason="Approved", location="Shanghai")
+        assert Signer.load(certificate, "secret") is Signer.load(certificate, "secret")
+        
+        result = await engine.verify_signature(signed)
+        assert result["valid"]
+        assert result["signer"] == "Test Signer"
+        assert result["reason"] == "Approved"
+        assert result["signatures"][0]["covers_document"]
+        
+        countersigned = str(tmp_path / "countersigned.pdf")
+        await engine.sign(signed, countersigned, certificate, "secret", reason="Second")
+        signatures = (await engine.verify_signature(countersigned))["signatures"]
+        assert [s["valid"] for s in signatures] == [True, True]
+        assert [s["covers_document"] for s in signatures] == [False, True]
+        
+        with open(signed, "rb") as f:
+            data = bytearray(f.read())
+        data[data.index(b"%PDF-1.") + 7] ^= 1
+        tampered = str(tmp_path / "tampered.pdf")
+        with open(tampered, "wb") as f:
+            f.write(data)
+        assert not (await engine.verify_signature(tampered))["valid"]
+        
+        appended = str(tmp_path / "appended.pdf")
+        shutil.copyfile(signed, appended)
+        doc = fitz.open(appended)
+        doc[0].insert_text((72, 300), "EVIL TEXT")
+        doc.saveIncr()
+        doc.close()
+        result = await engine.verify_signature(appended)
+        assert result["signatures"][0]["valid"]
+        assert not result["signatures"][0]["covers_document"]
+        assert result["modified_after_signing"]
+        assert not result["valid"]
+    
+    def test_signing_time_is_utc(self, certificate):
+        from datetime import datetime, timedelta, timezone
+        from app.core.security_engine.signer import Signer
+        
+        local = datetime(2026, 10, 20, 1, 1, 26, tzinfo=timezone(timedelta(hours=8)))
+        cms = Signer.load(certificate, "secret").cms_signature(bytes(32), local)
+        assert b"261019170126Z" in cms
+        assert b"261020010126Z" not in cms
+    
+    @pytest.mark.asyncio
+    async def test_visible_signature_appearance(self, sample_pdf, certificate, tmp_path):
+        from app.core.security_engine.engine import SecurityEngine
+        
+        engine = SecurityEngine()
+        signed = str(tmp_path / "visible.pdf")
+        await engine.sign(
+            sample_pdf, signed, certificate, "secret", reason="Approved", page_number=2,
+            position={"x": 72, "y": 600, "width": 200, "height": 60},
+            appearance={"show_location": False, "background_color": "#E0E8FF", "border_color": "#1F3A93"}
+        )
+        assert (await engine.verify_signature(signed))["valid"]
+        
+        doc = fitz.open(signed)
+        assert doc.page_count == 10
+        widget = next(doc[1].widgets())
+        assert widget.rect == fitz.Rect(72, 600, 272, 660)
+        clip = doc[1].get_pixmap(clip=widget.rect)
+        assert clip.pixel(100, 5) != (255, 255, 255)
+        doc.close()
+        
+        with pytest.raises(ValueError):
+            await engine.sign(sample_pdf, str(tmp_path / "bad.pdf"), certificate, "secret", appearance={"show_name": True})
+    
+    @pytest.mark.asyncio
+    async def test_batch_sign_loads_key_once(self, sample_pdf, certificate, tmp_path, monkeypatch):
+        from app.core.batch_engine.engine import BatchEngine
+        from app.core.security_engine import signer
+        
+        loads = []
+        original = signer.pkcs12.load_key_and_certificates
+        monkeypatch.setattr(signer, "_signers", signer.OrderedDict())
+        monkeypatch.setattr(
+            signer.pkcs12, "load_key_and_certificates", lambda *args: loads.append(1) or original(*args)
+        )
+        
+        inputs = []
+        for i in range(3):
+            path = str(tmp_path / f"doc_{i}.pdf")
+            shutil.copy(sample_pdf, path)
+            inputs.append(path)
+        output_dir = tmp_path / "signed"
+        output_dir.mkdir()
+        
+        report = await BatchEngine().process_security(
+            inputs, "sign", str(output_dir), {"certificate_path": certificate, "certificate_password": "secret"}
+        )
+        assert report["stats"]["succeeded"] == 3
+        assert len(loads) == 1
+        for result in report["results"]:
+            assert signer.verify_pdf(result["output"])[0]["valid"]
+
+
+class TestPermissionInspection:
+    @pytest.mark.parametrize("method", ["rc4", "aes-128", "aes-256"])
+    def test_reads_encrypt_dictionary(self, sample_pdf, tmp_path, method):
+        import pikepdf
+        from app.core.security_engine.batch import encrypt_file
+        from app.core.security_engine.inspector import read_encryption_info
+        
+        locked = str(tmp_path / "locked.pdf")
+        encrypt_file(sample_pdf, locked, "user", "owner", {"print": False, "copy": True}, method)
+        info = read_encryption_info(locked)
+        assert info["encrypted"]
+        assert info["method"] == method
+        assert info["user_password"]
+        with pikepdf.open(locked, password="owner") as pdf:
+            assert info["permissions"] == {
+                "print": pdf.allow.print_lowres,
+                "modify": pdf.allow.modify_other,
+                "copy": pdf.allow.extract,
+                "annotate": pdf.allow.modify_annotation,
+            }
+        
+        restricted = str(tmp_path / "restricted.pdf")
+        encrypt_file(sample_pdf, restricted, "", "owner", None, method)
+        assert not read_encryption_info(restricted)["user_password"]
+    
+    def test_xref_stream_and_unencrypted(self, sample_pdf, tmp_path):
+        import pikepdf
+        from app.core.security_engine.inspector import read_encryption_info
+        
+        assert read_encryption_info(sample_pdf)["encrypted"] is False
+        compressed = str(tmp_path / "compressed.pdf")
+        with pikepdf.open(sample_pdf) as pdf:
+            pdf.save(
+                compressed,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                encryption=pikepdf.Encryption(owner="owner", user="", R=4)
+            )
+        info = read_encryption_info(compressed)
+        assert info["method"] == "aes-128"
+        assert not info["user_password"]
+    
+    def test_cache(self, sample_pdf, monkeypatch):
+        from app.core.security_engine import inspector
+        
+        reads = []
+        original = inspector.read_encryption_info
+        monkeypatch.setattr(inspector, "read_encryption_info", lambda path: reads.append(path) or original(path))
+        for _ in range(3):
+            assert inspector.inspect_permissions(sample_pdf)["encrypted"] is False
+        assert len(reads) == 1
+        
+        inspector.inspect_permissions(sample_pdf)["permissions"]["print"] = False
+        assert inspector.inspect_permissions(sample_pdf)["permissions"]["print"] is True
+    
+    @pytest.mark.asyncio
+    async def test_engine_permissions(self, sample_pdf, tmp_path):
+        from app.core.security_engine.batch import encrypt_file
+        from app.core.security_engine.engine import SecurityEngine
+        
+        locked = str(tmp_path / "locked.pdf")
+        encrypt_file(sample_pdf, locked, "user", "owner")
+        engine = SecurityEngine()
+        assert (await engine.get_permissions(locked, "wrong"))["error"] == "Incorrect password"
+        assert (await engine.get_permissions(locked, "user"))["permissions"]["print"]
+        
+        results = await engine.get_permissions_batch([sample_pdf, locked, str(tmp_path / "missing.pdf")])
+        assert [r["encrypted"] for r in results] == [False, True, None]
+        assert results[2]["error"]
+
+
+class TestWatermark:
+    @pytest.mark.asyncio
+    async def test_text_stamp_is_shared_by_selected_pages(self, sample_pdf, tmp_path):
+        from app.core.pdf_engine.engine import PdfEngine
+        
+        output = str(tmp_path / "stamped.pdf")
+        await PdfEngine().add_watermark(
+            sample_pdf, output, "text", "机密 CONFIDENTIAL", opacity=0.4, rotation=30, pages="2-4,9"
+        )
+        doc = fitz.open(output)
+        stamped = {i for i, page in enumerate(doc) if page.get_xobjects()}
+        assert stamped == {1, 2, 3, 8}
+        assert len({page.get_xobjects()[0][0] for page in doc if page.get_xobjects()}) == 1
+        assert "CONFIDENTIAL" in doc[1].get_text()
+        form = doc[1].get_xobjects()[0][0]
+        assert float(doc.xref_get_key(form, "Resources/ExtGState/WmGS/ca")[1]) == pytest.approx(0.4)
+        doc.close()
+    
+    def test_position_follows_page_rotation(self, tmp_path):
+        from app.core.pdf_engine.watermark import apply_watermark
+        
+        source = str(tmp_path / "rotated.pdf")
+        doc = fitz.open()
+        for rotation in (0, 90, 180, 270):
+            doc.new_page().set_rotation(rotation)
+        doc.save(source)
+        doc.close()
+        
+        output = str(tmp_path / "stamped.pdf")
+        apply_watermark(source, output, "text", "DRAFT", rotation=0, position="top-left")
+        doc = fitz.open(output)
+        for page in doc:
+            word = next(w for w in page.get_text("words") if w[4] == "DRAFT")
+            visible = fitz.Rect(word[:4]) * page.rotation_matrix
+            assert visible.x0 < 72 and visible.y0 < 72
+        doc.close()
+    
+    def test_image_embedded_once_and_batch(self, sample_pdf, tmp_path):
+        import asyncio
+        from app.core.batch_engine.engine import BatchEngine
+        
+        image = str(tmp_path / "logo.png")
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 120, 60), False)
+        pixmap.clear_with(128)
+        pixmap.save(image)
+        
+        output_dir = tmp_path / "out"
+        output_dir.mkdir()
+        results = asyncio.run(BatchEngine().process(
+            [sample_pdf, str(tmp_path / "missing.pdf")],
+            "watermark",
+            str(output_dir),
+            options={"watermark_type": "image", "watermark_image": image, "position": "tile"}
+        ))
+        assert [r["status"] for r in results] == ["success", "failed"]
+        
+        doc = fitz.open(results[0]["output"])
+        assert all(page.get_images(full=True) for page in doc)
+        assert len({img[0] for page in doc for img in page.get_images(full=True)}) == 1
+        doc.close()
+        
+        # Options left out fall back to the single-file defaults
+        results = asyncio.run(BatchEngine().process(
+            [sample_pdf], "watermark", str(output_dir), options={"watermark_text": "DRAFT"}
+        ))
+        assert results[0]["status"] == "success"
+        doc = fitz.open(results[0]["output"])
+        assert "DRAFT" in doc[0].get_text()
+        doc.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -14,7 +14,13 @@ from app.utils.path import (
 )
 from app.utils.crypto import (
     generate_uuid, generate_short_id, hash_password, verify_password,
-    calculate_hash, generate_api_key, validate_email
+    calculate_hash, generate_api_key, validate_email, needs_rehash,
+    encrypt_data, decrypt_data, hash_password_async, verify_password_async
+)
+from app.utils import crypto
+from app.utils.image import (
+    add_watermark, fade_alpha, watermark_images, ImagePipeline,
+    get_image_info, get_dominant_color, resize_image, scan_images
 )
 
 
@@ -102,5 +108,188 @@ class TestCryptoUtils:
         assert validate_email("test@") == False
 
 
+class TestKeyDerivation:
+    @pytest.fixture(autouse=True)
+    def cheap_parameters(self, monkeypatch):
+        monkeypatch.setitem(crypto.KDF_PARAMETERS, "pbkdf2-sha256", {"i": 1000})
+        monkeypatch.setitem(crypto.KDF_PARAMETERS, "scrypt", {"ln": 10, "r": 8, "p": 1})
+        monkeypatch.setattr(crypto, "_fernet_keys", crypto.TTLCache(8, 60))
+        monkeypatch.setattr(crypto, "_data_salts", crypto.TTLCache(8, 60))
+    
+    @pytest.mark.parametrize("algorithm", ["pbkdf2-sha256", "scrypt"])
+    def test_hash_formats(self, algorithm):
+        hashed = hash_password("secret", algorithm=algorithm)
+        assert hashed.startswith(f"${algorithm}$")
+        assert verify_password("secret", hashed)
+        assert not verify_password("other", hashed)
+        assert needs_rehash(hashed) == (algorithm != crypto.settings.KDF_ALGORITHM)
+    
+    def test_legacy_hash(self):
+        import hashlib
+        
+        legacy = "salt:" + hashlib.pbkdf2_hmac("sha256", b"secret", b"salt", 100000).hex()
+        assert verify_password("secret", legacy)
+        assert needs_rehash(legacy)
+        assert not verify_password("secret", "$scrypt$broken")
+    
+    def test_rejects_costly_parameters(self):
+        salt = "c2FsdA"
+        digest = "A" * 43
+        assert not verify_password("secret", f"$scrypt$ln=30,p=1,r=8${salt}${digest}")
+        assert not verify_password("secret", f"$pbkdf2-sha256$i=1000000000000${salt}${digest}")
+        assert not verify_password("secret", f"$pbkdf2-sha256$i=1000${salt}${'A' * 4000}")
+        with pytest.raises(ValueError):
+            decrypt_data(f"$scrypt$ln=30,p=1,r=8${salt}$token", "key")
+        assert needs_rehash(f"$md5$i=1${salt}${digest}")
+        assert needs_rehash(f"$scrypt$ln=30,p=1,r=8${salt}${digest}")
+    
+    def test_encrypt_data_caches_derived_key(self, monkeypatch):
+        calls = []
+        original = crypto.derive_key
+        monkeypatch.setattr(crypto, "derive_key", lambda *args: calls.append(args) or original(*args))
+        
+        tokens = [encrypt_data(f"value {i}", "key") for i in range(3)]
+        assert [decrypt_data(token, "key") for token in tokens] == ["value 0", "value 1", "value 2"]
+        assert len(calls) == 1
+        with pytest.raises(Exception):
+            decrypt_data(tokens[0], "wrong key")
+    
+    def test_legacy_encrypted_data(self):
+        import base64
+        from cryptography.fernet import Fernet
+        
+        key = crypto.derive_key(b"key", crypto.LEGACY_DATA_SALT, "pbkdf2-sha256", {"i": 100000})
+        legacy = Fernet(base64.urlsafe_b64encode(key)).encrypt(b"old").decode()
+        assert decrypt_data(legacy, "key") == "old"
+    
+    def test_ttl_cache(self, monkeypatch):
+        cache = crypto.TTLCache(2, 10)
+        for key in "abc":
+            cache.set(key, key.upper())
+        assert cache.get("a") is None
+        assert cache.get("c") == "C"
+        now = crypto.time.monotonic()
+        monkeypatch.setattr(crypto.time, "monotonic", lambda: now + 11)
+        assert cache.get("c") is None
+    
+    @pytest.mark.asyncio
+    async def test_async_offload(self):
+        hashed = await hash_password_async("secret", "scrypt")
+        assert await verify_password_async("secret", hashed)
+
+
+class TestImageWatermark:
+    @pytest.fixture
+    def images(self):
+        import numpy as np
+        from PIL import Image
+        
+        rng = np.random.default_rng(0)
+        image = Image.fromarray(rng.integers(0, 255, (60, 90, 3), dtype=np.uint8))
+        watermark = Image.fromarray(rng.integers(0, 255, (10, 20, 4), dtype=np.uint8), "RGBA")
+        return image, watermark
+    
+    def test_fade_matches_per_pixel_scaling(self, images):
+        import numpy as np
+        
+        _, watermark = images
+        faded = np.asarray(fade_alpha(watermark, 0.37))
+        source = np.asarray(watermark)
+        assert np.array_equal(faded[..., :3], source[..., :3])
+        assert np.array_equal(faded[..., 3], (source[..., 3] * 0.37).astype(np.uint8))
+    
+    def test_tile_repeats_watermark(self, images):
+        import numpy as np
+        
+        image, watermark = images
+        tiled = add_watermark(image, watermark, (5, 3), 0.5, "tile", (4, 2))
+        expected = image.convert("RGBA")
+        faded = fade_alpha(watermark, 0.5)
+        for y in range(3 - 12, 60, 12):
+            for x in range(5 - 24, 90, 24):
+                expected.paste(faded, (x, y), faded)
+        assert np.array_equal(np.asarray(tiled), np.asarray(expected))
+        with pytest.raises(ValueError):
+            add_watermark(image, watermark, (0, 0), mode="diagonal")
+    
+    def test_watermark_images_batch(self, images, tmp_path):
+        from PIL import Image
+        
+        image, watermark = images
+        watermark_path = str(tmp_path / "mark.png")
+        watermark.save(watermark_path)
+        jobs = []
+        for i in range(3):
+            source = str(tmp_path / f"in_{i}.jpg")
+            image.save(source)
+            jobs.append((source, str(tmp_path / f"out_{i}.jpg")))
+        jobs.append((str(tmp_path / "missing.png"), str(tmp_path / "missing_out.png")))
+        
+        results = watermark_images(jobs, watermark_path, (0, 0), 0.5, "tile")
+        assert [r["status"] for r in results] == ["success"] * 3 + ["failed"]
+        with Image.open(results[0]["output"]) as marked:
+            assert marked.mode == "RGB" and marked.size == image.size
+
+
+class TestImagePipeline:
+    @pytest.fixture
+    def image_dir(self, tmp_path):
+        import numpy as np
+        from PIL import Image
+        
+        rng = np.random.default_rng(0)
+        pixels = np.kron(rng.integers(0, 255, (30, 40, 3), dtype=np.uint8), np.ones((40, 40, 1), np.uint8))
+        Image.fromarray(pixels).save(tmp_path / "large.jpg", quality=90)
+        (tmp_path / "nested").mkdir()
+        Image.fromarray(pixels[:300, :200]).save(tmp_path / "nested" / "small.png")
+        (tmp_path / "notes.txt").write_text("not an image")
+        (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+        return tmp_path
+    
+    def test_header_only_info(self, image_dir):
+        info = get_image_info(str(image_dir / "large.jpg"))
+        assert (info["width"], info["height"], info["format"]) == (1600, 1200, "JPEG")
+        assert [i["path"] for i in scan_images(str(image_dir))] == [str(image_dir / "large.jpg")]
+        assert len(scan_images(str(image_dir), recursive=True)) == 2
+    
+    def test_draft_resize_keeps_requested_size(self, image_dir):
+        import numpy as np
+        from PIL import Image
+        
+        with Image.open(image_dir / "large.jpg") as image:
+            resized = resize_image(image, width=200)
+            get_dominant_color(image)
+            assert image.size == (1600, 1200)
+        with Image.open(image_dir / "large.jpg") as image:
+            drafted = resize_image(image, width=200, draft=True)
+        with Image.open(image_dir / "large.jpg") as image:
+            image.load()
+            full = image.resize((200, 150), Image.Resampling.LANCZOS)
+        assert drafted.size == (200, 150)
+        assert resized.size == (200, 150)
+        assert np.abs(np.asarray(drafted, dtype=int) - np.asarray(full, dtype=int)).mean() < 4
+    
+    def test_chained_operations(self, image_dir):
+        from PIL import Image
+        
+        pipeline = ImagePipeline().resize(width=100, height=40, maintain_aspect=False).grayscale()
+        result = pipeline.run(str(image_dir / "large.jpg"), str(image_dir / "out" / "large.png"))
+        assert result["status"] == "success"
+        assert result["source_size"] == (1600, 1200)
+        with Image.open(result["output"]) as output:
+            assert output.size == (100, 40) and output.mode == "L"
+    
+    def test_run_directory(self, image_dir, tmp_path):
+        output_dir = tmp_path / "thumbs"
+        results = ImagePipeline().thumbnail((64, 64)).run_directory(
+            str(image_dir), str(output_dir), format="jpeg", recursive=True
+        )
+        by_name = {os.path.basename(r["input"]): r for r in results}
+        assert by_name["broken.jpg"]["status"] == "failed"
+        assert by_name["large.jpg"]["size"] == (64, 48)
+        assert by_name["small.png"]["output"] == str(output_dir / "nested" / "small.jpg")
+        assert os.path.exists(output_dir / "nested" / "small.jpg")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])